@@ -1,15 +1,31 @@
-from flask import Flask, jsonify, request, render_template
+import base64
+import io
+import json
+import os
+import time
+import zipfile
 
-from src.tools import Cesta
+from flask import Flask, Response, jsonify, request, render_template, send_file
+
+from src.detektorji import Odsek, Zanka, odseki_omejitev
+from src.register import Register, ocena_pomnilnika
+from src.stanje import binarno_stanje, delta_stanje, polno_stanje
+from src.tools import Cesta, ENGINES
 
 app = Flask(__name__)
 
-model = None
+# Vsak model tece v niti svojega izvajalnika (src/izvajalnik.py): spremembe gredo
+# kot ukazi v njegovo vrsto, /state in /stream pa berejo zadnji objavljeni posnetek.
+# Modeli so v registru po ID-ju simulacije (piskotek "sim", ?sim= ali "sim" v JSON).
+register = Register(
+    max_modelov=int(os.environ.get("SIM_MAX_MODELOV", 16)),
+    max_bajtov=int(os.environ.get("SIM_MAX_POMNILNIK_MB", 1024)) << 20,
+)
 
 
-def serialize_state():
-    # Model v JSON
-    if model is None:
+def serialize_state(since=None, stanje=None, generacija=0):
+    # Posnetek modela v JSON; s since le spremembe po tej verziji
+    if stanje is None:
         return {
             "dolzina_ceste": 0,
             "st_pasov": 0,
@@ -18,39 +34,66 @@ def serialize_state():
             "omejitve": [],
             "lookahead": 0,
             "truck_cap_enabled": False,
+            "engine": None,
+            "seed": None,
+            "polno": True,
+            "generacija": generacija,
+            "verzija": 0,
         }
+    if since is not None:
+        return delta_stanje(stanje, since, generacija)
+    return polno_stanje(stanje, generacija)
 
-    avti = [
-        {
-            "poz": avto.poz,
-            "pas": avto.pas,
-            "hitrost": avto.hitrost,
-            "max_hitrost": avto.max_hitrost,
-            "tip": avto.tip,
-            "dolzina": avto.dolzina,
-            "color": avto.color,
-        }
-        for avto in model.avti
-    ]
-    ovire = [
-        {
-            "poz": ovira.poz,
-            "pas": ovira.pas,
-        }
-        for ovira in model.ovire
-    ]
-    omejitve = getattr(model, "cesta_omejitve", [])
+
+def sim_id(data=None):
+    # ID simulacije iz poizvedbe, JSON telesa ali piskotka
+    return request.args.get("sim") or (data or {}).get("sim") or request.cookies.get("sim")
+
+
+def seja_zahtevka(data=None):
+    return register.dobi(sim_id(data))
+
+
+def izvajalnik_zahtevka(data=None):
+    seja = seja_zahtevka(data)
+    return None if seja is None else seja.izvajalnik
+
+
+def ni_modela():
+    # brez ID-ja 400, izrinjena simulacija 410, neznana 404
+    sim = sim_id(request.get_json(force=True, silent=True))
+    if sim is None:
+        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    if register.izrinjen(sim):
+        return jsonify({"ok": False, "error": f"Simulation {sim} was evicted"}), 410
+    return jsonify({"ok": False, "error": f"Unknown simulation: {sim}"}), 404
+
+
+def stanje_izvajalnika(izvajalnik):
     return {
-        "dolzina_ceste": model.dolzina_ceste,
-        "st_pasov": model.st_pasov,
-        "avti": avti,
-        "ovire": ovire,
-        "omejitve": omejitve,
-        "lookahead": model.lookahead,
-        "truck_cap_enabled": model.truck_cap_enabled,
+        "tece": izvajalnik.tece,
+        "hitrost": izvajalnik.hitrost,
+        "koraki": izvajalnik.koraki,
+        "cas": izvajalnik.posnetek.cas,
+        "napaka": None if izvajalnik.napaka is None else str(izvajalnik.napaka),
     }
 
 
+def zabelezi_serializacijo(izvajalnik, zacetek, odgovor):
+    # meritve zapise nit izvajalnika, ki edina spreminja model
+    trajanje = time.perf_counter() - zacetek
+    bajti = odgovor.content_length or 0
+
+    def zapisi(model):
+        model.metrike.zabelezi("serializacija", trajanje)
+        model.metrike.stej("serializirani_bajti", bajti)
+
+    try:
+        izvajalnik.poslji(zapisi)
+    except RuntimeError:
+        pass  # medtem je bil model zamenjan ali izrinjen
+
+
 @app.get("/")
 def index():
     #Glavna HTML stran
@@ -59,27 +102,107 @@ def index():
 
 @app.get("/state")
 def state():
-    # korak slika simulaije
-    return jsonify(serialize_state())
+    # korak slika simulaije (zadnji posnetek; branje ne caka na korak)
+    # ?since=<verzija>&generacija=<g> vrne le spremembe; nespremenjeno stanje je 304
+    # ?format=bin vrne polno stanje v binarnem zapisu (glej src/stanje.py)
+    seja = seja_zahtevka()
+    if seja is None:
+        # prazno stanje (odjemalec pokaze "Ni modela"); izrinjena ali neznana simulacija
+        # dobi status kot pri ukazih
+        return jsonify(serialize_state()), 200 if sim_id() is None else ni_modela()[1]
+    izv, gen = seja.izvajalnik, seja.generacija
+    posnetek = izv.posnetek
+    binarno = request.args.get("format") == "bin"
+    etag = f"{gen}-{posnetek.verzija}" + ("-bin" if binarno else "")
+    if request.if_none_match.contains(etag):
+        return "", 304, {"ETag": f'"{etag}"'}
+
+    zacetek = time.perf_counter()
+    if binarno:
+        odgovor = Response(binarno_stanje(posnetek, gen), mimetype="application/octet-stream")
+    else:
+        since = request.args.get("since", type=int)
+        if request.args.get("generacija", type=int) != gen or since is None or not 0 <= since <= posnetek.verzija:
+            since = None  # neznana ali tuja verzija: posljemo polno stanje
+        elif since == posnetek.verzija:
+            return "", 304, {"ETag": f'"{etag}"'}
+        odgovor = jsonify(serialize_state(since, posnetek, gen))
+    zabelezi_serializacijo(izv, zacetek, odgovor)
+    odgovor.set_etag(etag)
+    return odgovor
+
+
+@app.get("/metrics")
+def metrics():
+    # Trajanja faz koraka, stevci in histogrami trenutnega modela
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    return jsonify(izvajalnik.izvedi(lambda model: model.porocilo_metrik()))
+
+
+@app.post("/metrics")
+def set_metrics():
+    # Vklop/izklop merjenja; "ponastavi" pobrise dosedanje meritve
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+
+    def nastavi(model):
+        if "vklopljeno" in data:
+            model.metrike.vklopljeno = bool(data["vklopljeno"])
+        if data.get("ponastavi", False):
+            model.metrike.ponastavi()
+        return model.metrike.vklopljeno
+
+    return jsonify({"ok": True, "vklopljeno": izvajalnik.izvedi(nastavi)})
 
 
 @app.post("/init")
 def init():
-    # Nardimo nov model (aka cesta, omejitve, ovire)
-    global model
+    # Nardimo nov model (aka cesta, omejitve, ovire) za to simulacijo; brez ID-ja dobi nov ID
     data = request.get_json(force=True)
     dolzina_ceste = int(data.get("dolzina_ceste", 200))
     p_zaviranje = float(data.get("p_zaviranje", 0.2))
     omejitve = data.get("omejitve", [])
     ovire = data.get("ovire", [])
     lookahead = int(data.get("lookahead", 15))  # koliko celic naprej gledajo avti
+    st_pasov = int(data.get("st_pasov", 2))
     truck_cap_enabled = bool(data.get("truck_cap_enabled", False))
-
+    metrike = bool(data.get("metrike", False))  # merjenje faz koraka (glej /metrics)
+    engine = data.get("engine", "python")  # "python" ali "numpy"
+    if engine not in ENGINES:
+        return jsonify({"ok": False, "error": f"Unknown engine: {engine}"}), 400
+    if st_pasov < 1:
+        return jsonify({"ok": False, "error": "st_pasov must be at least 1"}), 400
+    seed = data.get("seed")  # None = nakljucen zagon, sicer ponovljiv
+    if seed is not None:
+        try:
+            seed = int(seed)
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": f"Invalid seed: {seed}"}), 400
+        if seed < 0:
+            return jsonify({"ok": False, "error": "seed must be non-negative"}), 400
+
+    # prevelikega modela sploh ne zgradimo; vozila ocenimo iz gostote (vozil na celico ceste)
+    gostota = float(data.get("gostota", 0.1)) if data.get("random") or data.get("random_vozila") else 0
+    st_vozil = int(gostota * dolzina_ceste)
+    try:
+        register.preveri(ocena_pomnilnika(dolzina_ceste, st_pasov, st_vozil))
+    except ValueError as napaka:
+        return jsonify({"ok": False, "error": str(napaka)}), 400
+
+    # nov model zgradimo v tej niti; registru ga predamo sele, ko je pripravljen
     model = Cesta(
         dolzina_ceste=dolzina_ceste,
         p_zaviranje=p_zaviranje,
         omejitve=omejitve,
         lookahead=lookahead,
+        engine=engine,
+        st_pasov=st_pasov,
+        seed=seed,
+        metrike=metrike,
     )
     model.set_truck_cap(truck_cap_enabled, max_speed=4)
 
@@ -113,18 +236,125 @@ def init():
             max_hitrost_interval=max_hitrost_interval,
         )
 
-    return jsonify({"ok": True})
+    return nova_seja(model, sim_id(data))
+
+
+def nova_seja(model, sim):
+    # model damo v register (zamenja prejsnjega pod istim ID-jem) in nastavimo piskotek
+    try:
+        seja = register.ustvari(model, sim)
+    except ValueError as napaka:
+        return jsonify({"ok": False, "error": str(napaka)}), 400
+
+    odgovor = jsonify({"ok": True, "sim": seja.sim_id})
+    odgovor.set_cookie("sim", seja.sim_id, httponly=True, samesite="Lax")
+    return odgovor
+
+
+@app.post("/save")
+def save():
+    # Kontrolna tocka modela (.npz, glej Cesta.shrani) kot prenos
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    datoteka = io.BytesIO()
+    izvajalnik.izvedi(lambda model: model.shrani(datoteka))
+    datoteka.seek(0)
+    return send_file(datoteka, mimetype="application/octet-stream", as_attachment=True, download_name="cesta.npz")
+
+
+@app.post("/load")
+def load():
+    # Nalozi kontrolno tocko iz /save (datoteka v obrazcu ali surovo telo) kot model te simulacije
+    datoteka = request.files.get("datoteka")
+    podatki = datoteka.read() if datoteka else request.get_data()
+    try:
+        model = Cesta.nalozi(io.BytesIO(podatki), metrike=request.args.get("metrike") == "1")
+    except (KeyError, ValueError, OSError, zipfile.BadZipFile) as napaka:
+        return jsonify({"ok": False, "error": f"Invalid checkpoint: {napaka}"}), 400
+    return nova_seja(model, sim_id())
+
+
+@app.post("/close")
+def close():
+    # Odstrani simulacijo iz registra in ustavi njeno nit
+    data = request.get_json(force=True)
+    return jsonify({"ok": register.odstrani(sim_id(data))})
+
+
+@app.get("/registry")
+def registry():
+    # Aktivni modeli, ocena porabe pomnilnika in stevilo izrinjenih
+    return jsonify(register.statistika())
+
+
+@app.post("/run")
+def run():
+    # Zazene ali ustavi korakanje v ozadju; hitrost je koraki/s (0 = cim hitreje)
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+    if "tece" in data:
+        if data["tece"]:
+            hitrost = data.get("hitrost")
+            if hitrost is not None:
+                hitrost = float(hitrost)
+                if hitrost < 0:
+                    return jsonify({"ok": False, "error": "hitrost must be non-negative"}), 400
+            izvajalnik.zazeni(hitrost)
+        else:
+            izvajalnik.ustavi()
+    return jsonify({"ok": True, **stanje_izvajalnika(izvajalnik)})
+
+
+@app.get("/run")
+def run_status():
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    return jsonify({"ok": True, **stanje_izvajalnika(izvajalnik)})
 
 
 @app.post("/set_limits")
 def set_limits():
     # Omejitev hitrosti posodobljena ko dodaš
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     omejitve = data.get("omejitve", [])
-    model.set_omejitve(omejitve)
+    izvajalnik.izvedi(lambda model: model.set_omejitve(omejitve))
+    return jsonify({"ok": True})
+
+
+@app.post("/add_limit")
+def add_limit():
+    # Doda eno omejitev {od, do, max_hitrost} cez obstojece
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+
+    od = int(data.get("od", 0))
+    do = int(data.get("do", 0))
+    max_hitrost = int(data.get("max_hitrost", 0))
+    izvajalnik.izvedi(lambda model: model.dodaj_omejitev(od, do, max_hitrost))
+    return jsonify({"ok": True})
+
+
+@app.post("/remove_limit")
+def remove_limit():
+    # Odstrani omejitve na odseku [od, do)
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+
+    od = int(data.get("od", 0))
+    do = int(data.get("do", 0))
+    izvajalnik.izvedi(lambda model: model.odstrani_omejitev(od, do))
     return jsonify({"ok": True})
 
 
@@ -132,23 +362,25 @@ def set_limits():
 def set_lookahead():
     # Nastavi koliko celic naprej avti gledajo
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     lookahead = int(data.get("lookahead", 15))
-    model.lookahead = lookahead
+    izvajalnik.izvedi(lambda model: setattr(model, "lookahead", lookahead))
     return jsonify({"ok": True})
 
 
 @app.post("/set_truck_cap")
 def set_truck_cap():
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     enabled = bool(data.get("enabled", False))
     max_speed = int(data.get("max_speed", 4))
-    model.set_truck_cap(enabled, max_speed=max_speed)
+    izvajalnik.izvedi(lambda model: model.set_truck_cap(enabled, max_speed=max_speed))
     return jsonify({"ok": True})
 
 
@@ -156,15 +388,16 @@ def set_truck_cap():
 def add_vozilo():
     # Dodan avto v model
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     poz = int(data.get("poz", 0))
     pas = int(data.get("pas", 0))
     max_hitrost = int(data.get("max_hitrost", 5))
     tip = data.get("tip", "avto")
     color = data.get("color")
-    ok = model.add_vozilo(poz, pas, max_hitrost, color=color, tip=tip)
+    ok = izvajalnik.izvedi(lambda model: model.add_vozilo(poz, pas, max_hitrost, color=color, tip=tip))
     return jsonify({"ok": ok})
 
 
@@ -172,44 +405,204 @@ def add_vozilo():
 def add_obstacle():
     # Dodana ovira v model.
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     poz = int(data.get("poz", 0))
     pas = int(data.get("pas", 0))
-    model.add_obstacle(poz, pas)
-    return jsonify({"ok": True})
+    return jsonify({"ok": izvajalnik.izvedi(lambda model: model.add_obstacle(poz, pas))})
 
 @app.post("/remove_obstacle")
 def remove_obstacle():
     # Odstrani oviro s ceste.
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     start = int(data.get("poz", 0))
     pas = int(data.get("pas", 0))
     dolzina = int(data.get("len", 1))
-    ok = False
-    for i in range(max(dolzina, 1)):
-        poz = (start + i) % model.dolzina_ceste
-        ok = model.remove_obstacle(poz, pas) or ok
-    return jsonify({"ok": ok})
+
+    def odstrani(model):
+        ok = False
+        for i in range(max(dolzina, 1)):
+            poz = (start + i) % model.dolzina_ceste
+            ok = model.remove_obstacle(poz, pas) or ok
+        return ok
+
+    return jsonify({"ok": izvajalnik.izvedi(odstrani)})
 
 
 @app.post("/step")
 def step():
-    # Izvede n korakov simulacije in vrne OK
+    # Izvede n korakov simulacije (med ukazi izvajalnika) in vrne OK; za dolge teke glej /jobs
     data = request.get_json(force=True)
-    if model is None:
-        return jsonify({"ok": False, "error": "Model not initialized"}), 400
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
 
     n = int(data.get("n", 1))
-    for _ in range(max(n, 1)):
-        model.korak_simulacije()
 
+    def koraki(model):
+        for _ in range(max(n, 1)):
+            model.korak_simulacije()
+
+    izvajalnik.izvedi(koraki)
     return jsonify({"ok": True})
 
 
+@app.post("/jobs")
+def add_job():
+    # Dolg tek v ozadju: {"koraki": N} ali {"do_casa": T}; takoj vrne ID posla
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+    try:
+        koraki = data.get("koraki")
+        do_casa = data.get("do_casa")
+        koraki = None if koraki is None else int(koraki)
+        do_casa = None if do_casa is None else int(do_casa)
+        if (koraki or 0) < 0 or (do_casa or 0) < 0:
+            raise ValueError("koraki and do_casa must be non-negative")
+        posel = izvajalnik.dodaj_posel(koraki=koraki, do_casa=do_casa)
+    except (TypeError, ValueError) as napaka:
+        return jsonify({"ok": False, "error": str(napaka)}), 400
+    return jsonify({"ok": True, "posel": posel.id})
+
+
+@app.get("/jobs")
+def jobs():
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    return jsonify({"ok": True, "posli": [p.porocilo() for p in list(izvajalnik.posli.values())]})
+
+
+@app.get("/jobs/<posel_id>")
+def job(posel_id):
+    # Napredek posla: narejeni koraki, koraki/s in ocena preostalega casa
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    posel = izvajalnik.posli.get(posel_id)
+    if posel is None:
+        return jsonify({"ok": False, "error": f"Unknown job: {posel_id}"}), 404
+    return jsonify({"ok": True, **posel.porocilo()})
+
+
+@app.post("/jobs/<posel_id>/cancel")
+def cancel_job(posel_id):
+    data = request.get_json(force=True, silent=True) or {}
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+    posel = izvajalnik.posli.get(posel_id)
+    if posel is None:
+        return jsonify({"ok": False, "error": f"Unknown job: {posel_id}"}), 404
+    posel.preklici()
+    return jsonify({"ok": True})
+
+
+@app.get("/detectors")
+def detectors():
+    # Drsna okna vseh detektorjev: pretok, gostota/zasedenost, povprecna hitrost, vrste
+    izvajalnik = izvajalnik_zahtevka()
+    if izvajalnik is None:
+        return ni_modela()
+    return jsonify({"ok": True, "detektorji": izvajalnik.izvedi(lambda model: model.porocilo_detektorjev())})
+
+
+@app.post("/detectors")
+def add_detector():
+    # {"tip": "zanka", "poz", "pas"}, {"tip": "odsek", "od", "do", "pas"} ali
+    # {"tip": "omejitve"} (odsek za vsako omejitev); "okno" je dolzina okna v korakih
+    data = request.get_json(force=True)
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+    tip = data.get("tip", "zanka")
+    pas = data.get("pas")
+    pas = None if pas is None else int(pas)
+    okno = int(data.get("okno", 60))
+
+    def dodaj(model):
+        if okno < 1:
+            raise ValueError("okno must be at least 1")
+        if pas is not None and not 0 <= pas < model.st_pasov:
+            raise ValueError(f"Invalid pas: {pas}")
+        if tip == "zanka":
+            detektorji = [Zanka(int(data.get("poz", 0)) % model.dolzina_ceste, pas=pas, okno=okno)]
+        elif tip == "odsek":
+            od = int(data.get("od", 0)) % model.dolzina_ceste
+            do = int(data.get("do", model.dolzina_ceste)) % model.dolzina_ceste
+            detektorji = [Odsek(od, do, pas=pas, okno=okno)]
+        elif tip == "omejitve":
+            detektorji = odseki_omejitev(model, okno=okno)
+        else:
+            raise ValueError(f"Unknown detector type: {tip}")
+        return [model.dodaj_detektor(detektor).id for detektor in detektorji]
+
+    try:
+        idji = izvajalnik.izvedi(dodaj)
+    except ValueError as napaka:
+        return jsonify({"ok": False, "error": str(napaka)}), 400
+    return jsonify({"ok": True, "detektorji": idji})
+
+
+@app.post("/detectors/<int:detektor_id>/remove")
+def remove_detector(detektor_id):
+    data = request.get_json(force=True, silent=True) or {}
+    izvajalnik = izvajalnik_zahtevka(data)
+    if izvajalnik is None:
+        return ni_modela()
+    return jsonify({"ok": izvajalnik.izvedi(lambda model: model.odstrani_detektor(detektor_id))})
+
+
+@app.get("/stream")
+def stream():
+    # Server-Sent Events: vsakih 1/fps s poslje zadnji posnetek modela.
+    # ?fps=<okvirji/s>&format=json|bin
+    # Tok le bere; korake dela izvajalnik (glej /run). Vmesne verzije, ki jih
+    # odjemalec ne ujame, izpustimo; nespremenjeno stanje ne poslje okvirja.
+    sim = sim_id()
+    fps = min(max(request.args.get("fps", 5, type=float), 0.1), 60)
+    binarno = request.args.get("format") == "bin"
+    interval = 1 / fps
+
+    def okvirji():
+        poslano = None  # (generacija, verzija) zadnjega poslanega okvirja
+        naslednji = time.perf_counter()
+        while True:
+            seja = register.dobi(sim)
+            if seja is None:
+                # simulacije (se) ni ali je bila izrinjena
+                podatki = json.dumps(serialize_state()) if poslano != (0, None) else None
+                poslano = (0, None)
+            else:
+                gen = seja.generacija
+                posnetek = seja.izvajalnik.posnetek
+                if poslano == (gen, posnetek.verzija):
+                    podatki = None
+                elif binarno:
+                    podatki = base64.b64encode(binarno_stanje(posnetek, gen)).decode("ascii")
+                else:
+                    since = poslano[1] if poslano and poslano[0] == gen else None
+                    podatki = json.dumps(serialize_state(since, posnetek, gen))
+                poslano = (gen, posnetek.verzija)
+            # komentar ohranja povezavo in pove, ali je odjemalec se tu
+            yield f"data: {podatki}\n\n" if podatki is not None else ": \n\n"
+            naslednji = max(naslednji + interval, time.perf_counter())
+            time.sleep(max(naslednji - time.perf_counter(), 0))
+
+    return Response(
+        okvirji(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
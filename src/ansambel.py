@@ -0,0 +1,172 @@
+"""
+Ansambel: R neodvisnih replik iste ceste (dolzina, pasovi, omejitve, ovire),
+ki jih premikamo z enim vektorskim korakom.
+
+Vozila vseh replik so v skupnih tabelah, urejena po repliki; pri iskanju sosedov
+je vsak pas replike svoj segment (replika * st_pasov + pas), zato replike med
+seboj ne vidijo ena druge.
+"""
+import numpy as np
+
+from src.tools import Cesta
+from src.vektorski_korak import korak_tabel
+
+
+def _cesta(cesta):
+    # vse, kar si replike delijo; vozila so lahko razlicna
+    return (
+        cesta.dolzina_ceste,
+        cesta.st_pasov,
+        cesta.p_zaviranje,
+        cesta.lookahead,
+        cesta.truck_cap_enabled,
+        cesta.truck_max_speed,
+        tuple(cesta.omejitve.intervali()),
+        sorted((ovira.poz, ovira.pas) for ovira in cesta.ovire),
+    )
+
+
+class Ansambel:
+    def __init__(self, replike, seed=None):
+        """
+        replike so Cesta objekti z enako cesto (dolzina, pasovi, omejitve, ovire,
+        p_zaviranje, lookahead, truck cap); vozila se prepisejo v skupne tabele.
+        """
+        if not replike:
+            raise ValueError("Ansambel potrebuje vsaj eno repliko")
+        prva = replike[0]
+        for cesta in replike:
+            if _cesta(cesta) != _cesta(prva):
+                raise ValueError("Vse replike morajo imeti enako cesto (dolzina, pasovi, omejitve, ovire, "
+                                 "p_zaviranje, lookahead, truck cap)")
+        self.dolzina_ceste = prva.dolzina_ceste
+        self.st_pasov = prva.st_pasov
+        self.st_replik = len(replike)
+        self.p_zaviranje = prva.p_zaviranje
+        self.lookahead = prva.lookahead
+        self.truck_cap_enabled = prva.truck_cap_enabled
+        self.truck_max_speed = prva.truck_max_speed
+        self.cas = 0
+        self.rng = np.random.default_rng(seed)
+
+        # omejitve in ovire so skupne, ovire podvojimo za vsako repliko
+        self.omejitve = prva.omejitve.kopija()
+        self._omejitve_np = self.omejitve.tabela
+        self._limit_tabela = self.omejitve.tabela_limitov(self.lookahead)
+        ovire_pas = np.array([o.pas for o in prva.ovire], dtype=np.int64)
+        ovire_poz = np.array([o.poz for o in prva.ovire], dtype=np.int64)
+        self.ovire = [(o.poz, o.pas) for o in prva.ovire]
+        odmiki = np.repeat(np.arange(self.st_replik) * self.st_pasov, len(ovire_poz))
+        self._ovire_seg = odmiki + np.tile(ovire_pas, self.st_replik)
+        self._ovire_poz = np.tile(ovire_poz, self.st_replik)
+
+        def stolpec(ime):
+            return np.concatenate([getattr(c.avti, ime).astype(np.int64) for c in replike])
+
+        self.poz = stolpec("poz")
+        self.pas = stolpec("pas")
+        self.hitrost = stolpec("hitrost")
+        self.max_hitrost = stolpec("max_hitrost")
+        self.max_hitrost_base = stolpec("max_hitrost_base")
+        self.dolzina = stolpec("dolzina")
+        self.tip = stolpec("tip")
+        self.replika = np.repeat(np.arange(self.st_replik), [len(c.avti) for c in replike])
+        self._odmik = self.replika * self.st_pasov
+
+    @classmethod
+    def iz_predloge(cls, predloga, st_replik, gostota=0.1, max_hitrost=5, max_hitrost_interval=None,
+                    delez_tovornjakov=0.2, seed=None):
+        """
+        Naredi st_replik replik ceste predloga (omejitve, ovire, truck cap) in vsako
+        nakljucno napolni z random_vozila; vsaka replika dobi svoj seed.
+        """
+        semena = np.random.SeedSequence(seed).spawn(st_replik + 1)
+        replike = []
+        for seme in semena[:st_replik]:
+            cesta = Cesta(
+                dolzina_ceste=predloga.dolzina_ceste,
+                p_zaviranje=predloga.p_zaviranje,
+                lookahead=predloga.lookahead,
+                engine="numpy",
+                st_pasov=predloga.st_pasov,
+                seed=seme,
+            )
+            cesta.omejitve = predloga.omejitve.kopija()
+            for ovira in predloga.ovire:
+                cesta.add_obstacle(ovira.poz, ovira.pas)
+            cesta.set_truck_cap(predloga.truck_cap_enabled, max_speed=predloga.truck_max_speed)
+            cesta.random_vozila(
+                max_hitrost=max_hitrost,
+                max_hitrost_interval=max_hitrost_interval,
+                gostota=gostota,
+                delez_tovornjakov=delez_tovornjakov,
+            )
+            replike.append(cesta)
+        return cls(replike, seed=semena[-1])
+
+    def __len__(self):
+        return len(self.poz)
+
+    def korak_simulacije(self, koraki=1):
+        """Premakne vse replike za koraki korakov."""
+        for _ in range(koraki):
+            if len(self.poz):
+                p = self.rng.random(len(self.poz))
+                self.pas, self.hitrost, self.poz = korak_tabel(
+                    self.dolzina_ceste, self.st_pasov, self.lookahead, self.p_zaviranje,
+                    self.poz, self.pas, self.hitrost, self.max_hitrost, self.dolzina,
+                    self._ovire_seg, self._ovire_poz, self._omejitve_np, self._limit_tabela, p,
+                    st_segmentov=self.st_replik * self.st_pasov,
+                    odmik=self._odmik,
+                )
+            self.cas += 1
+
+    def opazovanke(self):
+        """
+        Vrne slovar z opazovankami po replikah (tabele dolzine st_replik) in
+        zdruzenimi vrednostmi (povprecje, std, napaka povprecja) cez replike.
+        """
+        celice = self.dolzina_ceste * self.st_pasov
+        st_vozil = np.bincount(self.replika, minlength=self.st_replik)
+        vsota_hitrosti = np.bincount(self.replika, weights=self.hitrost, minlength=self.st_replik)
+        stojijo = np.bincount(self.replika, weights=self.hitrost == 0, minlength=self.st_replik)
+        imajo = np.maximum(st_vozil, 1)
+        replike = {
+            "st_vozil": st_vozil,
+            "gostota": st_vozil / celice,
+            "povprecna_hitrost": vsota_hitrosti / imajo,
+            "pretok": vsota_hitrosti / celice,
+            "delez_stojecih": stojijo / imajo,
+        }
+        skupaj = {}
+        for ime, vrednosti in replike.items():
+            std = float(vrednosti.std(ddof=1)) if self.st_replik > 1 else 0.0
+            skupaj[ime] = {
+                "povprecje": float(vrednosti.mean()),
+                "std": std,
+                "napaka": std / float(np.sqrt(self.st_replik)),
+            }
+        return {"cas": self.cas, "replike": replike, "skupaj": skupaj}
+
+    def replika_cesta(self, r):
+        """Vrne samostojno Cesta (numpy engine) s trenutnim stanjem replike r, npr. za izris."""
+        cesta = Cesta(
+            dolzina_ceste=self.dolzina_ceste,
+            p_zaviranje=self.p_zaviranje,
+            lookahead=self.lookahead,
+            engine="numpy",
+            st_pasov=self.st_pasov,
+        )
+        cesta.omejitve = self.omejitve.kopija()
+        for poz, pas in self.ovire:
+            cesta.add_obstacle(poz, pas)
+        cesta.truck_cap_enabled = self.truck_cap_enabled
+        cesta.truck_max_speed = self.truck_max_speed
+        izbor = self.replika == r
+        cesta.avti.dodaj_vec(self.poz[izbor], self.pas[izbor], self.max_hitrost_base[izbor], self.tip[izbor],
+                             hitrost=self.hitrost[izbor])
+        cesta.avti.max_hitrost[:] = self.max_hitrost[izbor]
+        cesta._cesta = None
+        cesta._indeks = None
+        cesta.cas = self.cas
+        return cesta
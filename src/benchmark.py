@@ -0,0 +1,266 @@
+"""
+Meritve hitrosti koraka simulacije (koraki/s in posodobitve vozil/s).
+
+Matrika scenarijev pokriva dolzino ceste, gostoto, mesanico vozil
+(random_cars / random_vozila), stevilo ovir, pokritost z omejitvami in lookahead.
+Privzeto spreminjamo eno os naenkrat okoli osnovnega scenarija (--polno da vse
+kombinacije). Za vsak scenarij preverimo, da oba enginea z istim seedom dajeta
+enake trajektorije, rezultate pa zapisemo v JSON.
+
+Primer:
+    python -m src.benchmark --izhod bench.json
+    python -m src.benchmark --dolzina 1000 100000 --engine numpy --primerjaj bench.json
+    python -m src.benchmark --uvoz
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from src.tools import Cesta, ENGINES
+
+OSNOVA = {
+    "dolzina": 10000,
+    "gostota": 0.2,
+    "postavitev": "random_vozila",
+    "st_ovir": 0,
+    "pokritost_omejitev": 0.0,
+    "lookahead": 15,
+}
+
+OSI = {
+    "dolzina": [1000, 10000, 100000, 1000000],
+    "gostota": [0.05, 0.2, 0.5],
+    "postavitev": ["random_cars", "random_vozila"],
+    "st_ovir": [0, 10, 100],
+    "pokritost_omejitev": [0.0, 0.1, 0.5],
+    "lookahead": [5, 15, 50],
+}
+
+DOLZINA_OMEJITVE = 100
+
+
+def scenarij(engine, dolzina, gostota, postavitev, st_ovir, pokritost_omejitev, lookahead, seed=0, st_pasov=2):
+    """Zgradi ponovljiv scenarij; ovire in omejitve so odvisne le od seeda, ne od enginea."""
+    rng = np.random.default_rng(seed)
+    st_omejitev = int(pokritost_omejitev * dolzina) // DOLZINA_OMEJITVE
+    zacetki = np.sort(rng.choice(dolzina // DOLZINA_OMEJITVE, size=st_omejitev, replace=False)) * DOLZINA_OMEJITVE
+    omejitve = [
+        {"od": int(od), "do": int(od) + DOLZINA_OMEJITVE, "max_hitrost": int(rng.integers(2, 5))}
+        for od in zacetki
+    ]
+    model = Cesta(
+        dolzina_ceste=dolzina,
+        omejitve=omejitve,
+        lookahead=lookahead,
+        engine=engine,
+        st_pasov=st_pasov,
+        seed=seed,
+    )
+    for poz, pas in zip(rng.integers(0, dolzina, st_ovir).tolist(), rng.integers(0, st_pasov, st_ovir).tolist()):
+        model.add_obstacle(poz, pas)
+    getattr(model, postavitev)(gostota=gostota, max_hitrost_interval=(3, 7))
+    return model
+
+
+def _stanje(model):
+    avti = model.avti
+    return np.stack([avti.poz, avti.pas, avti.hitrost])
+
+
+def preveri_enakost(nastavitve, koraki=20, seed=0):
+    """Ali vsi engini z istim seedom dajo enake pozicije, pasove in hitrosti v vsakem koraku."""
+    modeli = [scenarij(engine, seed=seed, **nastavitve) for engine in ENGINES]
+    for _ in range(koraki + 1):
+        prvo = _stanje(modeli[0])
+        if any(not np.array_equal(prvo, _stanje(m)) for m in modeli[1:]):
+            return False
+        for m in modeli:
+            m.korak_simulacije()
+    return True
+
+
+def izmeri(engine, nastavitve, min_cas=1.0, max_koraki=200, seed=0):
+    """Stopa model, dokler ne mine min_cas ali max_koraki; vrne vrstico z meritvami."""
+    zacetek = time.perf_counter()
+    model = scenarij(engine, seed=seed, **nastavitve)
+    cas_priprave = time.perf_counter() - zacetek
+    # prvi korak zgradi tabele limitov, zato ga ne stejemo
+    model.korak_simulacije()
+    koraki = 0
+    zacetek = time.perf_counter()
+    while True:
+        model.korak_simulacije()
+        koraki += 1
+        cas = time.perf_counter() - zacetek
+        if cas >= min_cas or koraki >= max_koraki:
+            break
+    n = len(model.avti)
+    vrstica = dict(nastavitve)
+    vrstica.update({
+        "engine": engine,
+        "st_vozil": n,
+        "koraki": koraki,
+        "cas_s": cas,
+        "koraki_na_s": koraki / cas,
+        "posodobitve_na_s": koraki * n / cas,
+        "priprava_s": cas_priprave,
+    })
+    return vrstica
+
+
+def matrika(osi=None, polno=False):
+    """
+    Seznam nastavitev: vsaka os posebej okoli osnovnega scenarija ali (polno) vse
+    kombinacije. Os z eno samo podano vrednostjo spremeni tudi osnovni scenarij.
+    """
+    osnova = dict(OSNOVA)
+    osnova.update({k: v[0] for k, v in (osi or {}).items() if len(v) == 1})
+    osi = {**OSI, **(osi or {})}
+    if polno:
+        kljuci = list(OSNOVA)
+        return [dict(zip(kljuci, vrednosti)) for vrednosti in itertools.product(*(osi[k] for k in kljuci))]
+    nastavitve = []
+    for os_, vrednosti in osi.items():
+        for vrednost in vrednosti:
+            tocka = dict(osnova, **{os_: vrednost})
+            if tocka not in nastavitve:
+                nastavitve.append(tocka)
+    return nastavitve
+
+
+def pozeni(nastavitve, engini=ENGINES, min_cas=1.0, max_koraki=200, preveri=True, max_python_dolzina=100000,
+           seed=0, izpis=None):
+    rezultati = []
+    for tocka in nastavitve:
+        # pythonski engine je na najdaljsih cestah prepocasen za smiselno meritev
+        izbrani = [e for e in engini if e != "python" or tocka["dolzina"] <= max_python_dolzina]
+        enaki = preveri_enakost(tocka, seed=seed) if preveri and len(izbrani) == len(ENGINES) else None
+        for engine in izbrani:
+            vrstica = izmeri(engine, tocka, min_cas=min_cas, max_koraki=max_koraki, seed=seed)
+            vrstica["enake_trajektorije"] = enaki
+            rezultati.append(vrstica)
+            if izpis:
+                print(
+                    f"{engine:>6} L={tocka['dolzina']:<8} gostota={tocka['gostota']:<5} {tocka['postavitev']:<13} "
+                    f"ovire={tocka['st_ovir']:<4} omejitve={tocka['pokritost_omejitev']:<4} "
+                    f"lookahead={tocka['lookahead']:<3} {vrstica['koraki_na_s']:10.1f} koraki/s "
+                    f"{vrstica['posodobitve_na_s']:12.0f} vozil/s enaki={enaki}",
+                    file=izpis,
+                )
+    return rezultati
+
+
+def cas_uvoza(modul, ponovitve=5):
+    """
+    Najkrajsi cas uvoza modula v svezem procesu in ali se je pri tem nalozil matplotlib.
+    Tako lahko primerjamo zagon jedra (src.tools, app) z izrisom (src.vizualizacija).
+    """
+    koda = (
+        "import sys, time; t = time.perf_counter(); import {}; "
+        "print(time.perf_counter() - t, 'matplotlib' in sys.modules)"
+    ).format(modul)
+    casi = []
+    for _ in range(ponovitve):
+        izhod = subprocess.run([sys.executable, "-c", koda], capture_output=True, text=True, check=True)
+        cas, matplotlib = izhod.stdout.split()
+        casi.append(float(cas))
+    return {"modul": modul, "cas_s": min(casi), "matplotlib": matplotlib == "True"}
+
+
+def _kljuc(vrstica):
+    return tuple(vrstica[k] for k in OSNOVA) + (vrstica["engine"],)
+
+
+def primerjaj(rezultati, prejsnji, prag=0.8):
+    """Vrne vrstice, ki so glede na prejsnje meritve pocasnejse od prag * prej."""
+    prej = {_kljuc(v): v for v in prejsnji}
+    slabse = []
+    for vrstica in rezultati:
+        stara = prej.get(_kljuc(vrstica))
+        if stara and vrstica["koraki_na_s"] < prag * stara["koraki_na_s"]:
+            slabse.append((vrstica, stara["koraki_na_s"]))
+    return slabse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Meritve hitrosti koraka simulacije.")
+    parser.add_argument("--dolzina", nargs="+", type=int)
+    parser.add_argument("--gostota", nargs="+", type=float)
+    parser.add_argument("--postavitev", nargs="+", choices=OSI["postavitev"])
+    parser.add_argument("--st_ovir", nargs="+", type=int)
+    parser.add_argument("--pokritost_omejitev", nargs="+", type=float)
+    parser.add_argument("--lookahead", nargs="+", type=int)
+    parser.add_argument("--engine", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--polno", action="store_true", help="vse kombinacije namesto ene osi naenkrat")
+    parser.add_argument("--min_cas", type=float, default=1.0, help="najmanjsi cas meritve na scenarij (s)")
+    parser.add_argument("--max_koraki", type=int, default=200)
+    parser.add_argument("--max_python_dolzina", type=int, default=100000)
+    parser.add_argument("--brez_preverjanja", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--izhod", help="JSON datoteka z rezultati")
+    parser.add_argument("--primerjaj", help="prejsnji JSON; izhodna koda 1 ob padcu hitrosti")
+    parser.add_argument("--prag", type=float, default=0.8)
+    parser.add_argument("--uvoz", nargs="*", metavar="MODUL",
+                        help="izmeri le cas uvoza modulov (privzeto src.tools app src.vizualizacija)")
+    args = parser.parse_args(argv)
+
+    if args.uvoz is not None:
+        moduli = args.uvoz or ["src.tools", "app", "src.vizualizacija"]
+        uvozi = [cas_uvoza(modul) for modul in moduli]
+        for vrstica in uvozi:
+            print(f"{vrstica['modul']:<20} {vrstica['cas_s'] * 1000:8.1f} ms matplotlib={vrstica['matplotlib']}",
+                  file=sys.stderr)
+        print(json.dumps({"uvozi": uvozi}, indent=2))
+        return 0
+
+    osi = {k: getattr(args, k) for k in OSI if getattr(args, k)}
+    rezultati = pozeni(
+        matrika(osi, polno=args.polno),
+        engini=args.engine,
+        min_cas=args.min_cas,
+        max_koraki=args.max_koraki,
+        preveri=not args.brez_preverjanja,
+        max_python_dolzina=args.max_python_dolzina,
+        seed=args.seed,
+        izpis=sys.stderr,
+    )
+    porocilo = {
+        "sistem": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platforma": platform.platform(),
+            "procesor": platform.processor(),
+            "cas": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "seed": args.seed,
+        "rezultati": rezultati,
+    }
+    besedilo = json.dumps(porocilo, indent=2)
+    if args.izhod:
+        with open(args.izhod, "w") as datoteka:
+            datoteka.write(besedilo)
+    else:
+        print(besedilo)
+
+    koda = 0
+    if any(v["enake_trajektorije"] is False for v in rezultati):
+        print("NAPAKA: engini dajo razlicne trajektorije", file=sys.stderr)
+        koda = 1
+    if args.primerjaj:
+        with open(args.primerjaj) as datoteka:
+            prejsnji = json.load(datoteka)["rezultati"]
+        for vrstica, stara in primerjaj(rezultati, prejsnji, args.prag):
+            print(f"POCASNEJE: {_kljuc(vrstica)} {vrstica['koraki_na_s']:.1f} koraki/s (prej {stara:.1f})",
+                  file=sys.stderr)
+            koda = 1
+    return koda
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Navidezni detektorji prometa, ki jih Cesta posodobi po vsakem koraku
+(Cesta.dodaj_detektor). Vsak hrani le drsno okno zadnjih meritev, zato je
+pomnilnik stalen, posodobitev okna pa O(1) ne glede na dolzino teka. Vozila
+enkrat na korak uredimo po (pas, poz), detektor pa z bisekcijo pregleda le
+vozila v svojem oknu.
+"""
+import numpy as np
+
+
+class DrsnoOkno:
+    """Zadnjih velikost vrstic po k celih kolicin in njihove sprotne vsote."""
+    def __init__(self, velikost, k):
+        self.velikost = velikost
+        self._vrstice = np.zeros((velikost, k), dtype=np.int64)
+        self.vsote = np.zeros(k, dtype=np.int64)
+        self.polno = 0  # koliko vrstic je ze zapisanih (najvec velikost)
+        self._i = 0
+
+    def dodaj(self, vrednosti):
+        vrednosti = np.asarray(vrednosti, dtype=np.int64)
+        self.vsote += vrednosti - self._vrstice[self._i]
+        self._vrstice[self._i] = vrednosti
+        self._i = (self._i + 1) % self.velikost
+        self.polno = min(self.polno + 1, self.velikost)
+
+
+class UrejenaVozila:
+    """Stolpci vozil, urejeni po kljucu pas * L + poz; zgradimo jih enkrat na korak za vse detektorje."""
+    def __init__(self, model):
+        avti = model.avti
+        self.dolzina_ceste = L = model.dolzina_ceste
+        self.st_pasov = model.st_pasov
+        kljuc = avti.pas.astype(np.int64) * L + avti.poz
+        red = np.argsort(kljuc, kind="stable")
+        self.kljuci = kljuc[red]
+        self.poz = avti.poz[red].astype(np.int64)
+        self.hitrost = avti.hitrost[red].astype(np.int64)
+        self.dolzina = avti.dolzina[red].astype(np.int64)
+        # najvec celic pred glavo, kjer je vozilo lahko zeleno zanki (prehod ali zasedenost)
+        self.doseg = int(max(self.hitrost.max(), self.dolzina.max())) if len(red) else 0
+
+    def v_oknu(self, pas, od, dolzina):
+        """Indeksi vozil z glavo v kroznem oknu [od, od + dolzina) pasu pas (None = vsi pasovi)."""
+        L = self.dolzina_ceste
+        od %= L
+        dolzina = min(dolzina, L)
+        levo, desno = [], []
+        for p in (range(self.st_pasov) if pas is None else (pas,)):
+            levo.append(p * L + od)
+            desno.append(p * L + min(od + dolzina, L))
+            if od + dolzina > L:
+                levo.append(p * L)
+                desno.append(p * L + od + dolzina - L)
+        levo = np.searchsorted(self.kljuci, levo).tolist()
+        desno = np.searchsorted(self.kljuci, desno).tolist()
+        return np.concatenate([np.arange(a, b) for a, b in zip(levo, desno)])
+
+
+class Zanka:
+    """
+    Tockovni detektor (indukcijska zanka) v celici poz, v pasu pas ali v vseh pasovih
+    (pas=None). Steje vozila, ki so v koraku z glavo prevozila poz, in korake, ko je
+    celica zasedena.
+    """
+    tip = "zanka"
+
+    def __init__(self, poz, pas=None, okno=60):
+        self.id = None
+        self.poz = poz
+        self.pas = pas
+        # prehodi, vsota hitrosti prehodov, zasedeni pasovi v celici
+        self.okno = DrsnoOkno(okno, 3)
+
+    def posodobi(self, model, urejena=None):
+        if urejena is None:
+            urejena = UrejenaVozila(model)
+        L = model.dolzina_ceste
+        # kandidati imajo glavo najvec doseg celic za zanko
+        izbor = urejena.v_oknu(self.pas, self.poz, urejena.doseg)
+        poz = urejena.poz[izbor]
+        hitrost = urejena.hitrost[izbor]
+        # glava se je premaknila s poz - hitrost na poz; zanko je prevozila, ce je vmes
+        razdalja = (self.poz - poz + hitrost) % L
+        prevozili = (razdalja >= 1) & (razdalja <= hitrost)
+        zasedeno = (poz - self.poz) % L < urejena.dolzina[izbor]
+        self.okno.dodaj((
+            np.count_nonzero(prevozili),
+            int(hitrost[prevozili].sum()),
+            np.count_nonzero(zasedeno),
+        ))
+
+    def porocilo(self, model):
+        prehodi, vsota_hitrosti, zasedeno = self.okno.vsote.tolist()
+        koraki = self.okno.polno
+        st_pasov = model.st_pasov if self.pas is None else 1
+        return {
+            "id": self.id,
+            "tip": self.tip,
+            "poz": self.poz,
+            "pas": self.pas,
+            "okno": self.okno.velikost,
+            "koraki": koraki,
+            "prehodi": prehodi,
+            "pretok": prehodi / koraki if koraki else 0.0,  # vozil na korak
+            "zasedenost": zasedeno / (koraki * st_pasov) if koraki else 0.0,
+            "povprecna_hitrost": vsota_hitrosti / prehodi if prehodi else None,
+        }
+
+
+class Odsek:
+    """
+    Detektor na odseku [od, do) v pasu pas ali v vseh pasovih; steje vozila z glavo
+    na odseku, njihove hitrosti in stojeca vozila (dolzina vrste).
+    """
+    tip = "odsek"
+
+    def __init__(self, od, do, pas=None, okno=60):
+        self.id = None
+        self.od = od
+        self.do = do
+        self.pas = pas
+        # vozila, vsota hitrosti, stojeca vozila
+        self.okno = DrsnoOkno(okno, 3)
+        self.zadnje = (0, 0, 0)
+
+    def dolzina(self, L):
+        # od == do (po modulu L) pomeni cel krog
+        return (self.do - self.od - 1) % L + 1
+
+    def posodobi(self, model, urejena=None):
+        if urejena is None:
+            urejena = UrejenaVozila(model)
+        # odsek je lahko tudi cez konec kroga (do < od)
+        hitrost = urejena.hitrost[urejena.v_oknu(self.pas, self.od, self.dolzina(model.dolzina_ceste))]
+        self.zadnje = (len(hitrost), int(hitrost.sum()), int(np.count_nonzero(hitrost == 0)))
+        self.okno.dodaj(self.zadnje)
+
+    def porocilo(self, model):
+        vozila, vsota_hitrosti, stojijo = self.okno.vsote.tolist()
+        koraki = self.okno.polno
+        celice = self.dolzina(model.dolzina_ceste) * (model.st_pasov if self.pas is None else 1)
+        return {
+            "id": self.id,
+            "tip": self.tip,
+            "od": self.od,
+            "do": self.do,
+            "pas": self.pas,
+            "okno": self.okno.velikost,
+            "koraki": koraki,
+            "gostota": vozila / (koraki * celice) if koraki else 0.0,  # vozil na celico
+            "pretok": vsota_hitrosti / (koraki * celice) if koraki else 0.0,
+            "povprecna_hitrost": vsota_hitrosti / vozila if vozila else None,
+            "dolzina_vrste": stojijo / koraki if koraki else 0.0,  # povprecno stojecih vozil
+            "trenutno": dict(zip(("vozila", "vsota_hitrosti", "stojijo"), self.zadnje)),
+        }
+
+
+def odseki_omejitev(model, okno=60):
+    """Po en Odsek za vsak odsek z omejitvijo hitrosti."""
+    return [Odsek(od, do, okno=okno) for od, do, _ in model.omejitve.intervali()]
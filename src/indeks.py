@@ -0,0 +1,85 @@
+from bisect import bisect_left
+
+
+class IndeksPasu:
+    """
+    Urejen seznam objektov (vozil in ovir) v enem pasu po poziciji glave.
+    Objekt zaseda celice od glava - dolzina + 1 do glava (krozno).
+    """
+    def __init__(self, dolzina_ceste):
+        self.dolzina_ceste = dolzina_ceste
+        self.glave = []
+        self.objekti = []
+
+    def __len__(self):
+        return len(self.glave)
+
+    def dodaj(self, obj):
+        i = bisect_left(self.glave, obj.poz)
+        self.glave.insert(i, obj.poz)
+        self.objekti.insert(i, obj)
+
+    def odstrani(self, obj):
+        i = bisect_left(self.glave, obj.poz)
+        while i < len(self.glave) and self.glave[i] == obj.poz:
+            if self.objekti[i] is obj:
+                self.glave.pop(i)
+                self.objekti.pop(i)
+                return True
+            i += 1
+        return False
+
+    def nastavi(self, glave, objekti):
+        # ze urejene glave (npr. iz numpy koraka)
+        self.glave = glave
+        self.objekti = objekti
+
+    def preuredi(self):
+        """Po premiku osvezi glave; vrstni red v pasu se ohrani, lahko se le zavrti."""
+        glave = [obj.poz for obj in self.objekti]
+        padci = [i for i in range(1, len(glave)) if glave[i] < glave[i - 1]]
+        if len(padci) == 1:
+            k = padci[0]
+            glave = glave[k:] + glave[:k]
+            self.objekti = self.objekti[k:] + self.objekti[:k]
+        elif padci:
+            red = sorted(range(len(glave)), key=glave.__getitem__)
+            glave = [glave[i] for i in red]
+            self.objekti = [self.objekti[i] for i in red]
+        self.glave = glave
+
+    def _rep(self, i):
+        return self.glave[i] - self.objekti[i].dolzina + 1
+
+    def naslednji(self, x):
+        """Vrne (razdalja, objekt) do prve zasedene celice od x naprej (x vkljucno)."""
+        if not self.glave:
+            return None, None
+        i = bisect_left(self.glave, x)
+        if i == len(self.glave):
+            i = 0
+            rep = self._rep(0) + self.dolzina_ceste
+        else:
+            rep = self._rep(i)
+        return max(x, rep) - x, self.objekti[i]
+
+    def prejsnji(self, y):
+        """Vrne (razdalja, objekt) do prve zasedene celice od y nazaj (y vkljucno)."""
+        if not self.glave:
+            return None, None
+        L = self.dolzina_ceste
+        i = bisect_left(self.glave, y)
+        # y je lahko znotraj objekta, katerega glava je naprej
+        if i == len(self.glave):
+            if self._rep(0) + L <= y:
+                return 0, self.objekti[0]
+        elif self._rep(i) <= y:
+            return 0, self.objekti[i]
+        j = i - 1
+        glava = self.glave[j] if j >= 0 else self.glave[j] - L
+        return y - glava, self.objekti[j]
+
+    def na_celici(self, c):
+        """Vrne objekt, ki zaseda celico c, ali None."""
+        razdalja, obj = self.naslednji(c)
+        return obj if razdalja == 0 else None
@@ -0,0 +1,83 @@
+"""
+Neobvezno merjenje trajanja faz koraka, stevcev in histogramov.
+
+Ko je izklopljeno, vsak klic le preveri zastavico, zato ga lahko pustimo v koraku.
+"""
+import time
+from contextlib import contextmanager
+
+# histogram trajanj: vedro k steje trajanja do 2**k mikrosekund
+ST_VEDER = 32
+
+
+class Faza:
+    __slots__ = ("stevilo", "skupaj", "najvec", "vedra")
+
+    def __init__(self):
+        self.stevilo = 0
+        self.skupaj = 0.0
+        self.najvec = 0.0
+        self.vedra = [0] * ST_VEDER
+
+    def dodaj(self, trajanje):
+        self.stevilo += 1
+        self.skupaj += trajanje
+        if trajanje > self.najvec:
+            self.najvec = trajanje
+        self.vedra[min(int(trajanje * 1e6).bit_length(), ST_VEDER - 1)] += 1
+
+    def porocilo(self):
+        return {
+            "stevilo": self.stevilo,
+            "skupaj_s": self.skupaj,
+            "povprecje_s": self.skupaj / self.stevilo if self.stevilo else 0.0,
+            "najvec_s": self.najvec,
+            # [zgornja meja v mikrosekundah, stevilo] le za neprazna vedra
+            "histogram_us": [[2 ** k, n] for k, n in enumerate(self.vedra) if n],
+        }
+
+
+class Instrumentacija:
+    def __init__(self, vklopljeno=False):
+        self.vklopljeno = vklopljeno
+        self.ponastavi()
+
+    def ponastavi(self):
+        self.faze = {}
+        self.stevci = {}
+
+    def zacni(self):
+        """Vrne zacetni cas faze (ali 0, ce merjenje ni vklopljeno)."""
+        return time.perf_counter() if self.vklopljeno else 0
+
+    def koncaj(self, ime, zacetek):
+        if self.vklopljeno:
+            self.zabelezi(ime, time.perf_counter() - zacetek)
+
+    def zabelezi(self, ime, trajanje):
+        """Doda ze izmerjeno trajanje faze (npr. izmerjeno v drugi niti)."""
+        if not self.vklopljeno:
+            return
+        faza = self.faze.get(ime)
+        if faza is None:
+            faza = self.faze[ime] = Faza()
+        faza.dodaj(trajanje)
+
+    @contextmanager
+    def faza(self, ime):
+        zacetek = self.zacni()
+        try:
+            yield
+        finally:
+            self.koncaj(ime, zacetek)
+
+    def stej(self, ime, n=1):
+        if self.vklopljeno:
+            self.stevci[ime] = self.stevci.get(ime, 0) + int(n)
+
+    def porocilo(self):
+        return {
+            "vklopljeno": self.vklopljeno,
+            "faze": {ime: faza.porocilo() for ime, faza in self.faze.items()},
+            "stevci": dict(self.stevci),
+        }
@@ -0,0 +1,240 @@
+"""
+Izvajalnik koraka simulacije v lastni niti.
+
+Model spreminja le nit izvajalnika: ukazi (npr. iz HTTP zahtevkov) gredo v vrsto
+in se izvedejo med koraki. Bralci dobijo zadnji posnetek stanja (Cesta.posnetek),
+ne da bi cakali na korak ali ga ustavili. Dolge teke (Posel) nit izvaja korak za
+korakom, zato ukazi in posnetki med njimi ne cakajo.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+# posnetek med tekom objavimo najvec tolikokrat na sekundo
+POSNETKI_NA_SEKUNDO = 100
+# koliko koncanih poslov si izvajalnik se zapomni
+MAX_KONCANIH_POSLOV = 50
+
+
+class Posel:
+    """Premik modela za koraki korakov ali do casa do_casa; napredek bere katerakoli nit."""
+    def __init__(self, koraki=None, do_casa=None):
+        if (koraki is None) == (do_casa is None):
+            raise ValueError("Podaj natanko enega od koraki in do_casa")
+        self.id = uuid.uuid4().hex
+        self.zahtevani_koraki = koraki
+        self.do_casa = do_casa
+        self.stanje = "caka"  # caka, tece, koncan, preklican, napaka
+        self.napaka = None
+        self.zacetni_cas = None
+        self.cilj = None
+        self.narejeni = 0
+        self.zacetek = None
+        self.konec = None
+        self._preklic = False
+
+    @property
+    def koncan(self):
+        return self.stanje in ("koncan", "preklican", "napaka")
+
+    def preklici(self):
+        """Posel se ustavi pred naslednjim korakom; ze narejeni koraki ostanejo."""
+        self._preklic = True
+
+    def _zacni(self, cas):
+        self.zacetni_cas = cas
+        self.cilj = cas + self.zahtevani_koraki if self.do_casa is None else self.do_casa
+        self.zacetek = time.perf_counter()
+        self.stanje = "tece"
+
+    def _koncaj(self, stanje, napaka=None):
+        self.stanje = stanje
+        self.napaka = napaka
+        self.konec = time.perf_counter()
+
+    def porocilo(self):
+        skupaj = None if self.cilj is None else max(self.cilj - self.zacetni_cas, 0)
+        trajanje = None if self.zacetek is None else (self.konec or time.perf_counter()) - self.zacetek
+        hitrost = self.narejeni / trajanje if trajanje else 0.0
+        eta = None
+        if self.stanje == "tece" and hitrost:
+            eta = (skupaj - self.narejeni) / hitrost
+        return {
+            "id": self.id,
+            "stanje": "preklican" if self._preklic and not self.koncan else self.stanje,
+            "zacetni_cas": self.zacetni_cas,
+            "cilj": self.cilj,
+            "narejeni": self.narejeni,
+            "skupaj": skupaj,
+            "trajanje_s": trajanje,
+            "koraki_na_s": hitrost,
+            "eta_s": eta,
+            "napaka": None if self.napaka is None else str(self.napaka),
+        }
+
+
+class Izvajalnik:
+    def __init__(self, model, hitrost=0):
+        """hitrost je stevilo korakov na sekundo, ko model tece (0 = cim hitreje)."""
+        self.model = model
+        self.hitrost = hitrost
+        self.tece = False
+        self.koraki = 0  # korakov, ki jih je naredila nit izvajalnika
+        self.napaka = None  # zadnja napaka pri koraku v ozadju
+        self._ukazi = queue.Queue()
+        self.posli = {}  # id -> Posel
+        self._vrsta_poslov = deque()  # posli po vrsti; spreminja jo le nit izvajalnika
+        self._konec = False
+        self._posnetek = model.posnetek()
+        self._zadnji_posnetek = time.perf_counter()
+        self._nit = threading.Thread(target=self._zanka, name="izvajalnik", daemon=True)
+        self._nit.start()
+
+    @property
+    def posnetek(self):
+        """Zadnje objavljeno stanje; branje nikoli ne caka na korak."""
+        return self._posnetek
+
+    def poslji(self, funkcija, *args, **kwargs):
+        """Doda ukaz funkcija(model, *args, **kwargs) v vrsto; vrne Future z rezultatom."""
+        if self._konec:
+            raise RuntimeError("Izvajalnik je ustavljen")
+        rezultat = Future()
+        self._ukazi.put((funkcija, args, kwargs, rezultat))
+        return rezultat
+
+    def izvedi(self, funkcija, *args, timeout=None, **kwargs):
+        """Kot poslji, le da pocaka na rezultat (ali izjemo) ukaza."""
+        return self.poslji(funkcija, *args, **kwargs).result(timeout)
+
+    def zazeni(self, hitrost=None):
+        # nastavitve spreminjamo v niti izvajalnika, da jih ne bere napol spremenjenih
+        def nastavi(model):
+            if hitrost is not None:
+                self.hitrost = hitrost
+            self.tece = True
+
+        return self.izvedi(nastavi)
+
+    def ustavi(self):
+        def nastavi(model):
+            self.tece = False
+
+        return self.izvedi(nastavi)
+
+    def dodaj_posel(self, koraki=None, do_casa=None):
+        """Doda Posel v vrsto in ga takoj vrne; posli se izvajajo eden za drugim."""
+        posel = Posel(koraki, do_casa)
+        self.posli[posel.id] = posel
+
+        def dodaj(model):
+            self._vrsta_poslov.append(posel)
+            # pozabimo najstarejse koncane posle
+            koncani = [p for p in list(self.posli.values()) if p.koncan]
+            for star in koncani[:max(len(koncani) - MAX_KONCANIH_POSLOV, 0)]:
+                del self.posli[star.id]
+
+        self.poslji(dodaj)
+        return posel
+
+    def _aktiven_posel(self):
+        for posel in list(self._vrsta_poslov):
+            if posel._preklic:
+                posel._koncaj("preklican")
+                self._vrsta_poslov.remove(posel)
+        while self._vrsta_poslov:
+            posel = self._vrsta_poslov[0]
+            if posel.stanje == "caka":
+                posel._zacni(self.model.cas)
+            if self.model.cas < posel.cilj:
+                return posel
+            posel._koncaj("koncan")
+            self._vrsta_poslov.popleft()
+            self._objavi()
+        return None
+
+    def zapri(self, timeout=None):
+        """Ustavi nit; ukazi, ki so se v vrsti, se ne izvedejo."""
+        self._konec = True
+        self._ukazi.put(None)
+        self._nit.join(timeout)
+
+    def _objavi(self, vedno=True):
+        zdaj = time.perf_counter()
+        if vedno or zdaj - self._zadnji_posnetek >= 1 / POSNETKI_NA_SEKUNDO:
+            self._posnetek = self.model.posnetek()
+            self._zadnji_posnetek = zdaj
+
+    def _izvedi_ukaz(self, ukaz):
+        funkcija, args, kwargs, rezultat = ukaz
+        if not rezultat.set_running_or_notify_cancel():
+            return
+        try:
+            rezultat.set_result(funkcija(self.model, *args, **kwargs))
+        except BaseException as napaka:
+            rezultat.set_exception(napaka)
+
+    def _zanka(self):
+        naslednji = time.perf_counter()
+        while not self._konec:
+            posel = self._aktiven_posel()
+            # ko model stoji, cakamo na ukaze; sicer le do naslednjega koraka
+            if posel is not None:
+                cakaj = 0
+            elif self.tece:
+                cakaj = naslednji - time.perf_counter() if self.hitrost else 0
+            else:
+                cakaj = None
+            try:
+                ukaz = self._ukazi.get(timeout=cakaj) if cakaj is None or cakaj > 0 else self._ukazi.get_nowait()
+            except queue.Empty:
+                ukaz = False
+            if ukaz:
+                # izvedemo vse ukaze, ki cakajo, in objavimo novo stanje
+                while ukaz:
+                    self._izvedi_ukaz(ukaz)
+                    try:
+                        ukaz = self._ukazi.get_nowait()
+                    except queue.Empty:
+                        ukaz = False
+                # ukazi, ki stanja ne spremenijo (npr. branje metrik), ne potrebujejo posnetka
+                if self.model.verzija != self._posnetek.verzija:
+                    self._objavi()
+                continue
+            if ukaz is None:
+                continue
+
+            # posel koraka cim hitreje; tek v ozadju po svoji hitrosti
+            v_ozadju = self.tece and time.perf_counter() >= naslednji
+            if posel is not None or v_ozadju:
+                try:
+                    self.model.korak_simulacije()
+                except Exception as napaka:
+                    # nit mora ostati ziva za ukaze; model ustavimo in napako shranimo
+                    self.napaka = napaka
+                    self.tece = False
+                    if posel is not None:
+                        posel._koncaj("napaka", napaka)
+                        self._vrsta_poslov.remove(posel)
+                    self._objavi()
+                    continue
+                self.koraki += 1
+                if posel is not None:
+                    posel.narejeni = self.model.cas - posel.zacetni_cas
+                self._objavi(vedno=False)
+                if v_ozadju and self.hitrost:
+                    # ce zaostajamo, ne lovimo zamujenih korakov
+                    naslednji = max(naslednji + 1 / self.hitrost, time.perf_counter())
+        # neizvedene ukaze in posle preklicemo
+        for posel in self._vrsta_poslov:
+            posel._koncaj("preklican")
+        while True:
+            try:
+                ukaz = self._ukazi.get_nowait()
+            except queue.Empty:
+                break
+            if ukaz:
+                ukaz[3].cancel()
@@ -0,0 +1,151 @@
+"""
+Omejitve hitrosti kot urejeni, neprekrivajoci se intervali [od, do).
+
+Omejitev v celici poiscemo z bisekcijo v O(log k), najmanjso omejitev na odseku
+(za lookahead) v O(log k + stevilo intervalov na odseku). Dodajanje ali brisanje
+odseka razreze le intervale, ki jih odsek prekriva. Tabelo po celicah (BREZ = ni
+omejitve) in tabelo najmanjse omejitve v lookahead oknu, ki ju uporablja numpy engine,
+zgradimo sele ob prvi uporabi; kasnejse spremembe ju popravijo le na prizadetem odseku.
+"""
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from src.vektorski_korak import BREZ, drsni_minimum
+
+
+class Omejitve:
+    def __init__(self, dolzina_ceste):
+        self.dolzina_ceste = dolzina_ceste
+        self.od = []
+        self.do = []
+        self.max_hitrost = []
+        self._tabela = None
+        self._limiti = None  # (lookahead, tabela minimumov)
+        self._intervali = ()
+
+    def __len__(self):
+        return len(self.od)
+
+    def kopija(self):
+        """Kopija intervalov; tabeli po celicah si kopija zgradi sama, ce ju potrebuje."""
+        kopija = Omejitve(self.dolzina_ceste)
+        kopija.od = list(self.od)
+        kopija.do = list(self.do)
+        kopija.max_hitrost = list(self.max_hitrost)
+        kopija._intervali = self._intervali
+        return kopija
+
+    def intervali(self):
+        """Intervali (od, do, max_hitrost), urejeni po od; sosednji imajo razlicne omejitve."""
+        if self._intervali is None:
+            self._intervali = tuple(zip(self.od, self.do, self.max_hitrost))
+        return self._intervali
+
+    @property
+    def tabela(self):
+        """Omejitev po celicah (BREZ = ni omejitve)."""
+        if self._tabela is None:
+            self._tabela = np.full(self.dolzina_ceste, BREZ, dtype=np.int64)
+            for od, do, max_hitrost in zip(self.od, self.do, self.max_hitrost):
+                self._tabela[od:do] = max_hitrost
+        return self._tabela
+
+    def tabela_limitov(self, lookahead):
+        """Najmanjsa omejitev v celicah [i, i + lookahead] za vsako celico i (BREZ = brez)."""
+        if self._limiti is None or self._limiti[0] != lookahead:
+            self._limiti = (lookahead, drsni_minimum(self.tabela, lookahead + 1))
+        return self._limiti[1]
+
+    def na_poziciji(self, pozicija):
+        """Omejitev v celici pozicija ali None."""
+        i = bisect_right(self.od, pozicija) - 1
+        if i >= 0 and pozicija < self.do[i]:
+            return self.max_hitrost[i]
+        return None
+
+    def minimum(self, od, do):
+        """Najmanjsa omejitev v celicah [od, do) (krozno, do je lahko > dolzina_ceste) ali None."""
+        L = self.dolzina_ceste
+        dolzina = do - od
+        if dolzina <= 0:
+            return None
+        if dolzina >= L:
+            return min(self.max_hitrost, default=None)
+        od %= L
+        do = od + dolzina
+        vrednosti = [self._minimum(od, min(do, L)), self._minimum(0, do - L) if do > L else None]
+        vrednosti = [v for v in vrednosti if v is not None]
+        return min(vrednosti) if vrednosti else None
+
+    def _minimum(self, od, do):
+        # intervali, ki sekajo [od, do): od prvega s koncem za od do zadnjega z zacetkom pred do
+        i = bisect_right(self.do, od)
+        j = bisect_left(self.od, do)
+        return min(self.max_hitrost[i:j], default=None)
+
+    def nastavi(self, omejitve):
+        """Zamenja vse omejitve s seznamom {od, do, max_hitrost}; kasnejse prekrijejo prejsnje."""
+        self.od, self.do, self.max_hitrost = [], [], []
+        self._tabela = None
+        self._limiti = None
+        for omejitev in omejitve:
+            self._nastavi_odsek(omejitev["od"], omejitev["do"], int(omejitev["max_hitrost"]))
+
+    def dodaj(self, od, do, max_hitrost):
+        """Omejitev max_hitrost na [od, do) prekrije obstojece omejitve na odseku."""
+        self._nastavi_odsek(od, do, int(max_hitrost))
+
+    def odstrani(self, od, do):
+        """Odstrani omejitve na [od, do); intervale, ki segajo cez rob, skrajsa."""
+        self._nastavi_odsek(od, do, None)
+
+    def _nastavi_odsek(self, od, do, max_hitrost):
+        # odsek porezemo na cesto; prazen odsek ne spremeni nicesar
+        od, do = max(od, 0), min(do, self.dolzina_ceste)
+        if od >= do:
+            return
+        self._intervali = None
+        if self._tabela is not None:
+            self._tabela[od:do] = BREZ if max_hitrost is None else max_hitrost
+            if self._limiti is not None:
+                self._popravi_limite(od, do)
+        else:
+            self._limiti = None
+        # intervale, ki sekajo [od, do), zamenjamo z ostanki levo in desno; zraven vzamemo
+        # se soseda, ki se odseka le dotikata, da ju lahko zdruzimo z novim intervalom
+        i = bisect_right(self.do, od)
+        j = bisect_left(self.od, do)
+        if i > 0 and self.do[i - 1] == od:
+            i -= 1
+        if j < len(self.od) and self.od[j] == do:
+            j += 1
+        kosi = []
+        if i < j and self.od[i] < od:
+            kosi.append((self.od[i], min(self.do[i], od), self.max_hitrost[i]))
+        if max_hitrost is not None:
+            kosi.append((od, do, max_hitrost))
+        if i < j and self.do[j - 1] > do:
+            kosi.append((max(self.od[j - 1], do), self.do[j - 1], self.max_hitrost[j - 1]))
+        nova = []
+        for kos in kosi:
+            if nova and nova[-1][1] == kos[0] and nova[-1][2] == kos[2]:
+                nova[-1] = (nova[-1][0], kos[1], kos[2])
+            else:
+                nova.append(kos)
+        self.od[i:j] = [a for a, _, _ in nova]
+        self.do[i:j] = [b for _, b, _ in nova]
+        self.max_hitrost[i:j] = [v for _, _, v in nova]
+
+    def _popravi_limite(self, od, do):
+        # sprememba celic [od, do) vpliva na minimume celic [od - lookahead, do)
+        lookahead, limiti = self._limiti
+        L = self.dolzina_ceste
+        zacetek = od - lookahead
+        if do - zacetek >= L:
+            self._limiti = (lookahead, drsni_minimum(self._tabela, lookahead + 1))
+            return
+        # okna prizadetih celic lezijo v [zacetek, do + lookahead); krozni minimum na tem
+        # izrezu je pravilen za prvih do - zacetek celic
+        celice = np.arange(zacetek, do + lookahead) % L
+        limiti[celice[:do - zacetek]] = drsni_minimum(self._tabela[celice], lookahead + 1)[:do - zacetek]
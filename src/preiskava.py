@@ -0,0 +1,201 @@
+"""
+Preiskava parametrov za fundamentalni diagram (pretok - gostota).
+
+Vsaka tocka mreze parametrov (in vsaka ponovitev) je neodvisen zagon Cesta,
+ki ga izvede delavec v bazenu procesov. Delavci ne uvozijo matplotlib.
+
+Z --stacionarno vsak zagon tece do stacionarnosti (src.stacionarnost): ogrevanje
+se doloci samo, merjenje pa traja, dokler interval zaupanja ni dovolj ozek.
+
+Primer:
+    python -m src.preiskava --gostota 0.05 0.1 0.2 0.4 --p_zaviranje 0.1 0.3 \\
+        --koraki 500 --ogrevanje 200 --ponovitve 4 --izhod diagram.csv
+    python -m src.preiskava --gostota 0.05 0.1 0.2 0.4 --stacionarno --natancnost 0.01
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.stacionarnost import do_stacionarnosti
+from src.tools import Cesta
+
+# privzete nastavitve zagona; vsak kljuc lahko nastopa tudi v mrezi
+OSNOVA = {
+    "dolzina_ceste": 1000,
+    "st_pasov": 2,
+    "gostota": 0.1,
+    "p_zaviranje": 0.3,
+    "lookahead": 15,
+    "delez_tovornjakov": 0.2,
+    "max_hitrost": 5,
+    "engine": "numpy",
+}
+
+
+def mreza_parametrov(mreza, osnova=None):
+    """Vrne seznam slovarjev nastavitev za vse kombinacije vrednosti v mrezi."""
+    nastavitve = dict(OSNOVA)
+    nastavitve.update(osnova or {})
+    for kljuc in mreza:
+        if kljuc not in nastavitve:
+            raise ValueError(f"Neznan parameter: {kljuc}")
+    kljuci = list(mreza)
+    tocke = []
+    for vrednosti in itertools.product(*(mreza[k] for k in kljuci)):
+        tocka = dict(nastavitve)
+        tocka.update(zip(kljuci, vrednosti))
+        tocke.append(tocka)
+    return tocke
+
+
+def zagon(naloga):
+    """
+    Izvede en zagon (nastavitve, seed, koraki, ogrevanje, stacionarnost) in vrne
+    vrstico rezultata. Ce stacionarnost ni None (argumenti do_stacionarnosti),
+    koraki in ogrevanje ne stejejo.
+    """
+    nastavitve, seed, koraki, ogrevanje, stacionarnost = naloga
+    zacetek = time.perf_counter()
+    model = Cesta(
+        dolzina_ceste=nastavitve["dolzina_ceste"],
+        p_zaviranje=nastavitve["p_zaviranje"],
+        lookahead=nastavitve["lookahead"],
+        engine=nastavitve["engine"],
+        st_pasov=nastavitve["st_pasov"],
+        seed=seed,
+    )
+    model.random_vozila(
+        max_hitrost=nastavitve["max_hitrost"],
+        gostota=nastavitve["gostota"],
+        delez_tovornjakov=nastavitve["delez_tovornjakov"],
+    )
+    if stacionarnost is not None:
+        return _zagon_do_stacionarnosti(model, nastavitve, seed, stacionarnost, zacetek)
+    for _ in range(ogrevanje):
+        model.korak_simulacije()
+
+    # pretok = vsota hitrosti na celico pasu, povpreceno po merjenih korakih
+    vsota_hitrosti = 0
+    for _ in range(koraki):
+        model.korak_simulacije()
+        vsota_hitrosti += int(model.avti.hitrost.sum())
+
+    st_vozil = len(model.avti)
+    celice = model.dolzina_ceste * model.st_pasov
+    vrstica = dict(nastavitve)
+    vrstica.update({
+        "seed": seed,
+        "gostota_vozil": st_vozil / celice,
+        "zasedenost": int(model.avti.dolzina.sum()) / celice,
+        "povprecna_hitrost": vsota_hitrosti / (koraki * st_vozil) if st_vozil and koraki else 0.0,
+        "pretok": vsota_hitrosti / (koraki * celice) if koraki else 0.0,
+        "st_vozil": st_vozil,
+        "cas_s": time.perf_counter() - zacetek,
+    })
+    return vrstica
+
+
+def _zagon_do_stacionarnosti(model, nastavitve, seed, stacionarnost, zacetek):
+    rezultat = do_stacionarnosti(model, **stacionarnost)
+    st_vozil = len(model.avti)
+    celice = model.dolzina_ceste * model.st_pasov
+    vrstica = dict(nastavitve)
+    vrstica.update({
+        "seed": seed,
+        "gostota_vozil": st_vozil / celice,
+        "zasedenost": int(model.avti.dolzina.sum()) / celice,
+        "povprecna_hitrost": rezultat["povprecna_hitrost"],
+        "pretok": rezultat["pretok"],
+        "st_vozil": st_vozil,
+        "stacionarno": rezultat["stacionarno"],
+        "ogrevanje_koraki": rezultat["ogrevanje_koraki"],
+        "merjeni_koraki": rezultat["merjeni_koraki"],
+        "skupaj_korakov": rezultat["skupaj_korakov"],
+        "polsirina_povprecna_hitrost": rezultat["polsirina_povprecna_hitrost"],
+        "polsirina_pretok": rezultat["polsirina_pretok"],
+        "cas_s": time.perf_counter() - zacetek,
+    })
+    return vrstica
+
+
+def preisci(mreza, osnova=None, koraki=500, ogrevanje=200, ponovitve=1, seed=0, procesi=None,
+            stacionarnost=None):
+    """
+    Pozene vse tocke mreze (vsako `ponovitve`-krat) v bazenu procesov.
+    Vsaka naloga dobi svoj seed iz SeedSequence(seed); rezultat je seznam vrstic
+    v vrstnem redu mreze. stacionarnost je slovar argumentov do_stacionarnosti
+    (lahko prazen) ali None za fiksno ogrevanje in stevilo korakov.
+    """
+    tocke = mreza_parametrov(mreza, osnova)
+    semena = np.random.SeedSequence(seed).spawn(len(tocke) * ponovitve)
+    naloge = [
+        (tocka, int(semena[i * ponovitve + j].generate_state(1)[0]), koraki, ogrevanje, stacionarnost)
+        for i, tocka in enumerate(tocke)
+        for j in range(ponovitve)
+    ]
+    if procesi == 1:
+        return [zagon(naloga) for naloga in naloge]
+    procesi = procesi or os.cpu_count() or 1
+    # vec nalog na posiljko zmanjsa rezijo pri velikem stevilu kratkih zagonov
+    velikost = max(1, len(naloge) // (4 * procesi))
+    with ProcessPoolExecutor(max_workers=procesi) as bazen:
+        return list(bazen.map(zagon, naloge, chunksize=velikost))
+
+
+def zapisi_csv(vrstice, datoteka):
+    if not vrstice:
+        return
+    stolpci = list(vrstice[0])
+    pisalec = csv.DictWriter(datoteka, fieldnames=stolpci)
+    pisalec.writeheader()
+    pisalec.writerows(vrstice)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preiskava parametrov za fundamentalni diagram.")
+    for kljuc, privzeto in OSNOVA.items():
+        parser.add_argument(f"--{kljuc}", nargs="+", type=type(privzeto), default=[privzeto])
+    parser.add_argument("--koraki", type=int, default=500, help="merjeni koraki")
+    parser.add_argument("--ogrevanje", type=int, default=200, help="koraki pred merjenjem")
+    parser.add_argument("--stacionarno", action="store_true",
+                        help="tek do stacionarnosti namesto --koraki in --ogrevanje")
+    parser.add_argument("--natancnost", type=float, default=0.02,
+                        help="relativna polsirina intervala zaupanja (s --stacionarno)")
+    parser.add_argument("--zaupanje", type=float, default=0.95)
+    parser.add_argument("--max_koraki", type=int, default=100000,
+                        help="najvec korakov zagona (s --stacionarno)")
+    parser.add_argument("--ponovitve", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--procesi", type=int, default=None)
+    parser.add_argument("--izhod", default=None, help="CSV datoteka (privzeto stdout)")
+    args = parser.parse_args(argv)
+
+    mreza = {kljuc: getattr(args, kljuc) for kljuc in OSNOVA}
+    vrstice = preisci(
+        mreza,
+        koraki=args.koraki,
+        ogrevanje=args.ogrevanje,
+        ponovitve=args.ponovitve,
+        seed=args.seed,
+        procesi=args.procesi,
+        stacionarnost=None if not args.stacionarno else {
+            "natancnost": args.natancnost,
+            "zaupanje": args.zaupanje,
+            "max_koraki": args.max_koraki,
+        },
+    )
+    if args.izhod:
+        with open(args.izhod, "w", newline="") as datoteka:
+            zapisi_csv(vrstice, datoteka)
+    else:
+        zapisi_csv(vrstice, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
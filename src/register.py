@@ -0,0 +1,166 @@
+"""
+Register simulacij: vec modelov (vsak v svojem izvajalniku) po ID-ju seje.
+
+Stevilo modelov in ocenjena poraba pomnilnika sta omejena; ko je meja presezena,
+izrinemo najdlje neuporabljene modele, najprej tiste, ki ne tecejo.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from src.izvajalnik import Izvajalnik
+
+# groba ocena porabe: celica ceste (tabela omejitev, tabele limitov),
+# celica pasu (mreza pythonskega enginea) in vozilo (stolpci z rezervo, posnetek,
+# pogledi Avto, indeks pasu)
+BAJTI_NA_CELICO = 40
+BAJTI_NA_CELICO_PASU = 8
+BAJTI_NA_VOZILO = 240
+# koliko ID-jev izrinjenih simulacij si zapomnimo (za 410 namesto 404)
+MAX_IZRINJENIH_ID = 1024
+
+
+def ocena_pomnilnika(dolzina_ceste, st_pasov, st_vozil=0):
+    """Ocena porabe pomnilnika modela v bajtih."""
+    return dolzina_ceste * (BAJTI_NA_CELICO + st_pasov * BAJTI_NA_CELICO_PASU) + st_vozil * BAJTI_NA_VOZILO
+
+
+def ocena_modela(model):
+    """ocena_pomnilnika za Cesta ali Posnetek."""
+    return ocena_pomnilnika(model.dolzina_ceste, model.st_pasov, len(model.avti))
+
+
+class Seja:
+    __slots__ = ("sim_id", "izvajalnik", "generacija", "ustvarjena", "zadnja_uporaba")
+
+    def __init__(self, sim_id, izvajalnik, generacija):
+        self.sim_id = sim_id
+        self.izvajalnik = izvajalnik
+        self.generacija = generacija
+        self.ustvarjena = self.zadnja_uporaba = time.time()
+
+    @property
+    def pomnilnik(self):
+        return ocena_modela(self.izvajalnik.posnetek)
+
+
+class Register:
+    def __init__(self, max_modelov=16, max_bajtov=1 << 30):
+        self.max_modelov = max_modelov
+        self.max_bajtov = max_bajtov
+        self.izrinjeni = 0
+        self._izrinjeni_id = OrderedDict()  # nazadnje izrinjeni ID-ji
+        self._generacija = 0  # skupna vsem sejam, da se verzije razlicnih modelov ne mesajo
+        self._seje = OrderedDict()  # sim_id -> Seja, od najdlje neuporabljene naprej
+        self._zaklep = threading.Lock()
+
+    def __len__(self):
+        return len(self._seje)
+
+    def preveri(self, pomnilnik):
+        """ValueError, ce model s tako oceno ne more biti v registru niti sam."""
+        if pomnilnik > self.max_bajtov:
+            raise ValueError(f"Model needs ~{pomnilnik} bytes, limit is {self.max_bajtov}")
+
+    def ustvari(self, model, sim_id=None):
+        """
+        Doda model (in zanj zazene izvajalnik) pod sim_id oziroma nov ID; obstojec
+        model z istim ID-jem zamenja. Vrne Seja. Ce model sam preseze pomnilnik,
+        sprozi ValueError.
+        """
+        pomnilnik = ocena_modela(model)
+        self.preveri(pomnilnik)
+        sim_id = sim_id or uuid.uuid4().hex
+        with self._zaklep:
+            zapri = []
+            stara = self._seje.pop(sim_id, None)
+            if stara is not None:
+                zapri.append(stara)
+            self._izrinjeni_id.pop(sim_id, None)
+            self._generacija += 1
+            seja = self._seje[sim_id] = Seja(sim_id, Izvajalnik(model), self._generacija)
+            zapri += self._izrini(pomnilnik)
+        # niti ustavimo izven zaklepa, saj lahko pocakamo na korak
+        for stara in zapri:
+            stara.izvajalnik.zapri()
+        return seja
+
+    def dobi(self, sim_id):
+        """Vrne Seja ali None; seja postane nazadnje uporabljena."""
+        if sim_id is None:
+            return None
+        with self._zaklep:
+            seja = self._seje.get(sim_id)
+            if seja is not None:
+                self._seje.move_to_end(sim_id)
+                seja.zadnja_uporaba = time.time()
+        return seja
+
+    def izrinjen(self, sim_id):
+        """Ali je bila simulacija sim_id izrinjena (in ni bila znova ustvarjena)."""
+        with self._zaklep:
+            return sim_id in self._izrinjeni_id
+
+    def odstrani(self, sim_id):
+        with self._zaklep:
+            seja = self._seje.pop(sim_id, None)
+        if seja is not None:
+            seja.izvajalnik.zapri()
+        return seja is not None
+
+    def zapri_vse(self):
+        with self._zaklep:
+            seje = list(self._seje.values())
+            self._seje.clear()
+        for seja in seje:
+            seja.izvajalnik.zapri()
+
+    def _izrini(self, nov_pomnilnik):
+        # pod zaklepom; zadnje dodane (nove) seje ne izrinemo
+        porabe = {sim_id: seja.pomnilnik for sim_id, seja in self._seje.items()}
+        porabe[next(reversed(self._seje))] = nov_pomnilnik
+        skupaj = sum(porabe.values())
+        kandidati = list(self._seje.values())[:-1]
+        # najprej modeli, ki stojijo, nato se tisti, ki tecejo (oboji po LRU)
+        kandidati.sort(key=lambda seja: seja.izvajalnik.tece)
+        izrinjeni = []
+        for seja in kandidati:
+            if len(self._seje) <= self.max_modelov and skupaj <= self.max_bajtov:
+                break
+            del self._seje[seja.sim_id]
+            skupaj -= porabe[seja.sim_id]
+            izrinjeni.append(seja)
+            self._izrinjeni_id[seja.sim_id] = None
+        while len(self._izrinjeni_id) > MAX_IZRINJENIH_ID:
+            self._izrinjeni_id.popitem(last=False)
+        self.izrinjeni += len(izrinjeni)
+        return izrinjeni
+
+    def statistika(self):
+        with self._zaklep:
+            seje = list(self._seje.values())
+        zdaj = time.time()
+        modeli = []
+        for seja in seje:
+            posnetek = seja.izvajalnik.posnetek
+            modeli.append({
+                "sim": seja.sim_id,
+                "generacija": seja.generacija,
+                "tece": seja.izvajalnik.tece,
+                "cas": posnetek.cas,
+                "dolzina_ceste": posnetek.dolzina_ceste,
+                "st_pasov": posnetek.st_pasov,
+                "st_vozil": len(posnetek.avti),
+                "pomnilnik_b": ocena_modela(posnetek),
+                "neaktiven_s": zdaj - seja.zadnja_uporaba,
+            })
+        return {
+            "st_modelov": len(modeli),
+            "max_modelov": self.max_modelov,
+            "pomnilnik_b": sum(m["pomnilnik_b"] for m in modeli),
+            "max_bajtov": self.max_bajtov,
+            "tecejo": sum(m["tece"] for m in modeli),
+            "izrinjeni": self.izrinjeni,
+            "modeli": modeli,
+        }
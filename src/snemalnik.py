@@ -0,0 +1,135 @@
+"""
+Snemanje trajektorij za prostorsko-casovni diagram v omejenem pomnilniku.
+
+Vsak posneti korak je vrstica uint8: za vsako celico vseh pasov (pasovi drug za
+drugim) 0 = prazno, hitrost + 1 za celice vozila in OVIRA za ovire. Vrstice se
+zbirajo v kosu in se zapisejo naenkrat, po zelji v np.memmap (.npy) na disku.
+"""
+import numpy as np
+
+OVIRA = 255
+MAX_HITROST = OVIRA - 2  # vecje hitrosti zapisemo kot to
+
+
+class Snemalnik:
+    def __init__(self, model, koraki, datoteka=None, korak_casa=1, korak_prostora=1, velikost_kosa=256):
+        """
+        Prostor za koraki posnetih korakov (vsak korak_casa-ti) z zdruzenimi
+        korak_prostora celicami; datoteka je pot do .npy, sicer tabela v pomnilniku.
+        """
+        self.model = model
+        self.korak_casa = korak_casa
+        self.korak_prostora = korak_prostora
+        self.sirina_pasu = -(-model.dolzina_ceste // korak_prostora)
+        oblika = (-(-koraki // korak_casa), model.st_pasov * self.sirina_pasu)
+        if datoteka is None:
+            self.tabela = np.zeros(oblika, dtype=np.uint8)
+        else:
+            self.tabela = np.lib.format.open_memmap(datoteka, mode="w+", dtype=np.uint8, shape=oblika)
+        self.vrstice = 0  # vrstice, ze zapisane v tabelo
+        self._kos = np.zeros((min(velikost_kosa, oblika[0]) or 1, oblika[1]), dtype=np.uint8)
+        self._v_kosu = 0
+        self._klici = 0
+
+    def vrstica(self):
+        """Trenutno stanje modela kot ena vrstica tabele."""
+        model = self.model
+        L = model.dolzina_ceste
+        kode = np.zeros(model.st_pasov * L, dtype=np.uint8)
+        avti = model.avti
+        if len(avti):
+            # vse celice teles vozil: glava, glava - 1, ... (krozno)
+            dolzina = avti.dolzina.astype(np.int64)
+            zacetki = np.cumsum(dolzina) - dolzina
+            odmik = np.arange(int(dolzina.sum())) - np.repeat(zacetki, dolzina)
+            celice = (np.repeat(avti.poz.astype(np.int64), dolzina) - odmik) % L
+            celice += np.repeat(avti.pas.astype(np.int64), dolzina) * L
+            kode[celice] = np.repeat(np.minimum(avti.hitrost, MAX_HITROST) + 1, dolzina)
+        if model.ovire:
+            kode[[ovira.pas * L + ovira.poz for ovira in model.ovire]] = OVIRA
+        if self.korak_prostora > 1:
+            # v zdruzeni celici obdrzimo najvecjo kodo
+            pasovi = kode.reshape(model.st_pasov, L)
+            pasovi = np.pad(pasovi, ((0, 0), (0, self.sirina_pasu * self.korak_prostora - L)))
+            kode = pasovi.reshape(model.st_pasov, self.sirina_pasu, self.korak_prostora).max(axis=2).ravel()
+        return kode
+
+    def zapisi(self):
+        """Posname trenutno stanje (ce je na vrsti glede na korak_casa)."""
+        if self._klici % self.korak_casa == 0:
+            if self.vrstice + self._v_kosu >= len(self.tabela):
+                raise ValueError("Snemalnik je poln")
+            self._kos[self._v_kosu] = self.vrstica()
+            self._v_kosu += 1
+            if self._v_kosu == len(self._kos):
+                self._izprazni()
+        self._klici += 1
+
+    def snemaj(self, koraki):
+        """koraki krat posname stanje in naredi korak simulacije."""
+        for _ in range(koraki):
+            self.zapisi()
+            self.model.korak_simulacije()
+
+    def zakljuci(self):
+        """Zapise se neposnete vrstice in vrne posneti del tabele."""
+        self._izprazni()
+        if isinstance(self.tabela, np.memmap):
+            self.tabela.flush()
+        return self.tabela[:self.vrstice]
+
+    def _izprazni(self):
+        if self._v_kosu:
+            self.tabela[self.vrstice:self.vrstice + self._v_kosu] = self._kos[:self._v_kosu]
+            self.vrstice += self._v_kosu
+            self._v_kosu = 0
+
+
+def _sestej_bloke(x, f, os_):
+    # vsote zaporednih blokov po f elementov vzdolz osi 0 ali 1; zadnji blok je lahko krajsi
+    n = x.shape[os_]
+    polni = n // f * f
+    if os_ == 0:
+        deli = [x[:polni].reshape(polni // f, f, x.shape[1]).sum(axis=1, dtype=np.int64)]
+        if polni < n:
+            deli.append(x[polni:].sum(axis=0, dtype=np.int64, keepdims=True))
+    else:
+        deli = [x[:, :polni].reshape(len(x), polni // f, f).sum(axis=2, dtype=np.int64)]
+        if polni < n:
+            deli.append(x[:, polni:].sum(axis=1, dtype=np.int64, keepdims=True))
+    return np.concatenate(deli, axis=os_) if len(deli) > 1 else deli[0]
+
+
+def pomanjsaj(tabela, visina, sirina, max_celic=1 << 22):
+    """
+    Zmanjsa posneto tabelo na najvec visina x sirina tock; tabelo beremo po kosih
+    najvec max_celic celic. Vrne (zasedenost, hitrost): delez zasedenih celic v
+    tocki in povprecno hitrost vozil v njej (nan, ce vozil ni).
+    """
+    vrstice, stolpci = tabela.shape
+    fy = max(1, -(-vrstice // visina))
+    fx = max(1, -(-stolpci // sirina))
+    sirine = np.full(-(-stolpci // fx), fx)
+    sirine[-1] = stolpci - fx * (len(sirine) - 1)
+    zasedenost = np.zeros((-(-vrstice // fy), len(sirine)))
+    hitrost = np.full(zasedenost.shape, np.nan)
+    # kos ima celo stevilo blokov po fy vrstic
+    v_kosu = fy * max(1, max_celic // (fy * max(stolpci, 1)))
+
+    def sestej(x):
+        return _sestej_bloke(_sestej_bloke(x, fy, 0), fx, 1)
+
+    for zacetek in range(0, vrstice, v_kosu):
+        kos = np.asarray(tabela[zacetek:zacetek + v_kosu])
+        # koda vozila je hitrost + 1, zato vsoto hitrosti dobimo iz vsote kod
+        st_zasedenih = sestej(kos > 0)
+        st_ovir = sestej(kos == OVIRA)
+        st_vozil = st_zasedenih - st_ovir
+        vsota_hitrosti = sestej(kos) - OVIRA * st_ovir - st_vozil
+        visine = np.full(len(st_zasedenih), fy)
+        visine[-1] = len(kos) - fy * (len(visine) - 1)
+        izhod = slice(zacetek // fy, zacetek // fy + len(visine))
+        zasedenost[izhod] = st_zasedenih / np.outer(visine, sirine)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            hitrost[izhod] = np.where(st_vozil > 0, vsota_hitrosti / st_vozil, np.nan)
+    return zasedenost, hitrost
@@ -0,0 +1,173 @@
+"""
+Tek do stacionarnosti: sproti spremljamo opazovanke (pretok, povprecna hitrost)
+s povprecji serij (batch means), prehodni del odrezemo z MSER na povprecjih serij,
+nato tecemo, dokler interval zaupanja povprecja ni dovolj ozek.
+
+Pomnilnik je stalen: ko je serij 2 * max_serij, sosednji pari zdruzimo in
+velikost serije podvojimo. Enako storimo, ce so povprecja serij se korelirana,
+saj bi sicer interval zaupanja podcenili.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+
+def _pretok(model):
+    return float(model.avti.hitrost.sum()) / (model.dolzina_ceste * model.st_pasov)
+
+
+def _povprecna_hitrost(model):
+    return float(model.avti.hitrost.mean()) if len(model.avti) else 0.0
+
+
+# ime -> funkcija(model), izmerjena po vsakem koraku
+OPAZOVANKE = {
+    "pretok": _pretok,
+    "povprecna_hitrost": _povprecna_hitrost,
+}
+
+
+def kvantil_t(p, prostostne_stopnje):
+    """Priblizek kvantila Studentove porazdelitve (Cornish-Fisher), brez scipy."""
+    z = NormalDist().inv_cdf(p)
+    n = prostostne_stopnje
+    return z + (z ** 3 + z) / (4 * n) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * n ** 2)
+
+
+def mser(serije):
+    """Indeks d <= m // 2, pri katerem ima rep serije[d:] najmanjso MSER statistiko."""
+    m = len(serije)
+    # repi od konca naprej: vsote in vsote kvadratov za vse d naenkrat
+    vsote = np.cumsum(serije[::-1])[::-1]
+    kvadrati = np.cumsum(serije[::-1] ** 2)[::-1]
+    n = np.arange(m, 0, -1)
+    # vsota kvadratov odstopanj repa, deljena z n^2; krajsih repov od polovice ne primerjamo
+    statistika = (kvadrati - vsote ** 2 / n) / n ** 2
+    return int(np.argmin(statistika[:m // 2 + 1]))
+
+
+class PovprecjaSerij:
+    """Sprotna povprecja serij za vec opazovank, z odrezom ogrevanja po MSER."""
+    def __init__(self, st_opazovank, velikost_serije=5, max_serij=64):
+        self.velikost_serije = velikost_serije
+        self.max_serij = max_serij
+        self.serije = np.zeros((2 * max_serij, st_opazovank))
+        self.st_serij = 0
+        self._vsota = np.zeros(st_opazovank)
+        self._v_seriji = 0
+        self.ogrevanje = None  # koraki ogrevanja, ko je odrezano
+        self.koraki = 0  # vsi koraki
+
+    @property
+    def merjeni_koraki(self):
+        return self.st_serij * self.velikost_serije
+
+    @property
+    def konec_serije(self):
+        return self._v_seriji == 0
+
+    def dodaj(self, vrednosti):
+        self.koraki += 1
+        self._vsota += vrednosti
+        self._v_seriji += 1
+        if self._v_seriji < self.velikost_serije:
+            return
+        self.serije[self.st_serij] = self._vsota / self.velikost_serije
+        self.st_serij += 1
+        self._vsota[:] = 0
+        self._v_seriji = 0
+        if self.ogrevanje is None:
+            self._preveri_ogrevanje()
+        if self.st_serij == len(self.serije):
+            self.zdruzi()
+
+    def zdruzi(self):
+        """Zdruzi pare sosednjih serij (velikost serije se podvoji)."""
+        if self.st_serij % 2:
+            # liho najstarejso serijo stejemo k ogrevanju
+            self.serije[:self.st_serij - 1] = self.serije[1:self.st_serij].copy()
+            self.st_serij -= 1
+            if self.ogrevanje is not None:
+                self.ogrevanje += self.velikost_serije
+        polovica = self.st_serij // 2
+        self.serije[:polovica] = self.serije[:self.st_serij].reshape(polovica, 2, -1).mean(axis=1)
+        self.st_serij = polovica
+        self.velikost_serije *= 2
+
+    def _preveri_ogrevanje(self):
+        # prehod je koncan, ko je MSER minimum za vse opazovanke pred polovico serij;
+        # minimum na meji iskanja pomeni, da prehod se traja, zato preverimo ob naslednji seriji
+        if self.st_serij < 10:
+            return
+        serije = self.serije[:self.st_serij]
+        d = max(mser(serije[:, k]) for k in range(serije.shape[1]))
+        if d < self.st_serij // 2:
+            self.serije[:self.st_serij - d] = serije[d:].copy()
+            self.st_serij -= d
+            # ogrevanje so vsi koraki do prve obdrzane serije
+            self.ogrevanje = self.koraki - self.st_serij * self.velikost_serije
+
+    def povprecje(self):
+        return self.serije[:self.st_serij].mean(axis=0)
+
+    def avtokorelacija(self):
+        """Avtokorelacija povprecij serij z zamikom 1 za vsako opazovanko."""
+        serije = self.serije[:self.st_serij]
+        odmik = serije - serije.mean(axis=0)
+        imenovalec = (odmik ** 2).sum(axis=0)
+        stevec = (odmik[1:] * odmik[:-1]).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(imenovalec > 0, stevec / imenovalec, 0.0)
+
+    def polsirina(self, zaupanje=0.95):
+        """Polovica sirine intervala zaupanja povprecja za vsako opazovanko."""
+        m = self.st_serij
+        if m < 2:
+            return np.full(self.serije.shape[1], np.inf)
+        std = self.serije[:m].std(axis=0, ddof=1)
+        return kvantil_t(0.5 + zaupanje / 2, m - 1) * std / np.sqrt(m)
+
+
+def do_stacionarnosti(model, natancnost=0.02, zaupanje=0.95, min_serij=20, max_koraki=100000,
+                      velikost_serije=5, max_serij=64, opazovanke=None, absolutna_natancnost=1e-3,
+                      max_avtokorelacija=0.2):
+    """
+    Koraka model, dokler ni ogrevanje odrezano in je polsirina intervala zaupanja
+    za vsako opazovanko najvec natancnost * |povprecje| (ali absolutna_natancnost),
+    oziroma do max_koraki. Dokler je avtokorelacija serij vecja od max_avtokorelacija,
+    serije zdruzujemo. Vrne slovar s povprecji, polsirinami in porabljenimi koraki.
+    """
+    opazovanke = opazovanke or OPAZOVANKE
+    imena = list(opazovanke)
+    funkcije = [opazovanke[ime] for ime in imena]
+    stat = PovprecjaSerij(len(imena), velikost_serije=velikost_serije, max_serij=max_serij)
+    stacionarno = False
+    while stat.koraki < max_koraki:
+        model.korak_simulacije()
+        stat.dodaj([f(model) for f in funkcije])
+        # interval preverimo le ob koncu serije
+        if stat.ogrevanje is None or not stat.konec_serije or stat.st_serij < min_serij:
+            continue
+        if np.any(np.abs(stat.avtokorelacija()) > max_avtokorelacija):
+            if stat.st_serij >= 2 * min_serij:
+                stat.zdruzi()
+            continue
+        povprecje = stat.povprecje()
+        if np.all(stat.polsirina(zaupanje) <= np.maximum(natancnost * np.abs(povprecje), absolutna_natancnost)):
+            stacionarno = True
+            break
+    povprecje = stat.povprecje()
+    polsirina = stat.polsirina(zaupanje)
+    rezultat = {
+        "stacionarno": stacionarno,
+        "ogrevanje_koraki": stat.ogrevanje,
+        "merjeni_koraki": stat.merjeni_koraki,
+        "skupaj_korakov": stat.koraki,
+        "velikost_serije": stat.velikost_serije,
+        "st_serij": stat.st_serij,
+        "avtokorelacija": float(np.abs(stat.avtokorelacija()).max()) if stat.st_serij > 1 else None,
+    }
+    for k, ime in enumerate(imena):
+        rezultat[ime] = float(povprecje[k]) if stat.st_serij else None
+        rezultat["polsirina_" + ime] = float(polsirina[k])
+    return rezultat
@@ -0,0 +1,158 @@
+"""
+Pretvorba stanja Cesta za spletni vmesnik: JSON (polno stanje ali le spremembe
+po dani verziji, glej Cesta.verzija in Cesta.spremembe) ali kompaktni binarni zapis.
+"""
+import struct
+
+import numpy as np
+
+from src.vozila import TIPI, TIPI_VOZIL
+
+
+def _vozila(model, od=0):
+    # seznam slovarjev vozil od indeksa od naprej, zgrajen iz stolpcev
+    avti = model.avti
+    tipi = [TIPI[koda] for koda in avti.tip[od:].tolist()]
+    return [
+        {
+            "poz": poz,
+            "pas": pas,
+            "hitrost": hitrost,
+            "max_hitrost": max_hitrost,
+            "tip": tip,
+            "dolzina": dolzina,
+            "color": barva,
+        }
+        for poz, pas, hitrost, max_hitrost, tip, dolzina, barva in zip(
+            avti.poz[od:].tolist(),
+            avti.pas[od:].tolist(),
+            avti.hitrost[od:].tolist(),
+            avti.max_hitrost[od:].tolist(),
+            tipi,
+            avti.dolzina[od:].tolist(),
+            avti.barve(od),
+        )
+    ]
+
+
+def _ovire(model):
+    return [{"poz": ovira.poz, "pas": ovira.pas} for ovira in model.ovire]
+
+
+def _omejitve(model):
+    return [{"od": od, "do": do, "max_hitrost": max_hitrost} for od, do, max_hitrost in model.omejitve.intervali()]
+
+
+def _glava(model, generacija):
+    return {
+        "generacija": generacija,
+        "verzija": model.verzija,
+        "dolzina_ceste": model.dolzina_ceste,
+        "st_pasov": model.st_pasov,
+        "lookahead": model.lookahead,
+        "truck_cap_enabled": model.truck_cap_enabled,
+        "engine": model.engine,
+        "seed": model.seed,
+    }
+
+
+def polno_stanje(model, generacija=None):
+    stanje = _glava(model, generacija)
+    stanje.update({
+        "polno": True,
+        "avti": _vozila(model),
+        "ovire": _ovire(model),
+        "omejitve": _omejitve(model),
+    })
+    return stanje
+
+
+def delta_stanje(model, since, generacija=None):
+    """
+    Spremembe po verziji since: stolpci poz/pas/hitrost obstojecih vozil (ce so se
+    premaknila), max_hitrost (ce se je spremenila), nova vozila ter ovire in
+    omejitve le, ce sta se spremenili. Vozil se ne odstranjuje, zato jih delta ne brise.
+    """
+    spremembe = model.spremembe(since)
+    nova_od = spremembe["nova_od"]
+    avti = model.avti
+    stanje = _glava(model, generacija)
+    stanje.update({"polno": False, "since": since, "nova_od": nova_od, "nova_vozila": _vozila(model, nova_od)})
+    stolpci = {}
+    if spremembe["gibanje"]:
+        stolpci["poz"] = avti.poz[:nova_od].tolist()
+        stolpci["pas"] = avti.pas[:nova_od].tolist()
+        stolpci["hitrost"] = avti.hitrost[:nova_od].tolist()
+    if spremembe["lastnosti"]:
+        stolpci["max_hitrost"] = avti.max_hitrost[:nova_od].tolist()
+    if stolpci:
+        stanje["stolpci"] = stolpci
+    if spremembe["ovire"]:
+        stanje["ovire"] = _ovire(model)
+    if spremembe["omejitve"]:
+        stanje["omejitve"] = _omejitve(model)
+    return stanje
+
+
+# Binarni zapis (little-endian), vse tabele so poravnane na 4 bajte:
+#   glava (32 B): "CST2", generacija u32, verzija u32, dolzina_ceste u32, st_pasov u16,
+#       lookahead u16, st. vozil n u32, st. ovir m u32, truck cap u8, engine u8,
+#       st. tipov u8, rezerva u8
+#   st. omejitev k u32, st. posebnih barv b u32
+#   tabela tipov: za vsak tip dolzina u8, dolzina imena u8, ime (utf-8); poravnano
+#   poz i32[n], barva u32[n] (RGB), ovire_poz i32[m], omejitve i32[k, 3] (od, do, max_hitrost),
+#   posebne_i u32[b] (vozila z barvo, ki ni "#rrggbb"),
+#   pas u8[n], hitrost u8[n], max_hitrost u8[n], tip u8[n], ovire_pas u8[m],
+#   posebne barve: za vsako dolzina u16 in niz (utf-8), ki prekrije RGB iz stolpca barva
+GLAVA = struct.Struct("<4sIIIHHIIBBBB")
+ENGINE_KODE = {"python": 0, "numpy": 1}
+
+
+def _poravnaj(deli):
+    dolzina = sum(len(d) for d in deli)
+    if dolzina % 4:
+        deli.append(bytes(4 - dolzina % 4))
+
+
+def binarno_stanje(model, generacija=0):
+    """Polno stanje kot bajti; stolpce vzamemo naravnost iz tabele vozil, brez zanke po vozilih."""
+    avti = model.avti
+    n = len(avti)
+    ovire_poz = np.array([ovira.poz for ovira in model.ovire], dtype="<i4")
+    ovire_pas = np.array([ovira.pas for ovira in model.ovire], dtype=np.uint8)
+    omejitve = np.array(model.omejitve.intervali(), dtype="<i4").reshape(-1, 3)
+    posebne = sorted(avti._posebne_barve.items())
+    deli = [GLAVA.pack(
+        b"CST2",
+        generacija,
+        model.verzija,
+        model.dolzina_ceste,
+        model.st_pasov,
+        min(model.lookahead, 0xFFFF),
+        n,
+        len(ovire_poz),
+        int(model.truck_cap_enabled),
+        ENGINE_KODE.get(model.engine, 0xFF),
+        len(TIPI),
+        0,
+    ), struct.pack("<II", len(omejitve), len(posebne))]
+    for tip in TIPI:
+        ime = tip.encode()
+        deli.append(struct.pack("<BB", TIPI_VOZIL[tip], len(ime)) + ime)
+    _poravnaj(deli)
+    deli += [
+        avti.poz.astype("<i4").tobytes(),
+        avti.barva_rgb.astype("<u4").tobytes(),
+        ovire_poz.tobytes(),
+        omejitve.tobytes(),
+        np.array([i for i, _ in posebne], dtype="<u4").tobytes(),
+        avti.pas.astype(np.uint8).tobytes(),
+        avti.hitrost.astype(np.uint8).tobytes(),
+        avti.max_hitrost.astype(np.uint8).tobytes(),
+        avti.tip.tobytes(),
+        ovire_pas.tobytes(),
+    ]
+    for _, barva in posebne:
+        barva = str(barva).encode()
+        deli.append(struct.pack("<H", len(barva)) + barva)
+    return b"".join(deli)
@@ -1,299 +1,667 @@
+import json
+from bisect import bisect_right
+
 import numpy as np
-import random
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.patches import Circle, Wedge
-import matplotlib.colors as mcolors
-
-TIPI_VOZIL = {
-    "avto": 6,
-    "limuzina": 10,
-    "tovornjak": 20,
-}
-
-class Avto:
-    """predstavlja avto v modelu"""
-    def __init__(self, poz, pas=0, hitrost=0, max_hitrost=5, color=None, tip="avto"):
-        self.poz = poz          # index celice
-        self.hitrost = hitrost
-        self.pas = pas
-        self.max_hitrost_base = max_hitrost
-        self.max_hitrost = max_hitrost
-        self.tip = tip
-        self.dolzina = TIPI_VOZIL[tip]
-        if color:
-            self.color = color
-        else:
-            # Izogni se pretemnim (skoraj crnim) barvam.
-            while True:
-                value = random.randint(0, 0xFFFFFF)
-                r = (value >> 16) & 0xFF
-                g = (value >> 8) & 0xFF
-                b = value & 0xFF
-                if (r + g + b) >= 120:
-                    self.color = "#{:06x}".format(value)
-                    break
-
-    def update_hitrost(self, razdalja, omejitev=None, front_speed=None, limit_ahead=None):
-        """sprejme razdaljo do naslednjega avta in temu ustrezno spremeni hitrost"""
-
-        #limit ahead - v naslednjih 15 celicah se začne omejitev
-
-        hitrost = self.hitrost
-        max_dovoljena = self.max_hitrost
-        
-        # Koliko je treutna maksimalna dovoljena hitrost?
-        if omejitev is not None:
-            max_dovoljena = min(max_dovoljena, omejitev)
-
-        # ciljna hitrost glede na lookahead, ovire in omejitve
-        ## target brez česarkoli
-        target = min(hitrost + 1, max_dovoljena)
-
-        ## KMALU OMEJITEV
-        if limit_ahead is not None:
-            target = min(target, limit_ahead)
-
-        ## SPREDAJ NEKAJ
-        if razdalja is not None:  # lahko je razdalja = 0
-            ## če ima spredni avto hitrost je premik lahko večji
-            if front_speed is not None:
-                # Naj bo varno pri sočasnem posodabljanju: ne prehiti razdalje do avta.
-                target = min(target, razdalja)
-
-            ## spredaj ovira, lahko se premaknemo samo za razdaljo
-            else:
-                target = min(target, razdalja)
-                
-        # Želim postopno zaviranje če je možno
-        # (razen ko je ovira/bliznja situacija, kjer je dovoljen vecji padec
-        if target < hitrost:
-            if razdalja is not None and razdalja <= hitrost:
-                hitrost = target
-            else:
-                hitrost = max(hitrost - 2, target)
-        else:
-            hitrost = target
 
-        # nakljucno zaviranje
-        # p = random.uniform(0, 1)
-        # if p < p_zaviranje and hitrost > 0:
-        #     hitrost -= 1
+from src.detektorji import UrejenaVozila
+from src.indeks import IndeksPasu
+from src.instrumentacija import Instrumentacija
+from src.omejitve import Omejitve
+from src.vozila import DOLZINE_TIPOV, KODE_TIPOV, STOLPCI, TIPI_VOZIL, Avto, VozniPark, nova_hitrost
+from src.vektorski_korak import BREZ, vektorski_korak
+
+# "python" je osnovni korak po objektih, "numpy" racuna nad celimi tabelami
+ENGINES = ("python", "numpy")
 
-        return max(hitrost, 0)
+# deli stanja z lastno verzijo: gibanje (poz/pas/hitrost), lastnosti vozil (max_hitrost),
+# ovire, omejitve in nastavitve (lookahead, truck cap)
+DELI_STANJA = ("gibanje", "lastnosti", "ovire", "omejitve", "nastavitve")
 
-    # def update_pozicija(self, razdalja):
-    #     """sprejme razdaljo do naslednjega avta in temu ustrezno spremeni pozicijo"""
-    #     self.poz = (self.poz + self.hitrost) % dolzina_ceste
-    #     return self.poz
+# razlicica zapisa kontrolne tocke (Cesta.shrani / Cesta.nalozi)
+FORMAT_KONTROLNE_TOCKE = 1
 
 class Ovira:
     """predstavlja oviro na cesti v modelu"""
+    dolzina = 1
+
     def __init__(self, poz, pas=0):
         self.poz = poz   
         self.pas = pas
 
+def _rng_iz_stanja(stanje):
+    bit_generator = getattr(np.random, stanje["bit_generator"])()
+    bit_generator.state = stanje
+    return np.random.Generator(bit_generator)
+
+
+def _spremembe(verzije, dodano, st_dodanih, since):
+    spremenjeno = {del_: verzija > since for del_, verzija in verzije.items()}
+    # zadnje dodajanje z verzijo <= since pove, koliko vozil je ze bilo
+    i = bisect_right(dodano, (since, float("inf")), 0, st_dodanih)
+    spremenjeno["nova_od"] = dodano[i - 1][1] if i else 0
+    return spremenjeno
+
+
+class Posnetek:
+    """
+    Stanje ceste v enem trenutku (vozila, ovire, omejitve, verzije) za branje
+    iz drugih niti; src/stanje.py ga serializira enako kot Cesta.
+    """
+    def __init__(self, cesta):
+        self.verzija = cesta.verzija
+        self.cas = cesta.cas
+        self.dolzina_ceste = cesta.dolzina_ceste
+        self.st_pasov = cesta.st_pasov
+        self.lookahead = cesta.lookahead
+        self.truck_cap_enabled = cesta.truck_cap_enabled
+        self.engine = cesta.engine
+        self.seed = cesta.seed
+        self.avti = cesta.avti.kopija()
+        self.ovire = list(cesta.ovire)
+        # le intervali omejitev; tabel po celicah posnetek ne potrebuje
+        self.omejitve = cesta.omejitve.kopija()
+        self._verzije = dict(cesta._verzije)
+        # seznam dodajanj se le podaljsuje; zapomnimo si, koliko ga je bilo
+        self._dodano = cesta._dodano
+        self._st_dodanih = len(cesta._dodano)
+
+    def spremembe(self, since):
+        return _spremembe(self._verzije, self._dodano, self._st_dodanih, since)
+
+
 class Cesta:
-    def __init__(self, dolzina_ceste=1000, p_zaviranje=0.3, omejitve=None, lookahead=15):
+    def __init__(self, dolzina_ceste=1000, p_zaviranje=0.3, omejitve=None, lookahead=15, engine="python",
+                 st_pasov=2, seed=None, metrike=False):
+        if engine not in ENGINES:
+            raise ValueError(f"Neznan engine: {engine}")
+        self.engine = engine
         self.dolzina_ceste = dolzina_ceste
-        self.st_pasov = 2
-        self.cesta = [[None] * dolzina_ceste for _ in range(self.st_pasov)]
+        self.st_pasov = st_pasov
+        # zasedenost celic in po pasovih urejeni objekti za hitro iskanje sosedov;
+        # numpy engine ju ne potrebuje, zato ju po koraku le zavrze (glej cesta/indeks)
+        self._cesta = [[None] * dolzina_ceste for _ in range(self.st_pasov)]
+        self._indeks = [IndeksPasu(dolzina_ceste) for _ in range(self.st_pasov)]
         self.p_zaviranje = p_zaviranje
         self.max_hitrost = 7 #zaenkrat da vse deluje, to se uporabi da nardi graf
-        self.lookahead = lookahead
+        self._lookahead = lookahead
         self.cas = 0
-        self.avti = []
+        # verzija stanja se poveca ob vsaki spremembi; za vsak del hranimo zadnjo
+        # verzijo, ko se je spremenil (za /state?since=...)
+        self.verzija = 0
+        self._verzije = dict.fromkeys(DELI_STANJA, 0)
+        self._dodano = []  # (verzija, st. vozil po dodajanju); vozila se le dodajajo
+        # lasten generator za postavitev in zaviranje; barve imajo locen tok,
+        # da izris ne vpliva na potek simulacije
+        self.seed = seed
+        zaporedje = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        glavni, barvni = zaporedje.spawn(2)
+        self.rng = np.random.default_rng(glavni)
+        self.avti = VozniPark(rng=np.random.default_rng(barvni))
         self.ovire = []
-        self.cesta_omejitve = [None] * dolzina_ceste
+        # omejitve kot intervali (in tabela po celicah) ter predizracunan minimum v lookahead oknu
+        self.omejitve = Omejitve(dolzina_ceste)
         self.truck_cap_enabled = False
         self.truck_max_speed = 4
+        # trajanja faz koraka in stevci; izklopljeno skoraj nic ne stane
+        self.metrike = Instrumentacija(metrike)
+        # navidezni detektorji (src/detektorji.py), posodobljeni po vsakem koraku
+        self.detektorji = {}
+        self._st_detektorjev = 0
         if omejitve:
             self.set_omejitve(omejitve)
 
+    @property
+    def cesta(self):
+        if self._cesta is None:
+            t = self.metrike.zacni()
+            self._cesta = [[None] * self.dolzina_ceste for _ in range(self.st_pasov)]
+            for ovira in self.ovire:
+                self._cesta[ovira.pas][ovira.poz] = ovira
+            for avto in self.avti:
+                self.avto_na_cesti(self._cesta, avto)
+            self.metrike.koncaj("obnova_ceste", t)
+        return self._cesta
+
+    @property
+    def indeks(self):
+        if self._indeks is None:
+            t = self.metrike.zacni()
+            self._indeks = [IndeksPasu(self.dolzina_ceste) for _ in range(self.st_pasov)]
+            for obj in sorted(self.ovire + list(self.avti), key=lambda obj: obj.poz):
+                indeks = self._indeks[obj.pas]
+                indeks.glave.append(obj.poz)
+                indeks.objekti.append(obj)
+            self.metrike.koncaj("obnova_indeksa", t)
+        return self._indeks
+
     def random_cars(self, max_hitrost=5, max_hitrost_interval=None, gostota=0.05):
-        # Nakljucno razporedi avte po pasovih glede na gostoto.
-        gostota = gostota / self.st_pasov
-        for pas in range(self.st_pasov):
-            for i in range(self.dolzina_ceste):  # Random postavitev avtov
-                if random.random() < gostota and self.lahko_postavis(pas, i, TIPI_VOZIL["avto"]):
-                    avto_max_hitrost = (
-                        random.randint(*max_hitrost_interval)
-                        if max_hitrost_interval
-                        else max_hitrost
-                    )
-                    avto = Avto(i, pas=pas, max_hitrost=avto_max_hitrost, tip="avto")
-                    self.avti.append(avto)
-                    self.avto_na_cesti(self.cesta, avto)
-
-    def random_vozila(self, max_hitrost=5, max_hitrost_interval=None, gostota=0.05):
+        # Nakljucno razporedi avte po pasovih glede na gostoto (vozil na celico ceste, deljeno med pasove).
+        return self.postavi_vozila(
+            gostota=gostota / self.st_pasov,
+            tipi={"avto": 1},
+            max_hitrost=max_hitrost,
+            max_hitrost_interval=max_hitrost_interval,
+            strogo=False,
+        )
+
+    def random_vozila(self, max_hitrost=5, max_hitrost_interval=None, gostota=0.05, delez_tovornjakov=0.2):
         # Nakljucno razporedi vozila - lahko tudi tovrnjak po pasovih glede na gostoto.
-        gostota = gostota / self.st_pasov
-        for pas in range(self.st_pasov):
-            for i in range(self.dolzina_ceste):  # Random postavitev avtov
-                if random.random() < gostota:
-                    r = random.random()
-                    if r < 0.6:
-                        vozilo = "avto"
-                    elif r < 0.8:
-                        vozilo = "limuzina"
-                    else:
-                        vozilo = "tovornjak"
-                    vozilo_dolzina = TIPI_VOZIL.get(vozilo, 1)
-                    if not self.lahko_postavis(pas, i, vozilo_dolzina):
-                        continue
-                    avto_max_hitrost = (
-                        random.randint(*max_hitrost_interval)
-                        if max_hitrost_interval
-                        else max_hitrost
-                    )
-                    avto = Avto(i, pas=pas, max_hitrost=avto_max_hitrost, tip=vozilo)
-                    if self.truck_cap_enabled and vozilo == "tovornjak":
-                        avto.max_hitrost = min(avto.max_hitrost_base, self.truck_max_speed)
-                    self.avti.append(avto)
-                    self.avto_na_cesti(self.cesta, avto)
+        # Ostala vozila so v razmerju 3:1 avti in limuzine.
+        return self.postavi_vozila(
+            gostota=gostota / self.st_pasov,
+            tipi={
+                "avto": 0.75 * (1 - delez_tovornjakov),
+                "limuzina": 0.25 * (1 - delez_tovornjakov),
+                "tovornjak": delez_tovornjakov,
+            },
+            max_hitrost=max_hitrost,
+            max_hitrost_interval=max_hitrost_interval,
+            strogo=False,
+        )
+
+    def postavi_vozila(self, n=None, gostota=None, tipi=None, max_hitrost=5, max_hitrost_interval=None,
+                       pasovi=None, strogo=True, zasedenost=None):
+        """
+        Nakljucno postavi n vozil (ali gostota vozil na celico pasu ali toliko vozil,
+        da pricakovano pokrijejo delez zasedenost celic pasov) naenkrat.
+        tipi je slovar tip -> delez (privzeto samo avti). Vozila se ne prekrivajo
+        med seboj, z ovirami ali z obstojecimi vozili. Vozila dobijo proste odseke
+        sorazmerno z njihovo dolzino, znotraj odseka pa je vsaka razporeditev enako
+        verjetna. Ce vsa ne gredo na cesto, sprozi
+        ValueError (strogo) oziroma postavi le tista, ki gredo. Vrne stevilo
+        postavljenih vozil.
+        """
+        L = self.dolzina_ceste
+        pasovi = list(range(self.st_pasov)) if pasovi is None else list(pasovi)
+        if sum(x is not None for x in (n, gostota, zasedenost)) != 1:
+            raise ValueError("Podaj natanko enega od n, gostota in zasedenost")
+        tipi = tipi or {"avto": 1}
+        kode = np.array([KODE_TIPOV[tip] for tip in tipi])
+        delezi = np.array(list(tipi.values()), dtype=float)
+        if gostota is not None:
+            n = int(round(gostota * L * len(pasovi)))
+        elif zasedenost is not None:
+            # stevilo vozil iz povprecne dolzine vozila v mesanici
+            povprecna_dolzina = float(delezi @ DOLZINE_TIPOV[kode]) / delezi.sum()
+            n = int(round(zasedenost * L * len(pasovi) / povprecna_dolzina))
+        tip = self.rng.choice(kode, size=n, p=delezi / delezi.sum())
+        dolzina = DOLZINE_TIPOV[tip].astype(np.int64)
+
+        od, kapaciteta, pas_odseka = self._prosti_odseki(pasovi)
+        if dolzina.sum() > kapaciteta.sum():
+            if strogo:
+                raise ValueError(f"{n} vehicles need {int(dolzina.sum())} cells, only {int(kapaciteta.sum())} free")
+            # vozila so v nakljucnem vrstnem redu, zato obdrzimo kar zacetek
+            obdrzi = np.cumsum(dolzina) <= kapaciteta.sum()
+            tip, dolzina = tip[obdrzi], dolzina[obdrzi]
+        odsek = self._razdeli_po_odsekih(dolzina, kapaciteta, strogo)
+        tip, dolzina, odsek = tip[odsek >= 0], dolzina[odsek >= 0], odsek[odsek >= 0]
+
+        # v odseku s k vozili in g prostimi celicami je razporeditev izbira k od g + k mest
+        # (vozilo ali prosta celica); vozila v odseku so v nakljucnem vrstnem redu
+        R = len(kapaciteta)
+        red = np.lexsort((self.rng.random(len(odsek)), odsek))
+        tip, dolzina, odsek = tip[red], dolzina[red], odsek[red]
+        k = np.bincount(odsek, minlength=R)
+        mesta = kapaciteta - np.bincount(odsek, weights=dolzina, minlength=R).astype(np.int64) + k
+        zacetki_mest = np.cumsum(mesta) - mesta
+        skupina = np.repeat(np.arange(R), mesta)
+        mesto = np.arange(len(skupina)) - zacetki_mest[skupina]
+        # v vsaki skupini mest vzamemo prvih k po nakljucnem kljucu in jih uredimo
+        red = np.lexsort((self.rng.random(len(skupina)), skupina))
+        izbrano = mesto < k[skupina]  # mesto po premesanju je rang v skupini
+        izbrana = mesto[red][izbrano]
+        izbrana = izbrana[np.lexsort((izbrana, skupina[izbrano]))]
+        # j-to vozilo odseka: pred njim je izbrana - j prostih celic in j vozil
+        zacetki_vozil = np.cumsum(k) - k
+        j = np.arange(len(odsek)) - zacetki_vozil[odsek]
+        pred_njim = np.cumsum(dolzina) - dolzina
+        pred_njim -= pred_njim[zacetki_vozil[odsek]]
+        poz = (od[odsek] + izbrana - j + pred_njim + dolzina - 1) % L
+        pas = pas_odseka[odsek]
+
+        red = np.lexsort((poz, pas))
+        tip, poz, pas = tip[red], poz[red], pas[red]
+        max_hitrosti = np.array(self._zreb_max_hitrosti(len(poz), max_hitrost, max_hitrost_interval), dtype=np.int64)
+        zacetek = self.avti.dodaj_vec(poz, pas, max_hitrosti, tip)
+        if self.truck_cap_enabled:
+            tovornjaki = np.flatnonzero(tip == KODE_TIPOV["tovornjak"]) + zacetek
+            self.avti.max_hitrost[tovornjaki] = np.minimum(self.avti.max_hitrost_base[tovornjaki],
+                                                           self.truck_max_speed)
+        if len(poz):
+            # zasedenost in indeks se obnovita ob prvi uporabi
+            self._cesta = None
+            self._indeks = None
+            self._spremeni()
+            self._dodano.append((self.verzija, len(self.avti)))
+        return len(poz)
+
+    def zasedene_celice(self):
+        """Tabela (st_pasov, dolzina_ceste): True, kjer je vozilo ali ovira."""
+        L = self.dolzina_ceste
+        zasedeno = np.zeros(self.st_pasov * L, dtype=bool)
+        avti = self.avti
+        if len(avti):
+            # vse celice teles vozil: glava, glava - 1, ... (krozno)
+            dolzina = avti.dolzina.astype(np.int64)
+            zacetki = np.cumsum(dolzina) - dolzina
+            odmik = np.arange(int(dolzina.sum())) - np.repeat(zacetki, dolzina)
+            celice = (np.repeat(avti.poz.astype(np.int64), dolzina) - odmik) % L
+            zasedeno[celice + np.repeat(avti.pas.astype(np.int64), dolzina) * L] = True
+        for ovira in self.ovire:
+            zasedeno[ovira.pas * L + ovira.poz] = True
+        return zasedeno.reshape(self.st_pasov, L)
+
+    def _prosti_odseki(self, pasovi):
+        # prosti odseki pasov kot (od, dolzina, pas); odsek je lahko cez konec kroga
+        L = self.dolzina_ceste
+        zasedeno = self.zasedene_celice()
+        od, dolzine, pas_odseka = [], [], []
+        for pas in pasovi:
+            zasedene = np.flatnonzero(zasedeno[pas])
+            if not len(zasedene):
+                # prazen pas: krog odrezemo na nakljucnem mestu
+                od.append([int(self.rng.integers(L))])
+                dolzine.append([L])
+                pas_odseka.append([pas])
+                continue
+            # pas zavrtimo, da se zacne za zasedeno celico; tako noben odsek ne gre cez konec
+            zamik = int(zasedene[0]) + 1
+            prosto = np.concatenate(([False], ~np.roll(zasedeno[pas], -zamik), [False]))
+            meje = np.flatnonzero(np.diff(prosto.astype(np.int8)))
+            zacetki, konci = meje[::2], meje[1::2]
+            od.append((zacetki + zamik) % L)
+            dolzine.append(konci - zacetki)
+            pas_odseka.append(np.full(len(zacetki), pas))
+        return (np.concatenate(od).astype(np.int64), np.concatenate(dolzine).astype(np.int64),
+                np.concatenate(pas_odseka).astype(np.int64))
+
+    def _razdeli_po_odsekih(self, dolzina, kapaciteta, strogo, max_ponovitev=50):
+        # odsek za vsako vozilo (-1, ce ga ni bilo mogoce postaviti): zreb sorazmerno
+        # s prostorom, vozila iz prepolnih odsekov prestavimo v odseke s prostorom
+        if not kapaciteta.sum():
+            if len(dolzina) and strogo:
+                raise ValueError("No free cells")
+            return np.full(len(dolzina), -1)
+        R = len(kapaciteta)
+        odsek = self.rng.choice(R, size=len(dolzina), p=kapaciteta / kapaciteta.sum())
+        for ponovitev in range(max_ponovitev + 1):
+            # v prepolnem odseku obdrzimo nakljucno izbran del vozil, ki gre vanj
+            postavljena = odsek >= 0
+            red = np.flatnonzero(postavljena)
+            red = red[np.lexsort((self.rng.random(len(red)), odsek[red]))]
+            zasedeno = np.cumsum(dolzina[red])
+            prvi = np.r_[True, odsek[red][1:] != odsek[red][:-1]]
+            zasedeno -= np.maximum.accumulate(np.where(prvi, zasedeno - dolzina[red], 0))
+            prestavi = red[zasedeno > kapaciteta[odsek[red]]]
+            if not len(prestavi):
+                return odsek
+            odsek[prestavi] = -1
+            prostor = kapaciteta - np.bincount(odsek[odsek >= 0], weights=dolzina[odsek >= 0],
+                                               minlength=R).astype(np.int64)
+            if ponovitev == max_ponovitev or prostor.max() < dolzina[prestavi].min():
+                break
+            odsek[prestavi] = self.rng.choice(R, size=len(prestavi), p=prostor / prostor.sum())
+        if strogo:
+            raise ValueError(f"Could not fit {int((odsek < 0).sum())} vehicles between obstacles and vehicles")
+        return odsek
+
+    def _zreb_max_hitrosti(self, n, max_hitrost, max_hitrost_interval):
+        # max hitrosti n vozil: nakljucno iz intervala (vkljucno) ali vse enake
+        if max_hitrost_interval:
+            return self.rng.integers(max_hitrost_interval[0], max_hitrost_interval[1] + 1, size=n).tolist()
+        return [max_hitrost] * n
 
     def add_vozilo(self, pozicija, pas, max_hitrost, tip, color=None):
         # Rocno dodamo vozilo na cesto, ce je celica prosta.
         if self.lahko_postavis(pas, pozicija, TIPI_VOZIL[tip]):
-            avto = Avto(pozicija, pas=pas, max_hitrost=max_hitrost, color=color, tip=tip)
-            if self.truck_cap_enabled and tip == "tovornjak":
-                avto.max_hitrost = min(avto.max_hitrost_base, self.truck_max_speed)
-            self.avti.append(avto)
-            self.avto_na_cesti(self.cesta, avto)
+            self._postavi_avto(pozicija, pas, max_hitrost, tip, color=color)
             return True
         else:
             return False
 
+    def _postavi_avto(self, pozicija, pas, max_hitrost, tip, color=None):
+        # Doda vozilo v tabelo vozil, na cesto in v indeks pasu.
+        avto = self.avti.dodaj(pozicija, pas=pas, max_hitrost=max_hitrost, tip=tip, color=color)
+        if self.truck_cap_enabled and tip == "tovornjak":
+            avto.max_hitrost = min(avto.max_hitrost_base, self.truck_max_speed)
+        self.avto_na_cesti(self.cesta, avto)
+        self.indeks[pas].dodaj(avto)
+        self._spremeni()
+        self._dodano.append((self.verzija, len(self.avti)))
+        return avto
+
     def add_obstacle(self, pozicija, pas):
-        # Doda oviro na cesto in jo shrani v seznam ovir.
+        # Doda oviro na cesto in jo shrani v seznam ovir; zasedene celice ne prepise.
+        if self.cesta[pas][pozicija] is not None:
+            return False
         ovira = Ovira(pozicija, pas)
         self.ovire.append(ovira)
         self.cesta[pas][pozicija] = ovira
+        self.indeks[pas].dodaj(ovira)
+        self._spremeni("ovire")
+        return True
     
     def remove_obstacle(self, pozicija, pas):
         # Odstrani oviro s ceste in iz seznama ovir.
         for idx, ovira in enumerate(self.ovire):
             if ovira.poz == pozicija and ovira.pas == pas:
                 self.ovire.pop(idx)
+                self.indeks[pas].odstrani(ovira)
                 if isinstance(self.cesta[pas][pozicija], Ovira):
                     self.cesta[pas][pozicija] = None
+                self._spremeni("ovire")
                 return True
         return False
 
     def set_truck_cap(self, enabled, max_speed=4):
         self.truck_cap_enabled = bool(enabled)
         self.truck_max_speed = max_speed
-        for avto in self.avti:
-            if avto.tip != "tovornjak":
-                continue
-            if self.truck_cap_enabled:
-                avto.max_hitrost = min(avto.max_hitrost_base, self.truck_max_speed)
-            else:
-                avto.max_hitrost = avto.max_hitrost_base
+        tovornjaki = self.avti.tip == KODE_TIPOV["tovornjak"]
+        base = self.avti.max_hitrost_base[tovornjaki]
+        if self.truck_cap_enabled:
+            base = np.minimum(base, self.truck_max_speed)
+        self.avti.max_hitrost[tovornjaki] = base
+        self._spremeni("lastnosti", "nastavitve")
 
     def set_omejitve(self, omejitve):
-        # Nastavi omejitve hitrosti po pozicijah ceste.
-        self.cesta_omejitve = [None] * self.dolzina_ceste
-        for omejitev in omejitve:
-            for i in range(omejitev["od"], omejitev["do"]):
-                if 0 <= i < self.dolzina_ceste:
-                    self.cesta_omejitve[i] = omejitev["max_hitrost"]
-        # print(self.cesta)
+        # Nastavi omejitve hitrosti (seznam {od, do, max_hitrost}); kasnejse prekrijejo prejsnje.
+        self.omejitve.nastavi(omejitve)
+        self._spremeni("omejitve")
+
+    def dodaj_omejitev(self, od, do, max_hitrost):
+        # Doda omejitev na [od, do) cez obstojece, brez ponovne gradnje ostalih.
+        self.omejitve.dodaj(od, do, max_hitrost)
+        self._spremeni("omejitve")
+
+    def odstrani_omejitev(self, od, do):
+        # Odstrani omejitve na [od, do).
+        self.omejitve.odstrani(od, do)
+        self._spremeni("omejitve")
+
+    @property
+    def _omejitve_np(self):
+        # tabela po celicah (BREZ = ni omejitve) za numpy engine
+        return self.omejitve.tabela
+
+    @property
+    def cesta_omejitve(self):
+        # omejitve po celicah kot seznam (None = ni omejitve); le za zdruzljivost
+        return [None if v == BREZ else v for v in self.omejitve.tabela.tolist()]
+
+    @property
+    def lookahead(self):
+        return self._lookahead
+
+    @lookahead.setter
+    def lookahead(self, lookahead):
+        if lookahead != self._lookahead:
+            self._lookahead = lookahead
+            self._spremeni("nastavitve")
+
+    def _spremeni(self, *deli):
+        self.verzija += 1
+        for del_ in deli:
+            self._verzije[del_] = self.verzija
+
+    def spremembe(self, since):
+        """
+        Kaj se je spremenilo po verziji since: slovar {del: bool} za DELI_STANJA
+        in "nova_od", indeks prvega vozila, dodanega po since.
+        """
+        return _spremembe(self._verzije, self._dodano, len(self._dodano), since)
+
+    def posnetek(self):
+        """Kopija stanja, ki jo lahko druge niti berejo, medtem ko model tece naprej."""
+        return Posnetek(self)
+
+    def shrani(self, datoteka):
+        """
+        Kontrolna tocka v .npz (pot ali datoteka): stolpci vozil, ovire, omejitve kot
+        intervali, nastavitve, cas, verzije in stanje obeh generatorjev, tako da
+        nalozen model nadaljuje natanko enako kot ta.
+        """
+        seed = self.seed if isinstance(self.seed, (int, np.integer)) else None
+        polja = {"avti_" + ime: stolpec for ime, stolpec in self.avti.stolpci().items()}
+        posebne = self.avti._posebne_barve
+        np.savez(
+            datoteka,
+            format=FORMAT_KONTROLNE_TOCKE,
+            engine=self.engine,
+            dolzina_ceste=self.dolzina_ceste,
+            st_pasov=self.st_pasov,
+            p_zaviranje=self.p_zaviranje,
+            lookahead=self.lookahead,
+            cas=self.cas,
+            truck_cap_enabled=self.truck_cap_enabled,
+            truck_max_speed=self.truck_max_speed,
+            seed=json.dumps(None if seed is None else int(seed)),
+            rng=json.dumps(self.rng.bit_generator.state),
+            rng_barv=json.dumps(self.avti.rng.bit_generator.state),
+            verzija=self.verzija,
+            verzije=np.array([self._verzije[del_] for del_ in DELI_STANJA], dtype=np.int64),
+            dodano=np.array(self._dodano, dtype=np.int64).reshape(-1, 2),
+            ovire_poz=np.array([ovira.poz for ovira in self.ovire], dtype=np.int64),
+            ovire_pas=np.array([ovira.pas for ovira in self.ovire], dtype=np.int64),
+            omejitve=np.array(self.omejitve.intervali(), dtype=np.int64).reshape(-1, 3),
+            posebne_barve_i=np.array(list(posebne), dtype=np.int64),
+            posebne_barve=np.array(list(posebne.values()), dtype=str),
+            **polja,
+        )
+
+    @classmethod
+    def nalozi(cls, datoteka, engine=None, metrike=False):
+        """Model iz kontrolne tocke (glej shrani); engine lahko zamenjamo, potek ostane enak."""
+        with np.load(datoteka, allow_pickle=False) as d:
+            if int(d["format"]) != FORMAT_KONTROLNE_TOCKE:
+                raise ValueError(f"Neznan format kontrolne tocke: {int(d['format'])}")
+            model = cls(
+                dolzina_ceste=int(d["dolzina_ceste"]),
+                p_zaviranje=float(d["p_zaviranje"]),
+                lookahead=int(d["lookahead"]),
+                engine=engine or str(d["engine"]),
+                st_pasov=int(d["st_pasov"]),
+                seed=json.loads(str(d["seed"])),
+                metrike=metrike,
+            )
+            model.rng = _rng_iz_stanja(json.loads(str(d["rng"])))
+            posebne = dict(zip(d["posebne_barve_i"].tolist(), d["posebne_barve"].tolist()))
+            model.avti = VozniPark.iz_stolpcev(
+                {ime: d["avti_" + ime] for ime in STOLPCI},
+                posebne_barve=posebne,
+                rng=_rng_iz_stanja(json.loads(str(d["rng_barv"]))),
+            )
+            model.ovire = [Ovira(poz, pas) for poz, pas in zip(d["ovire_poz"].tolist(), d["ovire_pas"].tolist())]
+            model.omejitve.nastavi(
+                {"od": od, "do": do, "max_hitrost": max_hitrost} for od, do, max_hitrost in d["omejitve"].tolist()
+            )
+            model.truck_cap_enabled = bool(d["truck_cap_enabled"])
+            model.truck_max_speed = int(d["truck_max_speed"])
+            model.cas = int(d["cas"])
+            model.verzija = int(d["verzija"])
+            model._verzije = dict(zip(DELI_STANJA, d["verzije"].tolist()))
+            model._dodano = list(zip(*d["dodano"].T.tolist()))
+        # mrezo in indeks zgradimo ob prvi uporabi
+        model._cesta = None
+        model._indeks = None
+        return model
+
+    def tabela_limitov(self, lookahead=None):
+        """
+        Najmanjsa omejitev v celicah [i, i + lookahead] za vsako pozicijo i kot
+        numpy tabela (BREZ) za numpy engine. Sprememba omejitev jo popravi le na
+        prizadetem odseku, sprememba lookahead pa jo zgradi na novo.
+        """
+        if lookahead is None:
+            lookahead = self.lookahead
+        return self.omejitve.tabela_limitov(lookahead)
 
     def omejitev_na_poziciji(self, pozicija):
         # Vrne omejitev hitrosti na poziciji ali None, ce je ni.
-        return self.cesta_omejitve[pozicija]
+        return self.omejitve.na_poziciji(pozicija)
 
     def info_naprej(self, pas, pozicija, lookahead=None):
         # Vrne (razdalja, front_speed, limit_ahead) za dolocen avto
         if lookahead is None:
             lookahead = self.lookahead
-        razdalja = self.razdalja_do_naslednjega(pas, pozicija)
+        razdalja, obj = self.indeks[pas].naslednji((pozicija + 1) % self.dolzina_ceste)
         front_speed = None
         if razdalja is not None and razdalja <= lookahead:
-            poz_obj = (pozicija + razdalja + 1) % self.dolzina_ceste
-            obj = self.cesta[pas][poz_obj]
             if isinstance(obj, Avto):
                 front_speed = obj.hitrost
             elif isinstance(obj, Ovira):
                 front_speed = 0
 
-        limit_ahead = None
-        for d in range(0, lookahead + 1): # Dokler smo pod omejitvijo ne pospešujemo
-            poz = (pozicija + d) % self.dolzina_ceste
-            omejitev = self.cesta_omejitve[poz]
-            if omejitev is not None:
-                if limit_ahead is None or omejitev < limit_ahead:
-                    limit_ahead = omejitev
+        # Dokler smo pod omejitvijo ne pospešujemo
+        limit_ahead = self.omejitve.minimum(pozicija, pozicija + lookahead + 1)
 
         return razdalja, front_speed, limit_ahead
 
     def razdalja_do_naslednjega(self, pas, pozicija):
         """Izračuna razdaljo do naslednjega avtomobila"""
-        # ne sme videt samega sebe, ko pogleda naprej, preveri če je to slučajno isto objekt
-        razdalja = 1
-        while self.cesta[pas][(pozicija + razdalja) % self.dolzina_ceste] is None:
-            razdalja += 1
-            if razdalja > self.dolzina_ceste:
-                return None
-        return razdalja - 1
-        
+        # indeks pasu vrne prvo zasedeno celico za glavo (v praznem pasu tudi lasten zadek)
+        razdalja, _ = self.indeks[pas].naslednji((pozicija + 1) % self.dolzina_ceste)
+        return razdalja
+
     
-    def razdalja_do_prejsnjega(self, pas, pozicija, avto):
+    def razdalja_do_prejsnjega(self, pas, pozicija, avto, dolzina=None):
         """Izračuna razdaljo do prejšnjega avtomobila zadaj"""
+        # dolzino avta lahko poda klicatelj, ki jo ze ima
+        dolzina = avto.dolzina if dolzina is None else dolzina
         # steje sele po temu ko pride do konca samega sebe
-        razdalja = avto.dolzina
-        while self.cesta[pas][(pozicija - razdalja) % self.dolzina_ceste] is None:
-            razdalja += 1
-            if razdalja > self.dolzina_ceste:
-                return None
-        return razdalja - avto.dolzina
+        razdalja, _ = self.indeks[pas].prejsnji((pozicija - dolzina) % self.dolzina_ceste)
+        # celic ob lastnem telesu (v drugem pasu) ne stejemo
+        if razdalja is None or razdalja + dolzina > self.dolzina_ceste:
+            return None
+        return razdalja
+
+    def porocilo_metrik(self):
+        """Trajanja faz (s histogrami) in stevci od zadnje ponastavitve."""
+        return self.metrike.porocilo()
 
     def korak_simulacije(self):
         """En korak simulacije"""
         # print("Posodabljam \n")
-        
+        self._spremeni("gibanje")
+        m = self.metrike
+        zacetek_koraka = m.zacni()
+        if self.engine == "numpy":
+            vektorski_korak(self)
+            m.koncaj("korak", zacetek_koraka)
+            self._posodobi_detektorje()
+            return
+
+        t = m.zacni()
+        self._menjave_pasov()
+        m.koncaj("menjave_pasov", t)
+
+        # Posodobitev hitrosti; stolpce beremo enkrat kot sezname, ne prek pogledov Avto
+        t = m.zacni()
+        avti = self.avti
+        pasovi = avti.pas.tolist()
+        pozicije = avti.poz.tolist()
+        max_hitrosti = avti.max_hitrost.tolist()
+        hitrosti = []
+        for pas, poz, hitrost, max_hitrost in zip(pasovi, pozicije, avti.hitrost.tolist(), max_hitrosti):
+            razdalja, front_speed, limit_ahead = self.info_naprej(pas, poz)
+            hitrosti.append(nova_hitrost(
+                hitrost,
+                max_hitrost,
+                razdalja,
+                self.omejitve.na_poziciji(poz),
+                front_speed=front_speed,
+                limit_ahead=limit_ahead,
+            ))
+        m.koncaj("hitrosti", t)
+
+        # nakljucno zaviranje; stevila za vsa vozila naenkrat (enako kot v numpy koraku)
+        t = m.zacni()
+        p_vsi = self.rng.random(len(avti)).tolist()
+        zavirali = 0
+        for i, p in enumerate(p_vsi):
+            if p < self.p_zaviranje and hitrosti[i] > 0:
+                hitrosti[i] -= 1
+                zavirali += 1
+        avti.hitrost[:] = hitrosti
+        m.koncaj("zaviranje", t)
+        m.stej("zaviranja", zavirali)
+
+        # Premikanje avtomobilov: pobrisemo le izpraznjene celice zadaj in
+        # zapisemo le nove celice spredaj, ovire ostanejo kjer so
+        t = m.zacni()
+        if m.vklopljeno:
+            m.stej("spremenjene_celice", 2 * np.minimum(avti.hitrost, avti.dolzina).sum())
+        L = self.dolzina_ceste
+        cesta = self.cesta
+        objekti = list(avti)
+        dolzine = avti.dolzina.tolist()
+        for avto, pas, poz, hitrost, dolzina in zip(objekti, pasovi, pozicije, hitrosti, dolzine):
+            vrsta = cesta[pas]
+            rep = poz - dolzina + 1
+            for i in range(rep, rep + min(hitrost, dolzina)):
+                if vrsta[i % L] is avto:
+                    vrsta[i % L] = None
+        nove_pozicije = []
+        for avto, pas, poz, hitrost, dolzina in zip(objekti, pasovi, pozicije, hitrosti, dolzine):
+            vrsta = cesta[pas]
+            glava = poz + hitrost
+            for i in range(glava - min(hitrost, dolzina) + 1, glava + 1):
+                vrsta[i % L] = avto
+            nove_pozicije.append(glava % L)
+        avti.poz[:] = nove_pozicije
+
+        for indeks in self.indeks:
+            indeks.preuredi()
+        m.koncaj("premik", t)
+        m.stej("koraki")
+        m.stej("posodobljena_vozila", len(self.avti))
+        m.koncaj("korak", zacetek_koraka)
+        self.cas += 1
+        self._posodobi_detektorje()
+
+    def dodaj_detektor(self, detektor):
+        """Doda detektor (npr. Zanka ali Odsek) in ga vrne; id dobi od ceste."""
+        detektor.id = self._st_detektorjev
+        self._st_detektorjev += 1
+        self.detektorji[detektor.id] = detektor
+        return detektor
+
+    def odstrani_detektor(self, id_):
+        return self.detektorji.pop(id_, None) is not None
+
+    def porocilo_detektorjev(self):
+        return [detektor.porocilo(self) for detektor in self.detektorji.values()]
+
+    def _posodobi_detektorje(self):
+        if self.detektorji:
+            with self.metrike.faza("detektorji"):
+                # eno urejanje vozil na korak za vse detektorje
+                urejena = UrejenaVozila(self)
+                for detektor in self.detektorji.values():
+                    detektor.posodobi(self, urejena)
+
+    def _menjave_pasov(self):
         # Možna sprememba pasu
         lane_changes = []
+        if self.st_pasov < 2:
+            return
         for avto in self.avti:
             novi_pas = should_change_lane(self, avto, self.cas, lookahead=self.lookahead)
             # to ubistvu preverim že v lane change?
             if novi_pas is not None and self.lahko_postavis(novi_pas, avto.poz, avto.dolzina):
                 lane_changes.append((avto, novi_pas))
 
+        self.metrike.stej("kandidati_menjav", len(lane_changes))
         for avto, novi_pas in lane_changes:
+            # pri vec pasovih lahko dva avta hkrati zavijeta v isti pas; prednost ima prvi
+            if not self.lahko_postavis(novi_pas, avto.poz, avto.dolzina):
+                continue
+            self.metrike.stej("menjave_pasov")
             self.odstrani_avto_na_cesti(self.cesta, avto)
+            self.indeks[avto.pas].odstrani(avto)
             avto.pas = novi_pas
             self.avto_na_cesti(self.cesta, avto)
-
-        # Posodobitev hitrosti
-        for avto in self.avti:
-            razdalja, front_speed, limit_ahead = self.info_naprej(avto.pas, avto.poz)
-            omejitev = self.omejitev_na_poziciji(avto.poz)
-            avto.hitrost = avto.update_hitrost(
-                razdalja,
-                omejitev,
-                front_speed=front_speed,
-                limit_ahead=limit_ahead,
-            )
-            # nakljucno zaviranje
-            p = random.uniform(0, 1)
-            if p < self.p_zaviranje and avto.hitrost > 0:
-                avto.hitrost -= 1
-
-
-
-        # Premikanje avtomobilov
-        nova_cesta = [[None] * self.dolzina_ceste for _ in range(self.st_pasov)]
-        for ovira in self.ovire:
-            nova_cesta[ovira.pas][ovira.poz] = ovira
-        for avto in self.avti:
-            nova_pozicija = (avto.poz + avto.hitrost) % self.dolzina_ceste
-            avto.poz = nova_pozicija
-            self.avto_na_cesti(nova_cesta, avto)
-        
-        self.cesta = nova_cesta
-        self.cas += 1
+            self.indeks[novi_pas].dodaj(avto)
 
     def pozicija_skupaj(self, pozicija_glava, dolzina):
         # dobim od kje do kje je avto
@@ -315,8 +683,9 @@ class Cesta:
 
     def lahko_postavis(self, pas, pozicija, dolzina, avto=None):
         # spet potrebno da ko gleda ne vidi sebe, ker se bo itak prestavil
+        vrsta = self.cesta[pas]
         for poz in self.pozicija_skupaj(pozicija, dolzina):
-            obj = self.cesta[pas][poz]
+            obj = vrsta[poz]
             if obj is not None and obj != avto: 
                 return False
         return True
@@ -328,6 +697,7 @@ def should_change_lane(cesta, avto, cas,
                        delta_hitrost_hitri_zadaj=1):
     """
     Odločanje o menjavi pasu z dinamiko sodih/lihih korakov in oceno kvalitete pasu.
+    Pas 0 je skrajno desni; avto gleda le sosednja pasova (pas - 1 in pas + 1).
     """
 
     if cesta.st_pasov < 2:
@@ -335,23 +705,29 @@ def should_change_lane(cesta, avto, cas,
 
     def ovira_razdalja(pas_local):
         """Vrne razdaljo do prve ovire naprej v lookahead oknu."""
+        vrsta = mreza[pas_local]
         for d in range(1, lookahead + 1):
-            poz_chk = (poz + d) % L
-            if isinstance(cesta.cesta[pas_local][poz_chk], Ovira):
+            if isinstance(vrsta[(poz + d) % L], Ovira):
                 return d
         return None
 
+    # polja vozila in mrezo preberemo enkrat (vsako branje polja gre prek stolpca)
+    mreza = cesta.cesta
     pas = avto.pas
     poz = avto.poz
+    dolzina = avto.dolzina
+    max_hitrost = avto.max_hitrost
     L = cesta.dolzina_ceste
     trenutna_hitrost = avto.hitrost
-    omejitev = cesta.omejitev_na_poziciji(avto.poz)
+    omejitev = cesta.omejitev_na_poziciji(poz)
     merge_window = max(6, lookahead // 2)
 
     ##### TRENUTNI PAS  
     razdalja_spredaj, front_speed, limit_ahead = cesta.info_naprej(pas, poz, lookahead)
     # print(razdalja_spredaj, front_speed, limit_ahead)
-    naslednja_hitrost = avto.update_hitrost(
+    naslednja_hitrost = nova_hitrost(
+        trenutna_hitrost,
+        max_hitrost,
         razdalja_spredaj,
         omejitev,
         front_speed,
@@ -362,81 +738,83 @@ def should_change_lane(cesta, avto, cas,
     bo_moral_zavirati = razdalja_spredaj is not None and razdalja_spredaj <= trenutna_hitrost
 
     # Mora nujno zavirati ker je ovira (uporabimo na levem pasu, prehitevanje na desnem prepovedano)
-    bo_moral_zavirati_ovira = bo_moral_zavirati and isinstance(cesta.cesta[pas][(poz+razdalja_spredaj+1) % L], Ovira)
+    bo_moral_zavirati_ovira = bo_moral_zavirati and isinstance(mreza[pas][(poz+razdalja_spredaj+1) % L], Ovira)
 
     # Pred njim počasen avto, ni nujno da je že na razdalji, da je potrebno zavirati
     spredaj_slow_avto = front_speed is not None and front_speed < trenutna_hitrost  # je to okej tako, lahko da oba upočasnujeta zaradi omejitve
 
     # Za njim hiter avto in se mora umakniti
-    razdalja_zadaj_trenutni = cesta.razdalja_do_prejsnjega(pas, poz, avto)
+    razdalja_zadaj_trenutni = cesta.razdalja_do_prejsnjega(pas, poz, avto, dolzina)
     avto_zadaj = None
     if razdalja_zadaj_trenutni is not None and razdalja_zadaj_trenutni <= lookahead:
         poz_zadaj = (poz - razdalja_zadaj_trenutni) % L
-        avto_zadaj = cesta.cesta[pas][poz_zadaj]
+        avto_zadaj = mreza[pas][poz_zadaj]
 
     hiter_avto_zadaj = (isinstance(avto_zadaj, Avto) and
         avto_zadaj.hitrost >= trenutna_hitrost + delta_hitrost_hitri_zadaj)
     
-    ##### DRUGI PAS
-    razdalja_spredaj_D, front_speed_D, limit_ahead_D = cesta.info_naprej(1-pas, avto.poz, lookahead)
-    # print(f"{(razdalja_spredaj_D, front_speed_D, limit_ahead_D)}")
-    sosednja_mozna_hitrost = avto.update_hitrost(
-        razdalja_spredaj_D,
-        omejitev,
-        front_speed_D,
-        limit_ahead_D,
-    )
-
-    # mora nujno zavirati (ne zaradi omejitve)
-    bo_moral_zavirati_D = razdalja_spredaj_D is not None and razdalja_spredaj_D <= trenutna_hitrost
-
-    # Pred njim počasen avto, ni nujno da je že na razdalji, da je potrebno zavirati
-    spredaj_slow_avto_D = front_speed_D is not None and front_speed_D < trenutna_hitrost  # je to okej tako, lahko da oba upočasnujeta zaradi omejitve
-
-    razdalja_zadaj_D = cesta.razdalja_do_prejsnjega(1-pas, poz, avto)
-    avto_zadaj = None
-    if razdalja_zadaj_D is not None and razdalja_zadaj_D <= lookahead:
-        poz_zadaj = (poz - razdalja_zadaj_D) % L
-        avto_zadaj = cesta.cesta[1-pas][poz_zadaj]
-
-    hiter_avto_zadaj_D = (isinstance(avto_zadaj, Avto) and
-        avto_zadaj.hitrost >= trenutna_hitrost + delta_hitrost_hitri_zadaj)
-
     ovira_dist_trenutni = ovira_razdalja(pas)
-    ovira_dist_drugi = ovira_razdalja(1 - pas)
     merge_intent = ovira_dist_trenutni is not None and ovira_dist_trenutni <= merge_window
-    if pas == 1 and ovira_dist_drugi is not None and ovira_dist_drugi <= merge_window:
-        # Ne vleci nazaj v pas, ki se zapira zaradi ovire.
-        return None
 
-    # Menjava iz desnega v levi pas (prehitevanje)
-    if pas == 0:
+    ##### SOSEDNJI PAS
+    def menjava_v(drugi):
+        """Vrne drugi, ce se avto premakne v sosednji pas drugi, sicer None."""
+        razdalja_spredaj_D, front_speed_D, limit_ahead_D = cesta.info_naprej(drugi, poz, lookahead)
+        # print(f"{(razdalja_spredaj_D, front_speed_D, limit_ahead_D)}")
+        sosednja_mozna_hitrost = nova_hitrost(
+            trenutna_hitrost,
+            max_hitrost,
+            razdalja_spredaj_D,
+            omejitev,
+            front_speed_D,
+            limit_ahead_D,
+        )
+
+        # mora nujno zavirati (ne zaradi omejitve)
+        bo_moral_zavirati_D = razdalja_spredaj_D is not None and razdalja_spredaj_D <= trenutna_hitrost
+
+        # Pred njim počasen avto, ni nujno da je že na razdalji, da je potrebno zavirati
+        spredaj_slow_avto_D = front_speed_D is not None and front_speed_D < trenutna_hitrost  # je to okej tako, lahko da oba upočasnujeta zaradi omejitve
+
+        razdalja_zadaj_D = cesta.razdalja_do_prejsnjega(drugi, poz, avto, dolzina)
+        avto_zadaj = None
+        if razdalja_zadaj_D is not None and razdalja_zadaj_D <= lookahead:
+            poz_zadaj = (poz - razdalja_zadaj_D) % L
+            avto_zadaj = mreza[drugi][poz_zadaj]
+
+        hiter_avto_zadaj_D = (isinstance(avto_zadaj, Avto) and
+            avto_zadaj.hitrost >= trenutna_hitrost + delta_hitrost_hitri_zadaj)
+
+        # Menjava iz levega v desni pas (vracanje).
+        if drugi < pas:
+            ovira_dist_drugi = ovira_razdalja(drugi)
+            if ovira_dist_drugi is not None and ovira_dist_drugi <= merge_window:
+                # Ne vleci nazaj v pas, ki se zapira zaradi ovire.
+                return None
+
         # lahko sploh menjamo
-        if not cesta.lahko_postavis(1-pas, avto.poz, avto.dolzina):
+        if not cesta.lahko_postavis(drugi, poz, dolzina):
             return None
 
-        motivacija = bo_moral_zavirati or spredaj_slow_avto or (sosednja_mozna_hitrost > naslednja_hitrost) #to primerjavo moram dati stran, saj sicer ne morem imeti random zaviranja
-        incentive = (motivacija or merge_intent) and (not hiter_avto_zadaj_D)
-        # print(sosednja_mozna_hitrost,naslednja_hitrost)
-        # print("trenutna", trenutna_hitrost)
-        # print(f"bo_moral_zavirati {bo_moral_zavirati}, spredaj_slow_avto {spredaj_slow_avto}, primerjaava {(sosednja_mozna_hitrost > naslednja_hitrost)}")
-
-    # Menjava iz levega v desni pas (vracanje).
-    if pas == 1:
-        if not cesta.lahko_postavis(1-pas, avto.poz, avto.dolzina):
+        # Menjava iz desnega v levi pas (prehitevanje)
+        if drugi > pas:
+            motivacija = bo_moral_zavirati or spredaj_slow_avto or (sosednja_mozna_hitrost > naslednja_hitrost) #to primerjavo moram dati stran, saj sicer ne morem imeti random zaviranja
+            incentive = (motivacija or merge_intent) and (not hiter_avto_zadaj_D)
+            # print(sosednja_mozna_hitrost,naslednja_hitrost)
+            # print("trenutna", trenutna_hitrost)
+            # print(f"bo_moral_zavirati {bo_moral_zavirati}, spredaj_slow_avto {spredaj_slow_avto}, primerjaava {(sosednja_mozna_hitrost > naslednja_hitrost)}")
+        else:
+            ni_vec_potrebe_za_prehitevanje = (not bo_moral_zavirati_D) and (not spredaj_slow_avto_D)
+            motivacija_hiter_zadaj = hiter_avto_zadaj
+            incentive = (
+                ni_vec_potrebe_za_prehitevanje
+                or motivacija_hiter_zadaj 
+                or bo_moral_zavirati_ovira)
+            # print(f"ni_vec_potrebe_za_prehitevanje: {ni_vec_potrebe_za_prehitevanje}, bo_moral_zavirati_D {bo_moral_zavirati_D}, spredaj_slow_avto_D {spredaj_slow_avto_D}")
+
+        if not incentive:
             return None
 
-        ni_vec_potrebe_za_prehitevanje = (not bo_moral_zavirati_D) and (not spredaj_slow_avto_D)
-        motivacija_hiter_zadaj = hiter_avto_zadaj
-        incentive = (
-            ni_vec_potrebe_za_prehitevanje
-            or motivacija_hiter_zadaj 
-            or bo_moral_zavirati_ovira)
-        # print(f"ni_vec_potrebe_za_prehitevanje: {ni_vec_potrebe_za_prehitevanje}, bo_moral_zavirati_D {bo_moral_zavirati_D}, spredaj_slow_avto_D {spredaj_slow_avto_D}")
-        
-    if incentive:
-        # razdalja_pred = cesta.razdalja_do_naslednjega(1-pas, poz)
-        # razdalja_zadaj = cesta.razdalja_do_prejsnjega(1-pas, poz)
         if razdalja_spredaj_D is None:
             razdalja_spredaj_D = L
         if razdalja_zadaj_D is None:
@@ -450,9 +828,16 @@ def should_change_lane(cesta, avto, cas,
                     razdalja_zadaj_D >= eff_gap_back)
         # if security == False:
         #     # print("Ne dovolim prehitevati")
-        return (1-pas) if security else None
-    else:
-        return None
+        return drugi if security else None
+
+    # Gledamo le sosednja pasova: najprej vracanje v desnega, sicer prehitevanje v levega
+    if pas > 0:
+        novi_pas = menjava_v(pas - 1)
+        if novi_pas is not None:
+            return novi_pas
+    if pas < cesta.st_pasov - 1:
+        return menjava_v(pas + 1)
+    return None
 
 
 def info_o_pasu(cesta, avto, pas, lookahead=15):
@@ -476,200 +861,9 @@ def info_o_pasu(cesta, avto, pas, lookahead=15):
     return v_avg
 
 
-def simple_vizualiziraj_simulacijo(model, koraki=50):
-    """Vizualizira simulacijo"""
-    stanja = []
-    
-    for _ in range(koraki):
-        stanje = []
-        for pas in range(model.st_pasov):
-            stanje.extend(1 if avto is not None else 0 for avto in model.cesta[pas])
-        stanja.append(stanje)
-        model.korak_simulacije()
-    
-    plt.figure(figsize=(12, 8))
-    plt.imshow(stanja, cmap='binary', aspect='auto')
-    plt.xlabel('Pozicija na cesti')
-    plt.ylabel('Čas (koraki)')
-    plt.title('Nagel-Schreckenberg model prometa')
-    plt.colorbar(label='Prisotnost avtomobila')
-    plt.show()
-
-# vizualiziraj_simulacijo(Cesta(dolzina_ceste=20), koraki=10)
-
-
-def vizualizacija_kroga(model, koraki=100):
-    """Krožna vizualizacija prometa"""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
-    
-    # Nastavitev kroga
-    center_radius = 5
-    lane_spacing = 0.6
-    center = (0, 0)
-    
-    def lane_offset(pas):
-        """Vrne odmik posameznega pasu relativno na srednjo krožnico."""
-        return (pas - (model.st_pasov - 1) / 2) * lane_spacing
-    
-    def pozicija_na_krogu(pozicija, total, pas):
-        """Pretvori linearno pozicijo v točko na izbranem pasu na krogu"""
-        angle = 2 * np.pi * pozicija / total
-        radius = center_radius + lane_offset(pas)
-        x = radius * np.cos(angle)
-        y = radius * np.sin(angle)
-        return x, y, angle
-    
-    # Priprava za animacijo
-    scatter = ax1.scatter([], [], s=100, alpha=0.7)
-    scatter_ovire = ax1.scatter([], [], s=90, marker='s', color='black', alpha=0.9)
-    
-    # Nastavitev krožne ceste (en krog na pas)
-    max_offset = lane_offset(model.st_pasov - 1) if model.st_pasov > 1 else 0
-    min_offset = lane_offset(0) if model.st_pasov > 1 else 0
-    outer_radius = center_radius + max_offset + lane_spacing / 2
-    inner_radius = center_radius + min_offset - lane_spacing / 2
-    inner_radius = max(inner_radius, 0.5)
-
-    # Označi odseke z omejitvami hitrosti (ena barva cez oba pasova).
-    omejitve = getattr(model, "cesta_omejitve", None)
-    if omejitve:
-        start = None
-        current = None
-        for idx, omejitev in enumerate(omejitve + [None]):
-            if omejitev != current:
-                if current is not None and start is not None:
-                    theta1 = 360 * start / model.dolzina_ceste
-                    theta2 = 360 * idx / model.dolzina_ceste
-                    if theta2 < theta1:
-                        theta2 += 360
-                    arc = Wedge(
-                        center,
-                        r=outer_radius,
-                        theta1=theta1,
-                        theta2=theta2,
-                        width=outer_radius - inner_radius,
-                        facecolor="#f4a261",
-                        edgecolor="none",
-                        alpha=0.35,
-                    )
-                    ax1.add_patch(arc)
-                    mid_angle = np.deg2rad((theta1 + theta2) / 2)
-                    mid_radius = (outer_radius + inner_radius) / 2
-                    ax1.text(
-                        mid_radius * np.cos(mid_angle),
-                        mid_radius * np.sin(mid_angle),
-                        str(current),
-                        ha="center",
-                        va="center",
-                        fontsize=10,
-                        color="#7a3b00",
-                    )
-                start = idx if omejitev is not None else None
-                current = omejitev
-    
-    outer_circle = Circle(center, outer_radius, fill=False, edgecolor='gray', linewidth=2)
-    inner_circle = Circle(center, inner_radius, fill=False, edgecolor='gray', linewidth=2)
-    ax1.add_patch(outer_circle)
-    ax1.add_patch(inner_circle)
-    
-    # Dodaj vmesne črte med pasovi
-    for idx in range(1, model.st_pasov):
-        radius = center_radius + lane_offset(idx - 0.5)
-        ax1.add_patch(Circle(center, radius, fill=False, edgecolor='gray', linewidth=1, linestyle='--'))
-    
-    plot_radius = max(outer_radius, inner_radius)
-    ax1.set_xlim(-plot_radius-1, plot_radius+1)
-    ax1.set_ylim(-plot_radius-1, plot_radius+1)
-    ax1.set_aspect('equal')
-    ax1.set_title('Krožna vizualizacija prometa\n(Barva = hitrost)', fontsize=14)
-    ax1.cesta(True, alpha=0.3)
-    
-    # Priprava časovnega grafa
-    časovna_os = list(range(koraki))
-    povprecne_hitrosti = []
-    ax2.set_xlim(0, koraki)
-    ax2.set_ylim(0, model.max_hitrost + 1)
-    ax2.set_xlabel('Čas (koraki)')
-    ax2.set_ylabel('Povprečna hitrost')
-    ax2.set_title('Razvoj hitrosti skozi čas')
-    ax2.cesta(True, alpha=0.3)
-    line, = ax2.plot([], [], 'b-', linewidth=2)
-    
-    def init():
-        scatter.set_offsets(np.empty((0, 2)))
-        line.set_data([], [])
-        return scatter, scatter_ovire, line
-    
-    def update(frame):
-        # Izvedi korak simulacije
-        if frame == 0:
-            povprecne_hitrosti.clear()
-        if frame > 0:
-            model.korak_simulacije()
-        
-        # Prikaži avte na krogu
-        pozicije = []
-        barve = []
-        hitrosti = []
-        pozicije_ovir = []
-        
-        for avto in model.avti:
-            x, y, kot = pozicija_na_krogu(avto.poz, model.dolzina_ceste, avto.pas)
-            pozicije.append([x, y])
-            hitrosti.append(avto.hitrost)
-            # Barva glede na hitrost
-            barva = plt.cm.viridis(avto.hitrost / model.max_hitrost)
-            barve.append(barva)
-
-        for ovira in model.ovire:
-            x, y, _ = pozicija_na_krogu(ovira.poz, model.dolzina_ceste, ovira.pas)
-            pozicije_ovir.append([x, y])
-        
-        if pozicije:
-            scatter.set_offsets(pozicije)
-        else:
-            scatter.set_offsets(np.empty((0, 2)))
-        scatter.set_color(barve)
-        scatter.set_sizes([80 + hitrost * 20 for hitrost in hitrosti])  # Velikost glede na hitrost
-
-        if pozicije_ovir:
-            scatter_ovire.set_offsets(pozicije_ovir)
-        else:
-            scatter_ovire.set_offsets(np.empty((0, 2)))
-        
-        # Posodobi časovni graf
-        povprecna_hitrost = np.mean(hitrosti) if hitrosti else 0
-        povprecne_hitrosti.append(povprecna_hitrost)
-        
-        line.set_data(časovna_os[:frame+1], povprecne_hitrosti)
-        
-        # Posodobi naslov s statistiko
-        ax1.set_title(f'Krožna vizualizacija prometa\n'
-                     f'Korak: {frame}, Avti: {len(model.avti)}, '
-                     f'Povprečna hitrost: {povprecna_hitrost:.2f}', fontsize=12)
-        
-        return scatter, scatter_ovire, line
-    
-    # Ustvari animacijo
-    anim = FuncAnimation(fig, update, frames=koraki, 
-                        init_func=init, blit=True, interval=200, repeat=True)
-    
-    plt.tight_layout()
-    plt.show()
-    
-    return anim
-
-if __name__ == "__main__":
-    # TESTIRAJ
-    print("=== KROŽNA VIZUALIZACIJA ===")
-    model = Cesta(dolzina_ceste=60, p_zaviranje=0.2, omejitve=[
-    {"od": 10, "do": 25, "max_hitrost": 5},
-    {"od": 40, "do": 50, "max_hitrost": 3},])
-    model.random_cars(gostota=0.3, max_hitrost_interval=(3, 6))
-    model.add_obstacle(15, 1)
-    model.add_obstacle(16, 1)
-    model.add_obstacle(17, 1)
-
-    # Animacija
-    print("Zaženem animacijo...")
-    anim = vizualizacija_kroga(model, koraki=100)
+def __getattr__(ime):
+    # izris je v src.vizualizacija; matplotlib se uvozi sele ob prvi uporabi
+    if ime in ("simple_vizualiziraj_simulacijo", "vizualizacija_kroga"):
+        from src import vizualizacija
+        return getattr(vizualizacija, ime)
+    raise AttributeError(f"module {__name__!r} has no attribute {ime!r}")
@@ -0,0 +1,337 @@
+import numpy as np
+
+from src.instrumentacija import Instrumentacija
+
+# Namesto None (ni omejitve / ni nicesar spredaj) uporabimo veliko stevilo,
+# da lahko vse primerjave naredimo z np.minimum.
+BREZ = np.iinfo(np.int64).max // 4
+
+_IZKLOPLJENO = Instrumentacija(False)
+
+
+def brez_none(tabela):
+    """Pretvori float tabelo z nan (None) v int tabelo s stevilom BREZ."""
+    rezultat = np.full(tabela.shape, BREZ, dtype=np.int64)
+    ima = ~np.isnan(tabela)
+    rezultat[ima] = tabela[ima]
+    return rezultat
+
+
+def drsni_minimum(vrednosti, okno):
+    """Minimum v kroznem oknu [i, i + okno) za vsako celico, v O(L log okno)."""
+    okno = max(1, min(okno, len(vrednosti)))
+    minimum = vrednosti.copy()
+    sirina = 1
+    while sirina * 2 <= okno:
+        minimum = np.minimum(minimum, np.roll(minimum, -sirina))
+        sirina *= 2
+    # okni dolzine sirina na zacetku in koncu skupaj pokrijeta celotno okno
+    return np.minimum(minimum, np.roll(minimum, -(okno - sirina)))
+
+
+def uredi_zasedenost(L, st_pasov, pas, glava, dolzina):
+    """
+    Uredi zasedene intervale (vozila in ovire) po pasovih in poziciji glave.
+    Vrne (red, kljuci, repi, zacetki): red je permutacija vhodnih objektov,
+    repi so (lahko negativni) zacetki intervalov, zacetki[p] pa indeks prvega
+    intervala v pasu p.
+    """
+    kljuc = pas * L + glava
+    red = np.argsort(kljuc, kind="stable")
+    kljuci = kljuc[red]
+    repi = (glava - dolzina + 1)[red]
+    zacetki = np.searchsorted(kljuci, np.arange(st_pasov + 1) * L)
+    return red, kljuci, repi, zacetki
+
+
+def naslednji_zaseden(L, urejeno, pas, x):
+    """
+    Za vsako poizvedbo (pas, x) vrne razdaljo od x do prve zasedene celice
+    naprej (x vkljucno) in indeks tega intervala v urejeni tabeli.
+    Ce je pas prazen, je razdalja -1.
+    """
+    _, kljuci, repi, zacetki = urejeno
+    zac = zacetki[pas]
+    konec = zacetki[pas + 1]
+    prazen = zac == konec
+    idx = np.searchsorted(kljuci, pas * L + x)
+    ovit = idx >= konec
+    idx = np.where(ovit, zac, idx)
+    if len(kljuci):
+        idx = np.minimum(idx, len(kljuci) - 1)
+        rep = repi[idx] + np.where(ovit, L, 0)
+        razdalja = np.maximum(x, rep) - x
+    else:
+        razdalja = np.zeros_like(x)
+    razdalja = np.where(prazen, -1, razdalja)
+    return razdalja, idx
+
+
+def prejsnji_zaseden(L, urejeno, pas, y):
+    """
+    Za vsako poizvedbo (pas, y) vrne razdaljo od y do prve zasedene celice
+    nazaj (y vkljucno) in indeks tega intervala. Ce je pas prazen, je razdalja -1.
+    """
+    _, kljuci, repi, zacetki = urejeno
+    zac = zacetki[pas]
+    konec = zacetki[pas + 1]
+    prazen = zac == konec
+    if not len(kljuci):
+        return np.full_like(y, -1), np.zeros_like(y)
+    idx = np.searchsorted(kljuci, pas * L + y)
+    # y je lahko znotraj objekta, katerega glava je naprej
+    ovit = idx >= konec
+    naprej = np.minimum(np.where(ovit, zac, idx), len(kljuci) - 1)
+    znotraj = repi[naprej] + np.where(ovit, L, 0) <= y
+    j = idx - 1
+    pod = j < zac
+    j = np.clip(np.where(pod, konec - 1, j), 0, len(kljuci) - 1)
+    glava = kljuci[j] - pas * L - np.where(pod, L, 0)
+    razdalja = np.where(znotraj, 0, y - glava)
+    idx = np.where(znotraj, naprej, j)
+    return np.where(prazen, -1, razdalja), idx
+
+
+def nove_hitrosti(hitrost, max_hitrost, omejitev, limit_ahead, razdalja):
+    """Vektorska razlicica Avto.update_hitrost (None je predstavljen z BREZ)."""
+    max_dovoljena = np.minimum(max_hitrost, omejitev)
+    target = np.minimum(hitrost + 1, max_dovoljena)
+    target = np.minimum(target, limit_ahead)
+    target = np.minimum(target, razdalja)
+    # postopno zaviranje, razen ko je spredaj nekaj blizu
+    postopno = (target < hitrost) & ~(razdalja <= hitrost)
+    nova = np.where(postopno, np.maximum(hitrost - 2, target), target)
+    return np.maximum(nova, 0)
+
+
+def _zasedenost(L, st_pasov, pas, poz, dolzina, hitrost, ovire_pas, ovire_poz):
+    # vozila in ovire skupaj urejeni po pasovih; hitrost ovire je 0
+    urejeno = uredi_zasedenost(
+        L,
+        st_pasov,
+        np.concatenate([pas, ovire_pas]),
+        np.concatenate([poz, ovire_poz]),
+        np.concatenate([dolzina, np.ones_like(ovire_poz)]),
+    )
+    red = urejeno[0]
+    hitrost_obj = np.concatenate([hitrost, np.zeros_like(ovire_poz)])[red]
+    je_ovira = red >= len(poz)
+    return urejeno, hitrost_obj, je_ovira
+
+
+def menjave_pasov(L, st_pasov, lookahead, zasedenost, urejene_ovire,
+                  poz, pas, hitrost, max_hitrost, dolzina, omejitev, limit_ahead,
+                  safe_gap_front=2,
+                  safe_gap_back=2,
+                  delta_hitrost_hitri_zadaj=1,
+                  odmik=0):
+    """
+    Paketna razlicica should_change_lane za vsa vozila hkrati.
+    Vrne (novi_pas, razdalja): novi pas vsakega vozila (ali trenutnega, ce
+    ne menja) in razdaljo do naslednjega v trenutnem pasu.
+    Pri ansamblu je zasedenost urejena po segmentih odmik + pas, kjer je
+    odmik = replika * st_pasov; pasovi so vedno lokalni.
+    """
+    urejeno, hitrost_obj, je_ovira = zasedenost
+    razdalja, idx = naslednji_zaseden(L, urejeno, odmik + pas, (poz + 1) % L)
+    if st_pasov < 2:
+        return pas.copy(), razdalja
+    merge_window = max(6, lookahead // 2)
+
+    ##### TRENUTNI PAS
+    front_speed = np.where(razdalja <= lookahead, hitrost_obj[idx], BREZ)
+    naslednja_hitrost = nove_hitrosti(hitrost, max_hitrost, omejitev, limit_ahead, razdalja)
+    bo_moral_zavirati = razdalja <= hitrost
+    bo_moral_zavirati_ovira = bo_moral_zavirati & je_ovira[idx]
+    spredaj_slow_avto = front_speed < hitrost
+    hiter_avto_zadaj = _hiter_zadaj(L, urejeno, hitrost_obj, je_ovira, odmik + pas, poz, dolzina,
+                                    hitrost, lookahead, delta_hitrost_hitri_zadaj)[0]
+
+    ovira_dist_trenutni = _ovira_razdalja(L, urejene_ovire, odmik + pas, poz, lookahead)
+    merge_intent = ovira_dist_trenutni <= merge_window
+    eff_gap_back = np.where(merge_intent, max(1, safe_gap_back - 1), safe_gap_back)
+
+    ##### SOSEDNJI PAS
+    def menjava_v(drugi, vracanje):
+        drugi = odmik + drugi
+        razdalja_D, idx_D = naslednji_zaseden(L, urejeno, drugi, (poz + 1) % L)
+        razdalja_D = np.where(razdalja_D < 0, BREZ, razdalja_D)
+        front_speed_D = np.where(razdalja_D <= lookahead, hitrost_obj[idx_D], BREZ)
+        bo_moral_zavirati_D = razdalja_D <= hitrost
+        spredaj_slow_avto_D = front_speed_D < hitrost
+        hiter_avto_zadaj_D, razdalja_zadaj_D = _hiter_zadaj(L, urejeno, hitrost_obj, je_ovira, drugi, poz,
+                                                            dolzina, hitrost, lookahead,
+                                                            delta_hitrost_hitri_zadaj)
+
+        # ali lahko sploh menjamo (celice telesa v drugem pasu so proste)
+        prosto, _ = naslednji_zaseden(L, urejeno, drugi, (poz - dolzina + 1) % L)
+        lahko = (prosto < 0) | (prosto >= dolzina)
+
+        if vracanje:
+            # Menjava iz levega v desni pas (vracanje); ne v pas, ki se zapira zaradi ovire.
+            zapira = _ovira_razdalja(L, urejene_ovire, drugi, poz, lookahead) <= merge_window
+            ni_vec_potrebe_za_prehitevanje = ~bo_moral_zavirati_D & ~spredaj_slow_avto_D
+            incentive = (ni_vec_potrebe_za_prehitevanje | hiter_avto_zadaj | bo_moral_zavirati_ovira) & ~zapira
+        else:
+            # Menjava iz desnega v levi pas (prehitevanje)
+            sosednja_mozna_hitrost = nove_hitrosti(hitrost, max_hitrost, omejitev, limit_ahead, razdalja_D)
+            motivacija = bo_moral_zavirati | spredaj_slow_avto | (sosednja_mozna_hitrost > naslednja_hitrost)
+            incentive = (motivacija | merge_intent) & ~hiter_avto_zadaj_D
+
+        security = (np.minimum(razdalja_D, L) >= safe_gap_front) & (razdalja_zadaj_D >= eff_gap_back)
+        return lahko & incentive & security
+
+    # Gledamo le sosednja pasova: najprej vracanje v desnega, sicer prehitevanje v levega
+    desno = np.maximum(pas - 1, 0)
+    levo = np.minimum(pas + 1, st_pasov - 1)
+    v_desno = (pas > 0) & menjava_v(desno, True)
+    v_levo = (pas < st_pasov - 1) & ~v_desno & menjava_v(levo, False)
+    novi_pas = np.where(v_desno, desno, np.where(v_levo, levo, pas))
+    if st_pasov > 2:
+        novi_pas = _razresi_navzkrizne(L, poz, dolzina, odmik + pas, odmik + novi_pas) - odmik
+    return novi_pas, razdalja
+
+
+def _razresi_navzkrizne(L, poz, dolzina, pas, novi_pas):
+    """
+    Pri vec kot dveh pasovih lahko vozili iz levega in desnega soseda hkrati
+    zavijeta na isto mesto. Kot v pythonskem koraku ima prednost vozilo z
+    manjsim indeksom, ostala v tem pasu ostanejo, kjer so.
+    """
+    menjajo = np.flatnonzero(novi_pas != pas)
+    if len(menjajo) < 2:
+        return novi_pas
+    cilj = novi_pas[menjajo]
+    glava = poz[menjajo]
+    red = np.lexsort((glava, cilj))
+    cilj, glava, menjajo = cilj[red], glava[red], menjajo[red]
+    # zaporedna (po poziciji) vozila v istem ciljnem pasu; zadnje primerjamo s prvim
+    naslednji = np.arange(1, len(menjajo) + 1)
+    konec_pasu = np.r_[cilj[1:] != cilj[:-1], True]
+    zacetki = np.flatnonzero(np.r_[True, konec_pasu[:-1]])
+    naslednji[konec_pasu] = zacetki
+    d1 = dolzina[menjajo]
+    d2 = dolzina[menjajo[naslednji]]
+    prekrivanje = (glava[naslednji] - glava + d1 - 1) % L <= d1 + d2 - 2
+    prekrivanje &= naslednji != np.arange(len(menjajo))
+    sporni_pasovi = np.unique(cilj[prekrivanje])
+    if not len(sporni_pasovi):
+        return novi_pas
+
+    novi_pas = novi_pas.copy()
+    for p in sporni_pasovi.tolist():
+        sprejeti = []
+        for i in np.sort(menjajo[cilj == p]).tolist():
+            g, d = int(poz[i]), int(dolzina[i])
+            if any((g2 - g + d - 1) % L <= d + d2 - 2 for g2, d2 in sprejeti):
+                novi_pas[i] = pas[i]
+            else:
+                sprejeti.append((g, d))
+    return novi_pas
+
+
+def _hiter_zadaj(L, urejeno, hitrost_obj, je_ovira, pas, poz, dolzina, hitrost, lookahead, delta):
+    # razdalja do prejsnjega kot v Cesta.razdalja_do_prejsnjega (None -> L)
+    razdalja, _ = prejsnji_zaseden(L, urejeno, pas, (poz - dolzina) % L)
+    razdalja = np.where((razdalja < 0) | (razdalja + dolzina > L), L, razdalja)
+    # kot v should_change_lane pogledamo celico poz - razdalja
+    zadaj = (razdalja <= lookahead) & (razdalja < L)
+    na_celici, idx = naslednji_zaseden(L, urejeno, pas, (poz - razdalja) % L)
+    avto_zadaj = zadaj & (na_celici == 0) & ~je_ovira[idx]
+    return avto_zadaj & (hitrost_obj[idx] >= hitrost + delta), razdalja
+
+
+def _ovira_razdalja(L, urejene_ovire, pas, poz, lookahead):
+    # razdalja do prve ovire naprej (1..lookahead) ali BREZ
+    razdalja, _ = naslednji_zaseden(L, urejene_ovire, pas, (poz + 1) % L)
+    d = razdalja + 1
+    return np.where((razdalja >= 0) & (d <= lookahead), d, BREZ)
+
+
+def korak_tabel(L, st_pasov, lookahead, p_zaviranje, poz, pas, hitrost, max_hitrost, dolzina,
+               ovire_pas, ovire_poz, omejitve, tabela_limitov, p, st_segmentov=None, odmik=0,
+               metrike=None):
+    """
+    En korak nad tabelami vozil (int64); p so nakljucna stevila za zaviranje.
+    Pri ansamblu so ovire podane po segmentih (replika * st_pasov + pas).
+    Vrne (pas, hitrost, poz) po koraku.
+    """
+    m = metrike or _IZKLOPLJENO
+    if st_segmentov is None:
+        st_segmentov = st_pasov
+    t = m.zacni()
+    urejene_ovire = uredi_zasedenost(L, st_segmentov, ovire_pas, ovire_poz, np.ones_like(ovire_poz))
+
+    # Omejitve na poziciji in najmanjsa omejitev v lookahead oknu
+    omejitev = omejitve[poz]
+    limit_ahead = tabela_limitov[poz]
+
+    # Možna sprememba pasu; razdalje uporabimo tudi pri hitrostih, ce se nihce ne premakne
+    zasedenost = _zasedenost(L, st_segmentov, odmik + pas, poz, dolzina, hitrost, ovire_pas, ovire_poz)
+    m.koncaj("zasedenost", t)
+    t = m.zacni()
+    novi_pas, razdalja = menjave_pasov(
+        L, st_pasov, lookahead, zasedenost, urejene_ovire,
+        poz, pas, hitrost, max_hitrost, dolzina, omejitev, limit_ahead,
+        odmik=odmik,
+    )
+    menjave = novi_pas != pas
+    if menjave.any():
+        m.stej("menjave_pasov", menjave.sum())
+        pas = novi_pas
+        zasedenost = _zasedenost(L, st_segmentov, odmik + pas, poz, dolzina, hitrost, ovire_pas, ovire_poz)
+        razdalja, _ = naslednji_zaseden(L, zasedenost[0], odmik + pas, (poz + 1) % L)
+    m.koncaj("menjave_pasov", t)
+
+    t = m.zacni()
+    hitrost = nove_hitrosti(hitrost, max_hitrost, omejitev, limit_ahead, razdalja)
+    m.koncaj("hitrosti", t)
+
+    # nakljucno zaviranje
+    t = m.zacni()
+    zavirajo = (p < p_zaviranje) & (hitrost > 0)
+    hitrost = hitrost - zavirajo
+    m.koncaj("zaviranje", t)
+    m.stej("zaviranja", zavirajo.sum())
+
+    # Premikanje avtomobilov
+    t = m.zacni()
+    poz = (poz + hitrost) % L
+    m.koncaj("premik", t)
+    return pas, hitrost, poz
+
+
+def vektorski_korak(cesta):
+    """En korak simulacije; menjave pasov, hitrosti, zaviranje in premike racunamo nad celimi tabelami."""
+    avti = cesta.avti
+    n = len(avti)
+    if n == 0:
+        cesta.cas += 1
+        return
+
+    # nakljucna stevila za zaviranje (enako zaporedje kot v pythonskem koraku)
+    p = cesta.rng.random(n)
+    pas, hitrost, poz = korak_tabel(
+        cesta.dolzina_ceste, cesta.st_pasov, cesta.lookahead, cesta.p_zaviranje,
+        avti.poz.astype(np.int64),
+        avti.pas.astype(np.int64),
+        avti.hitrost.astype(np.int64),
+        avti.max_hitrost.astype(np.int64),
+        avti.dolzina.astype(np.int64),
+        np.array([o.pas for o in cesta.ovire], dtype=np.int64),
+        np.array([o.poz for o in cesta.ovire], dtype=np.int64),
+        cesta._omejitve_np,
+        cesta.tabela_limitov(),
+        p,
+        metrike=cesta.metrike,
+    )
+    avti.pas[:] = pas
+    avti.poz[:] = poz
+    avti.hitrost[:] = hitrost
+
+    # zasedenost celic in indekse pasov zgradimo sele, ko jih kdo potrebuje
+    cesta._cesta = None
+    cesta._indeks = None
+    cesta.metrike.stej("koraki")
+    cesta.metrike.stej("posodobljena_vozila", n)
+    cesta.cas += 1
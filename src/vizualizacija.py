@@ -0,0 +1,220 @@
+"""
+Izris simulacije z matplotlib (casovni diagram in krozna animacija).
+Jedro simulacije (src.tools) tega modula ne uvozi, zato ga matplotlib ne upocasni.
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from matplotlib.patches import Circle, Wedge
+
+from src.snemalnik import Snemalnik, pomanjsaj
+from src.tools import Cesta
+
+
+def simple_vizualiziraj_simulacijo(model, koraki=50, engine=None, datoteka=None, korak_casa=1, korak_prostora=1):
+    """Vizualizira simulacijo; posnetek gre v Snemalnik (datoteka = .npy na disku)"""
+    if engine is not None:
+        model.engine = engine
+    snemalnik = Snemalnik(model, koraki, datoteka=datoteka, korak_casa=korak_casa, korak_prostora=korak_prostora)
+    snemalnik.snemaj(koraki)
+    tabela = snemalnik.zakljuci()
+
+    plt.figure(figsize=(12, 8))
+    slika = prostorsko_casovni_diagram(tabela, model.st_pasov, korak_casa=korak_casa, korak_prostora=korak_prostora)
+    plt.xlabel('Pozicija na cesti')
+    plt.ylabel('Čas (koraki)')
+    plt.title('Nagel-Schreckenberg model prometa')
+    plt.colorbar(slika, label='Prisotnost avtomobila')
+    plt.show()
+
+
+def prostorsko_casovni_diagram(tabela, st_pasov=1, sirina=1600, visina=1000, velicina="zasedenost",
+                               korak_casa=1, korak_prostora=1, ax=None):
+    """
+    Izrise tabelo Snemalnika (lahko memmap), zmanjsano na sirina x visina tock, da
+    dolg posnetek ne zasede pomnilnika; velicina je "zasedenost" ali "hitrost".
+    """
+    ax = ax or plt.gca()
+    zasedenost, hitrost = pomanjsaj(tabela, visina, sirina)
+    vrstice, stolpci = tabela.shape
+    obseg = [0, stolpci * korak_prostora, vrstice * korak_casa, 0]
+    if velicina == "hitrost":
+        slika = ax.imshow(hitrost, cmap='viridis', aspect='auto', interpolation='nearest', extent=obseg)
+    else:
+        slika = ax.imshow(zasedenost, cmap='binary', aspect='auto', interpolation='nearest', extent=obseg,
+                          vmin=0, vmax=1)
+    # meje med pasovi
+    for pas in range(1, st_pasov):
+        ax.axvline(pas * stolpci * korak_prostora / st_pasov, color='red', linewidth=0.5)
+    return slika
+
+# vizualiziraj_simulacijo(Cesta(dolzina_ceste=20), koraki=10)
+
+
+def vizualizacija_kroga(model, koraki=100, engine=None):
+    """Krožna vizualizacija prometa"""
+    if engine is not None:
+        model.engine = engine
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+    
+    # Nastavitev kroga
+    center_radius = 5
+    lane_spacing = 0.6
+    center = (0, 0)
+    
+    def lane_offset(pas):
+        """Vrne odmik posameznega pasu relativno na srednjo krožnico."""
+        return (pas - (model.st_pasov - 1) / 2) * lane_spacing
+    
+    def pozicija_na_krogu(pozicija, total, pas):
+        """Pretvori linearno pozicijo v točko na izbranem pasu na krogu"""
+        angle = 2 * np.pi * pozicija / total
+        radius = center_radius + lane_offset(pas)
+        x = radius * np.cos(angle)
+        y = radius * np.sin(angle)
+        return x, y, angle
+    
+    # Priprava za animacijo
+    scatter = ax1.scatter([], [], s=100, alpha=0.7)
+    scatter_ovire = ax1.scatter([], [], s=90, marker='s', color='black', alpha=0.9)
+    
+    # Nastavitev krožne ceste (en krog na pas)
+    max_offset = lane_offset(model.st_pasov - 1) if model.st_pasov > 1 else 0
+    min_offset = lane_offset(0) if model.st_pasov > 1 else 0
+    outer_radius = center_radius + max_offset + lane_spacing / 2
+    inner_radius = center_radius + min_offset - lane_spacing / 2
+    inner_radius = max(inner_radius, 0.5)
+
+    # Označi odseke z omejitvami hitrosti (ena barva cez vse pasove).
+    for od, do, omejitev in model.omejitve.intervali():
+        theta1 = 360 * od / model.dolzina_ceste
+        theta2 = 360 * do / model.dolzina_ceste
+        arc = Wedge(
+            center,
+            r=outer_radius,
+            theta1=theta1,
+            theta2=theta2,
+            width=outer_radius - inner_radius,
+            facecolor="#f4a261",
+            edgecolor="none",
+            alpha=0.35,
+        )
+        ax1.add_patch(arc)
+        mid_angle = np.deg2rad((theta1 + theta2) / 2)
+        mid_radius = (outer_radius + inner_radius) / 2
+        ax1.text(
+            mid_radius * np.cos(mid_angle),
+            mid_radius * np.sin(mid_angle),
+            str(omejitev),
+            ha="center",
+            va="center",
+            fontsize=10,
+            color="#7a3b00",
+        )
+
+    outer_circle = Circle(center, outer_radius, fill=False, edgecolor='gray', linewidth=2)
+    inner_circle = Circle(center, inner_radius, fill=False, edgecolor='gray', linewidth=2)
+    ax1.add_patch(outer_circle)
+    ax1.add_patch(inner_circle)
+    
+    # Dodaj vmesne črte med pasovi
+    for idx in range(1, model.st_pasov):
+        radius = center_radius + lane_offset(idx - 0.5)
+        ax1.add_patch(Circle(center, radius, fill=False, edgecolor='gray', linewidth=1, linestyle='--'))
+    
+    plot_radius = max(outer_radius, inner_radius)
+    ax1.set_xlim(-plot_radius-1, plot_radius+1)
+    ax1.set_ylim(-plot_radius-1, plot_radius+1)
+    ax1.set_aspect('equal')
+    ax1.set_title('Krožna vizualizacija prometa\n(Barva = hitrost)', fontsize=14)
+    ax1.grid(True, alpha=0.3)
+    
+    # Priprava časovnega grafa
+    časovna_os = list(range(koraki))
+    povprecne_hitrosti = []
+    ax2.set_xlim(0, koraki)
+    ax2.set_ylim(0, model.max_hitrost + 1)
+    ax2.set_xlabel('Čas (koraki)')
+    ax2.set_ylabel('Povprečna hitrost')
+    ax2.set_title('Razvoj hitrosti skozi čas')
+    ax2.grid(True, alpha=0.3)
+    line, = ax2.plot([], [], 'b-', linewidth=2)
+    
+    def init():
+        scatter.set_offsets(np.empty((0, 2)))
+        line.set_data([], [])
+        return scatter, scatter_ovire, line
+    
+    def update(frame):
+        # Izvedi korak simulacije
+        if frame == 0:
+            povprecne_hitrosti.clear()
+        if frame > 0:
+            model.korak_simulacije()
+        
+        # Prikaži avte na krogu
+        pozicije = []
+        barve = []
+        hitrosti = []
+        pozicije_ovir = []
+        
+        for avto in model.avti:
+            x, y, kot = pozicija_na_krogu(avto.poz, model.dolzina_ceste, avto.pas)
+            pozicije.append([x, y])
+            hitrosti.append(avto.hitrost)
+            # Barva glede na hitrost
+            barva = plt.cm.viridis(avto.hitrost / model.max_hitrost)
+            barve.append(barva)
+
+        for ovira in model.ovire:
+            x, y, _ = pozicija_na_krogu(ovira.poz, model.dolzina_ceste, ovira.pas)
+            pozicije_ovir.append([x, y])
+        
+        if pozicije:
+            scatter.set_offsets(pozicije)
+        else:
+            scatter.set_offsets(np.empty((0, 2)))
+        scatter.set_color(barve)
+        scatter.set_sizes([80 + hitrost * 20 for hitrost in hitrosti])  # Velikost glede na hitrost
+
+        if pozicije_ovir:
+            scatter_ovire.set_offsets(pozicije_ovir)
+        else:
+            scatter_ovire.set_offsets(np.empty((0, 2)))
+        
+        # Posodobi časovni graf
+        povprecna_hitrost = np.mean(hitrosti) if hitrosti else 0
+        povprecne_hitrosti.append(povprecna_hitrost)
+        
+        line.set_data(časovna_os[:frame+1], povprecne_hitrosti)
+        
+        # Posodobi naslov s statistiko
+        ax1.set_title(f'Krožna vizualizacija prometa\n'
+                     f'Korak: {frame}, Avti: {len(model.avti)}, '
+                     f'Povprečna hitrost: {povprecna_hitrost:.2f}', fontsize=12)
+        
+        return scatter, scatter_ovire, line
+    
+    # Ustvari animacijo
+    anim = FuncAnimation(fig, update, frames=koraki, 
+                        init_func=init, blit=True, interval=200, repeat=True)
+    
+    plt.tight_layout()
+    plt.show()
+    
+    return anim
+
+if __name__ == "__main__":
+    # TESTIRAJ
+    print("=== KROŽNA VIZUALIZACIJA ===")
+    model = Cesta(dolzina_ceste=60, p_zaviranje=0.2, omejitve=[
+    {"od": 10, "do": 25, "max_hitrost": 5},
+    {"od": 40, "do": 50, "max_hitrost": 3},])
+    model.random_cars(gostota=0.3, max_hitrost_interval=(3, 6))
+    model.add_obstacle(15, 1)
+    model.add_obstacle(16, 1)
+    model.add_obstacle(17, 1)
+
+    # Animacija
+    print("Zaženem animacijo...")
+    anim = vizualizacija_kroga(model, koraki=100)
@@ -0,0 +1,262 @@
+import re
+
+import numpy as np
+
+TIPI_VOZIL = {
+    "avto": 6,
+    "limuzina": 10,
+    "tovornjak": 20,
+}
+# tipe v tabeli hranimo kot kodo (indeks v TIPI)
+TIPI = list(TIPI_VOZIL)
+KODE_TIPOV = {tip: koda for koda, tip in enumerate(TIPI)}
+DOLZINE_TIPOV = np.array([TIPI_VOZIL[tip] for tip in TIPI], dtype=np.int16)
+
+# barva je pakiran RGB; bit 24 pove, da je barva ze dolocena
+IMA_BARVO = 1 << 24
+# pakiramo le barve, ki jih barva_hex vrne nespremenjene; ostale hranimo kot niz
+PAKIRANA_BARVA = re.compile(r"#[0-9a-f]{6}")
+
+STOLPCI = {
+    "poz": np.int32,
+    "pas": np.int16,
+    "hitrost": np.int16,
+    "max_hitrost_base": np.int16,
+    "max_hitrost": np.int16,
+    "tip": np.uint8,
+    "dolzina": np.int16,
+    "barva": np.uint32,
+}
+
+
+def nova_hitrost(hitrost, max_hitrost, razdalja, omejitev=None, front_speed=None, limit_ahead=None):
+    """Avto.update_hitrost nad golimi stevili (brez branja stolpcev v zankah koraka)."""
+
+    #limit ahead - v naslednjih 15 celicah se začne omejitev
+
+    max_dovoljena = max_hitrost
+
+    # Koliko je treutna maksimalna dovoljena hitrost?
+    if omejitev is not None:
+        max_dovoljena = min(max_dovoljena, omejitev)
+
+    # ciljna hitrost glede na lookahead, ovire in omejitve
+    ## target brez česarkoli
+    target = min(hitrost + 1, max_dovoljena)
+
+    ## KMALU OMEJITEV
+    if limit_ahead is not None:
+        target = min(target, limit_ahead)
+
+    ## SPREDAJ NEKAJ
+    if razdalja is not None:  # lahko je razdalja = 0
+        ## če ima spredni avto hitrost je premik lahko večji
+        if front_speed is not None:
+            # Naj bo varno pri sočasnem posodabljanju: ne prehiti razdalje do avta.
+            target = min(target, razdalja)
+
+        ## spredaj ovira, lahko se premaknemo samo za razdaljo
+        else:
+            target = min(target, razdalja)
+
+    # Želim postopno zaviranje če je možno
+    # (razen ko je ovira/bliznja situacija, kjer je dovoljen vecji padec
+    if target < hitrost:
+        if razdalja is not None and razdalja <= hitrost:
+            hitrost = target
+        else:
+            hitrost = max(hitrost - 2, target)
+    else:
+        hitrost = target
+
+    # nakljucno zaviranje
+    # p = random.uniform(0, 1)
+    # if p < p_zaviranje and hitrost > 0:
+    #     hitrost -= 1
+
+    return max(hitrost, 0)
+
+
+def _stolpec(ime):
+    def beri(self):
+        return int(self._park._stolpci[ime][self._i])
+
+    def pisi(self, vrednost):
+        self._park._stolpci[ime][self._i] = vrednost
+
+    return property(beri, pisi)
+
+
+class Avto:
+    """predstavlja avto v modelu (pogled na eno vrstico v VozniPark)"""
+    __slots__ = ("_park", "_i")
+
+    def __init__(self, park, i):
+        self._park = park
+        self._i = i
+
+    poz = _stolpec("poz")          # index celice
+    pas = _stolpec("pas")
+    hitrost = _stolpec("hitrost")
+    max_hitrost_base = _stolpec("max_hitrost_base")
+    max_hitrost = _stolpec("max_hitrost")
+    dolzina = _stolpec("dolzina")
+
+    @property
+    def tip(self):
+        return TIPI[self._park._stolpci["tip"][self._i]]
+
+    @property
+    def color(self):
+        return self._park.barva_hex(self._i)
+
+    def update_hitrost(self, razdalja, omejitev=None, front_speed=None, limit_ahead=None):
+        """sprejme razdaljo do naslednjega avta in temu ustrezno spremeni hitrost"""
+        return nova_hitrost(self.hitrost, self.max_hitrost, razdalja, omejitev, front_speed, limit_ahead)
+
+    # def update_pozicija(self, razdalja):
+    #     """sprejme razdaljo do naslednjega avta in temu ustrezno spremeni pozicijo"""
+    #     self.poz = (self.poz + self.hitrost) % dolzina_ceste
+    #     return self.poz
+
+
+class VozniPark:
+    """
+    Vsa vozila ceste kot tabela po stolpcih (poz, pas, hitrost, ...).
+    Iteracija in indeksiranje vracata poglede Avto, ki nastanejo sele ob prvi uporabi.
+    """
+    def __init__(self, rng=None):
+        self.n = 0
+        self._stolpci = {ime: np.zeros(16, dtype=tip) for ime, tip in STOLPCI.items()}
+        self._pogledi = []
+        self._posebne_barve = {}  # barve, ki niso "#rrggbb"
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        avto = self._pogledi[i]
+        if avto is None:
+            avto = self._pogledi[i] = Avto(self, i)
+        return avto
+
+    def __getattr__(self, ime):
+        # park.poz, park.hitrost, ... so pogledi na zasedeni del stolpcev
+        stolpci = self.__dict__.get("_stolpci")
+        if stolpci is None or ime not in stolpci:
+            raise AttributeError(ime)
+        return stolpci[ime][:self.n]
+
+    @property
+    def nbytes(self):
+        return sum(stolpec.nbytes for stolpec in self._stolpci.values())
+
+    def _rezerviraj(self, n):
+        kapaciteta = len(self._stolpci["poz"])
+        if n <= kapaciteta:
+            return
+        kapaciteta = max(n, 2 * kapaciteta)
+        for ime, stolpec in self._stolpci.items():
+            nov = np.zeros(kapaciteta, dtype=stolpec.dtype)
+            nov[:self.n] = stolpec[:self.n]
+            self._stolpci[ime] = nov
+
+    def stolpci(self):
+        """Zasedeni del vseh stolpcev (pogledi, brez kopiranja)."""
+        return {ime: stolpec[:self.n] for ime, stolpec in self._stolpci.items()}
+
+    @classmethod
+    def iz_stolpcev(cls, stolpci, posebne_barve=None, rng=None):
+        """Obratno od stolpci(): park iz tabel z imeni iz STOLPCI."""
+        park = cls(rng=rng)
+        park._stolpci = {ime: np.array(stolpci[ime], dtype=tip) for ime, tip in STOLPCI.items()}
+        park.n = len(park._stolpci["poz"])
+        park._pogledi = [None] * park.n
+        park._posebne_barve = dict(posebne_barve or {})
+        return park
+
+    def kopija(self):
+        """Kopija zasedenega dela tabele; barve dolocimo prej, da se kopija ne razlikuje."""
+        self._ustvari_barve()
+        nov = VozniPark(rng=self.rng)
+        nov._stolpci = {ime: stolpec[:self.n].copy() for ime, stolpec in self._stolpci.items()}
+        nov._pogledi = [None] * self.n
+        nov._posebne_barve = dict(self._posebne_barve)
+        nov.n = self.n
+        return nov
+
+    def dodaj(self, poz, pas=0, max_hitrost=5, tip="avto", hitrost=0, color=None):
+        # Doda eno vozilo in vrne njegov pogled; barvo preverimo, preden spremenimo stolpce.
+        koda = KODE_TIPOV[tip]
+        pakirana = None
+        if color and isinstance(color, str) and PAKIRANA_BARVA.fullmatch(color):
+            pakirana = int(color[1:], 16) | IMA_BARVO
+        i = self.dodaj_vec([poz], [pas], [max_hitrost], [koda], hitrost=[hitrost])
+        if pakirana is not None:
+            self._stolpci["barva"][i] = pakirana
+        elif color:
+            self._posebne_barve[i] = color
+        return self[i]
+
+    def dodaj_vec(self, poz, pas, max_hitrost, tip, hitrost=0):
+        """Doda vec vozil naenkrat (tip so kode tipov); vrne indeks prvega."""
+        poz = np.asarray(poz)
+        zacetek = self.n
+        konec = zacetek + len(poz)
+        self._rezerviraj(konec)
+        s = self._stolpci
+        s["poz"][zacetek:konec] = poz
+        s["pas"][zacetek:konec] = pas
+        s["hitrost"][zacetek:konec] = hitrost
+        s["max_hitrost_base"][zacetek:konec] = max_hitrost
+        s["max_hitrost"][zacetek:konec] = max_hitrost
+        s["tip"][zacetek:konec] = tip
+        s["dolzina"][zacetek:konec] = DOLZINE_TIPOV[np.asarray(tip)]
+        s["barva"][zacetek:konec] = 0
+        self._pogledi.extend([None] * len(poz))
+        self.n = konec
+        return zacetek
+
+    def barva_hex(self, i):
+        if i in self._posebne_barve:
+            return self._posebne_barve[i]
+        if not self._stolpci["barva"][i]:
+            self._ustvari_barve()
+        return "#{:06x}".format(int(self._stolpci["barva"][i]) & 0xFFFFFF)
+
+    def barve(self, od=0):
+        """Barve vozil od indeksa od naprej kot seznam "#rrggbb"."""
+        rgb = self.barva_rgb[od:]
+        barve = ["#{:06x}".format(v) for v in rgb.tolist()]
+        for i, barva in self._posebne_barve.items():
+            if i >= od:
+                barve[i - od] = barva
+        return barve
+
+    @property
+    def barva_rgb(self):
+        self._ustvari_barve()
+        return self.barva & 0xFFFFFF
+
+    def _ustvari_barve(self):
+        # Vsem vozilom brez barve naenkrat dolocimo nakljucno barvo.
+        barva = self.barva
+        manjka = np.flatnonzero(barva == 0)
+        while len(manjka):
+            vrednosti = self.rng.integers(0, 0x1000000, size=len(manjka), dtype=np.uint32)
+            r = (vrednosti >> 16) & 0xFF
+            g = (vrednosti >> 8) & 0xFF
+            b = vrednosti & 0xFF
+            # Izogni se pretemnim (skoraj crnim) barvam.
+            dobra = (r + g + b) >= 120
+            barva[manjka[dobra]] = vrednosti[dobra] | IMA_BARVO
+            manjka = manjka[~dobra]
@@ -7,7 +7,7 @@ const tooltipEl = document.getElementById("tooltip");
 // Lokalni odsev UI-ja (ne samo backend stanja)
 // - limits
 // - obstacles: dodane ovire - da lahko damo za init
-// - running in timer: kontrola avtomatskega poteka simulacije
+// - running in stream: kontrola avtomatskega poteka simulacije (okvirji z /stream)
 // - lastState: zadnje stanje iz backenda (za risanje in misko over)
 const limits = [];
 const obstacles = [];
@@ -16,8 +16,9 @@ const defaultObstacles = [{ poz: 200, pas: 0, len: 100 }];
 limits.push(...defaultLimits);
 obstacles.push(...defaultObstacles);
 let running = false;
-let timer = null;
+let stream = null; // EventSource na /stream, ko animacija tece
 let lastState = null;
+let serverState = null; // zadnje stanje s streznika, na katerega nalagamo spremembe
 let lastCarPositions = [];
 
 // Ideja da potem dodam scenarije ob predstavitvi, trenutno za testiranje
@@ -166,6 +167,9 @@ async function runScenario(config) {
     gostota: config.random?.gostota,
     max_hitrost_interval: config.random?.max_hitrost_interval,
     truck_cap_enabled: document.getElementById("truckCap").checked,
+    engine: document.getElementById("engine").value,
+    st_pasov: Number(document.getElementById("stPasov").value),
+    seed: readSeed(),
   });
   if (config.cars && config.cars.length) {
     for (const car of config.cars) {
@@ -178,15 +182,22 @@ async function runScenario(config) {
 
 function getParams() {
   // Prebere parametre ceste iz obrazca
-  // st_pasov fiksno 2
   return {
     dolzina_ceste: Number(document.getElementById("dolzina").value),
-    st_pasov: 2,
+    st_pasov: Number(document.getElementById("stPasov").value),
     p_zaviranje: Number(document.getElementById("pZaviranja").value),
     lookahead: Number(document.getElementById("lookahead").value),
+    engine: document.getElementById("engine").value,
+    seed: readSeed(),
   };
 }
 
+function readSeed() {
+  // Prazno polje pomeni nakljucen zagon
+  const value = document.getElementById("seed").value.trim();
+  return value === "" ? null : Number(value);
+}
+
 async function api(path, body) {
   // Pomozna funkcija - poslje JSON na backend in vrne JSON odgovor
   const res = await fetch(path, {
@@ -198,9 +209,171 @@ async function api(path, body) {
 }
 
 async function fetchState() {
-  // Preberemo trenutno stanje simulacije (avti, ovire, omejitve)
-  const res = await fetch("/state");
-  return res.json();
+  // Preberemo trenutno stanje simulacije (avti, ovire, omejitve);
+  // ce ga ze imamo, zahtevamo le spremembe od zadnje verzije
+  if (document.getElementById("stateFormat").value === "bin") {
+    return fetchBinaryState();
+  }
+  let url = "/state";
+  if (serverState) {
+    url += `?since=${serverState.verzija}&generacija=${serverState.generacija}`;
+  }
+  const res = await fetch(url);
+  if (res.status === 304) {
+    return serverState;
+  }
+  const data = await res.json();
+  if (data.polno) {
+    serverState = data;
+  } else if (!applyDelta(serverState, data)) {
+    // lokalno stanje se ne ujema vec; preberemo vse znova
+    serverState = null;
+    return fetchState();
+  }
+  return serverState;
+}
+
+async function fetchBinaryState() {
+  // Polno stanje v binarnem zapisu; nespremenjeno stanje streznik vrne kot 304
+  const headers = serverState && serverState.etag ? { "If-None-Match": serverState.etag } : {};
+  const res = await fetch("/state?format=bin", { headers });
+  if (res.status === 304) {
+    return serverState;
+  }
+  if (res.headers.get("Content-Type") !== "application/octet-stream") {
+    // modela se ni, streznik vrne JSON
+    serverState = null;
+    return res.json();
+  }
+  serverState = decodeState(await res.arrayBuffer());
+  serverState.etag = res.headers.get("ETag");
+  return serverState;
+}
+
+const ENGINES = ["python", "numpy"];
+
+function decodeState(buffer) {
+  // Razpakira zapis iz src/stanje.py (little-endian, tabele poravnane na 4 bajte)
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "CST2") {
+    throw new Error(`Neznan zapis stanja: ${magic}`);
+  }
+  const dolzinaCeste = view.getUint32(12, true);
+  const n = view.getUint32(20, true);
+  const m = view.getUint32(24, true);
+  const stTipov = view.getUint8(30);
+  const k = view.getUint32(32, true);
+  const b = view.getUint32(36, true);
+
+  let off = 40;
+  const tipi = [];
+  const decoder = new TextDecoder();
+  for (let i = 0; i < stTipov; i += 1) {
+    const dolzina = view.getUint8(off);
+    const len = view.getUint8(off + 1);
+    tipi.push({ ime: decoder.decode(new Uint8Array(buffer, off + 2, len)), dolzina });
+    off += 2 + len;
+  }
+  off = (off + 3) & ~3;
+
+  // Int32Array/Uint32Array beremo v vrstnem redu bajtov racunalnika (povsod little-endian)
+  const column = (Type, count) => {
+    const arr = new Type(buffer, off, count);
+    off += count * Type.BYTES_PER_ELEMENT;
+    return arr;
+  };
+  const poz = column(Int32Array, n);
+  const barva = column(Uint32Array, n);
+  const ovirePoz = column(Int32Array, m);
+  const omejitve = column(Int32Array, 3 * k);
+  const posebneI = column(Uint32Array, b);
+  const pas = column(Uint8Array, n);
+  const hitrost = column(Uint8Array, n);
+  const maxHitrost = column(Uint8Array, n);
+  const tip = column(Uint8Array, n);
+  const ovirePas = column(Uint8Array, m);
+  // barve, ki niso "#rrggbb", so na koncu kot nizi in prekrijejo RGB iz stolpca
+  const posebne = new Array(b);
+  for (let i = 0; i < b; i += 1) {
+    const len = view.getUint16(off, true);
+    posebne[i] = decoder.decode(new Uint8Array(buffer, off + 2, len));
+    off += 2 + len;
+  }
+
+  const avti = new Array(n);
+  for (let i = 0; i < n; i += 1) {
+    const t = tipi[tip[i]];
+    avti[i] = {
+      poz: poz[i],
+      pas: pas[i],
+      hitrost: hitrost[i],
+      max_hitrost: maxHitrost[i],
+      tip: t.ime,
+      dolzina: t.dolzina,
+      color: `#${barva[i].toString(16).padStart(6, "0")}`,
+    };
+  }
+  for (let i = 0; i < b; i += 1) {
+    avti[posebneI[i]].color = posebne[i];
+  }
+  const ovire = new Array(m);
+  for (let i = 0; i < m; i += 1) {
+    ovire[i] = { poz: ovirePoz[i], pas: ovirePas[i] };
+  }
+  const intervali = new Array(k);
+  for (let i = 0; i < k; i += 1) {
+    intervali[i] = { od: omejitve[3 * i], do: omejitve[3 * i + 1], max_hitrost: omejitve[3 * i + 2] };
+  }
+  return {
+    polno: true,
+    generacija: view.getUint32(4, true),
+    verzija: view.getUint32(8, true),
+    dolzina_ceste: dolzinaCeste,
+    st_pasov: view.getUint16(16, true),
+    lookahead: view.getUint16(18, true),
+    truck_cap_enabled: view.getUint8(28) === 1,
+    engine: ENGINES[view.getUint8(29)] || null,
+    avti,
+    ovire,
+    omejitve: intervali,
+  };
+}
+
+function applyDelta(state, delta) {
+  // Spremembe zapisemo v obstojece stanje: stolpci za stara vozila, nova na konec
+  const avti = state.avti;
+  if (avti.length !== delta.nova_od) {
+    return false;
+  }
+  for (const [ime, vrednosti] of Object.entries(delta.stolpci || {})) {
+    for (let i = 0; i < vrednosti.length; i += 1) {
+      avti[i][ime] = vrednosti[i];
+    }
+  }
+  for (const avto of delta.nova_vozila) {
+    avti.push(avto);
+  }
+  for (const kljuc of ["ovire", "omejitve"]) {
+    if (delta[kljuc]) {
+      state[kljuc] = delta[kljuc];
+    }
+  }
+  for (const kljuc of ["verzija", "dolzina_ceste", "st_pasov", "lookahead", "truck_cap_enabled", "engine", "seed"]) {
+    state[kljuc] = delta[kljuc];
+  }
+  return true;
+}
+
+function circleLaneSpacing(lanes) {
+  // Pri vec pasovih jih stisnemo, da krog ostane na canvasu
+  return Math.min(34, 136 / Math.max(1, lanes));
+}
+
+function circleLaneRadius(pas, lanes) {
+  // Polmer sredine pasu na krozni cesti (pas 0 je notranji)
+  const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
+  return centerRadius + (pas - (lanes - 1) / 2) * circleLaneSpacing(lanes);
 }
 
 function draw(state) {
@@ -291,15 +464,17 @@ function draw(state) {
       ctx.stroke();
       ctx.restore();
 
-      // Sredinska crtkana crta med pasovi.
-      const midY = segmentY + cellH;
+      // Crtkane crte med pasovi.
       ctx.save();
       ctx.strokeStyle = "#f6f6f6";
       ctx.lineWidth = 4;
       ctx.setLineDash([12, 12]);
       ctx.beginPath();
-      ctx.moveTo(segmentX + 10, midY);
-      ctx.lineTo(segmentX + segmentW - 10, midY);
+      for (let j = 1; j < lanes; j += 1) {
+        const midY = segmentY + j * cellH;
+        ctx.moveTo(segmentX + 10, midY);
+        ctx.lineTo(segmentX + segmentW - 10, midY);
+      }
       ctx.stroke();
       ctx.restore();
     }
@@ -329,12 +504,12 @@ function draw(state) {
     const centerX = canvas.width / 2;
     const centerY = canvas.height / 2;
     const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
-    const laneSpacing = 34;
+    const laneSpacing = circleLaneSpacing(lanes);
 
     ctx.strokeStyle = "#cbb99d";
     ctx.lineWidth = 3;
-    const outerRadius = centerRadius + laneSpacing / 2;
-    const innerRadius = centerRadius - laneSpacing / 2;
+    const outerRadius = centerRadius + (lanes * laneSpacing) / 2;
+    const innerRadius = centerRadius - (lanes * laneSpacing) / 2;
     ctx.beginPath();
     ctx.arc(centerX, centerY, outerRadius, 0, Math.PI * 2);
     ctx.stroke();
@@ -345,9 +520,11 @@ function draw(state) {
     ctx.save();
     ctx.strokeStyle = "#c2a57a";
     ctx.setLineDash([10, 8]);
-    ctx.beginPath();
-    ctx.arc(centerX, centerY, centerRadius, 0, Math.PI * 2);
-    ctx.stroke();
+    for (let j = 1; j < lanes; j += 1) {
+      ctx.beginPath();
+      ctx.arc(centerX, centerY, innerRadius + j * laneSpacing, 0, Math.PI * 2);
+      ctx.stroke();
+    }
     ctx.restore();
 
     if (showGrid) {
@@ -367,47 +544,37 @@ function draw(state) {
     }
   }
 
-  // Omejitve hitrosti: backend poslje seznam po pozicijah
+  // Omejitve hitrosti: backend poslje intervale {od, do, max_hitrost}
   const omejitve = state.omejitve || [];
   if (mode === "linear") {
-    for (let i = 0; i < omejitve.length; i += 1) {
-      const value = omejitve[i];
-      if (value == null) continue;
-      const cell = posToCell(i, 0);
-      ctx.fillStyle = "rgba(244, 162, 97, 0.3)";
-      ctx.fillRect(
-        cell.x,
-        roadY + cell.row * (lanes * cellH + rowGap),
-        cellW,
-        lanes * cellH
-      );
-      ctx.fillStyle = "#7a3b00";
-      ctx.font = "12px Trebuchet MS";
-      ctx.fillText(
-        String(value),
-        cell.x + cellW / 2 - 4,
-        roadY + cell.row * (lanes * cellH + rowGap) + 12
-      );
+    for (const omejitev of omejitve) {
+      for (let i = omejitev.od; i < omejitev.do; i += 1) {
+        const cell = posToCell(i, 0);
+        ctx.fillStyle = "rgba(244, 162, 97, 0.3)";
+        ctx.fillRect(
+          cell.x,
+          roadY + cell.row * (lanes * cellH + rowGap),
+          cellW,
+          lanes * cellH
+        );
+        ctx.fillStyle = "#7a3b00";
+        ctx.font = "12px Trebuchet MS";
+        ctx.fillText(
+          String(omejitev.max_hitrost),
+          cell.x + cellW / 2 - 4,
+          roadY + cell.row * (lanes * cellH + rowGap) + 12
+        );
+      }
     }
   } else {
-    // Zdruzim zaporedne enake vrednosti v skupen delcek
-    let start = null;
-    let current = null;
-    for (let i = 0; i <= omejitve.length; i++) {
-      const value = i < omejitve.length ? omejitve[i] : null;
-      if (value !== current) {
-        if (current !== null && start !== null) {
-          const x = padX + start * baseCellW;
-          const w = (i - start) * baseCellW;
-          ctx.fillStyle = "rgba(244, 162, 97, 0.35)";
-          ctx.fillRect(x, padY, w, lanes * baseCellH);
-          ctx.fillStyle = "#7a3b00";
-          ctx.font = "12px Trebuchet MS";
-          ctx.fillText(String(current), x + w / 2 - 4, padY + 12);
-        }
-        start = value !== null ? i : null;
-        current = value;
-      }
+    for (const omejitev of omejitve) {
+      const x = padX + omejitev.od * baseCellW;
+      const w = (omejitev.do - omejitev.od) * baseCellW;
+      ctx.fillStyle = "rgba(244, 162, 97, 0.35)";
+      ctx.fillRect(x, padY, w, lanes * baseCellH);
+      ctx.fillStyle = "#7a3b00";
+      ctx.font = "12px Trebuchet MS";
+      ctx.fillText(String(omejitev.max_hitrost), x + w / 2 - 4, padY + 12);
     }
   }
 
@@ -422,9 +589,7 @@ function draw(state) {
     } else { // ce je krozno je ovira del loka
       const centerX = canvas.width / 2;
       const centerY = canvas.height / 2;
-      const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
-      const laneSpacing = 34;
-      const radius = centerRadius + (ovira.pas === 0 ? -laneSpacing / 2 : laneSpacing / 2);
+      const radius = circleLaneRadius(ovira.pas, lanes);
       const angle = (ovira.poz / len) * Math.PI * 2;
       x = centerX + radius * Math.cos(angle);
       y = centerY + radius * Math.sin(angle);
@@ -435,9 +600,8 @@ function draw(state) {
     } else {
       const centerX = canvas.width / 2;
       const centerY = canvas.height / 2;
-      const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
-      const laneSpacing = 34;
-      const radius = centerRadius + (ovira.pas === 0 ? -laneSpacing / 2 : laneSpacing / 2);
+      const laneSpacing = circleLaneSpacing(lanes);
+      const radius = circleLaneRadius(ovira.pas, lanes);
       const baseAngle = (ovira.poz / len) * Math.PI * 2;
       const arc = (2 * Math.PI) / len;
       ctx.save();
@@ -552,9 +716,7 @@ function draw(state) {
     } else {
       const centerX = canvas.width / 2;
       const centerY = canvas.height / 2;
-      const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
-      const laneSpacing = 34;
-      const radius = centerRadius + (avto.pas === 0 ? -laneSpacing / 2 : laneSpacing / 2);
+      const radius = circleLaneRadius(avto.pas, lanes);
       const angle = (avto.poz / len) * Math.PI * 2;
       x = centerX + radius * Math.cos(angle);
       y = centerY + radius * Math.sin(angle);
@@ -565,9 +727,8 @@ function draw(state) {
     } else { //avto krog
       const centerX = canvas.width / 2;
       const centerY = canvas.height / 2;
-      const centerRadius = Math.min(canvas.width, canvas.height) * 0.44;
-      const laneSpacing = 34;
-      const radius = centerRadius + (avto.pas === 0 ? -laneSpacing / 2 : laneSpacing / 2);
+      const laneSpacing = circleLaneSpacing(lanes);
+      const radius = circleLaneRadius(avto.pas, lanes);
       ctx.save();
       ctx.strokeStyle = avto.color || "#2a9d8f";
       ctx.lineWidth = laneSpacing - 12;
@@ -626,6 +787,13 @@ async function initModel(random, randomVehicles) {
     ];
   }
   await api("/init", payload);
+  if (running) {
+    // nov model na strezniku stoji; animacija naj tece naprej, tok pa odpremo
+    // znova, ker je /init lahko sele zdaj nastavil piskotek simulacije
+    await api("/run", { tece: true, hitrost: readFps() });
+    stopStream();
+    startStream();
+  }
   const state = await fetchState();
   draw(state);
 }
@@ -637,32 +805,74 @@ async function step() {
   draw(state);
 }
 
-function toggle() {
-  // Start/stop avtomatske animacije
+function readFps() {
+  return Number(document.getElementById("fps").value) || 5;
+}
+
+async function toggle() {
+  // Start/stop avtomatske animacije; korake dela streznik v ozadju (/run),
+  // tok /stream pa posilja zadnje stanje
   running = !running;
   const btn = document.getElementById("toggle");
   btn.textContent = running ? "Ustavi" : "Zacni";
   if (running) {
-    timer = setInterval(step, 200);
-  } else if (timer) {
-    clearInterval(timer);
-    timer = null;
+    await api("/run", { tece: true, hitrost: readFps() });
+    startStream();
+  } else {
+    stopStream();
+    await api("/run", { tece: false });
   }
 }
 
+function startStream() {
+  const format = document.getElementById("stateFormat").value;
+  stream = new EventSource(`/stream?fps=${readFps()}&format=${format}`);
+  stream.onmessage = (event) => {
+    let state;
+    if (format === "bin") {
+      state = serverState = decodeState(base64ToBuffer(event.data));
+    } else {
+      const data = JSON.parse(event.data);
+      if (data.polno) {
+        serverState = data;
+      } else if (!applyDelta(serverState, data)) {
+        // zgresili smo okvir; tok odpremo znova in dobimo polno stanje
+        stopStream();
+        startStream();
+        return;
+      }
+      state = serverState;
+    }
+    draw(state);
+  };
+}
+
+function stopStream() {
+  if (stream) {
+    stream.close();
+    stream = null;
+  }
+}
+
+function base64ToBuffer(text) {
+  const bytes = Uint8Array.from(atob(text), (c) => c.charCodeAt(0));
+  return bytes.buffer;
+}
+
 // Eventi UI (gumbi, nek potek)
 updateLimitsList();
 updateObstaclesList();
 
 document.getElementById("addLimit").addEventListener("click", () => {
-  // Doda omejitev v seznam, gre na backend
-  limits.push({
+  // Doda omejitev v seznam, na backendu le prekrije obstojece
+  const limit = {
     od: Number(document.getElementById("limOd").value),
     do: Number(document.getElementById("limDo").value),
     max_hitrost: Number(document.getElementById("limMax").value),
-  });
+  };
+  limits.push(limit);
   updateLimitsList();
-  api("/set_limits", { omejitve: limits }).then(fetchState).then(draw);
+  api("/add_limit", limit).then(fetchState).then(draw);
 });
 
 document.getElementById("init").addEventListener("click", () => initModel(false));
@@ -700,6 +910,35 @@ document.getElementById("addObstacle").addEventListener("click", async () => {
   draw(state);
 });
 
+document.getElementById("save").addEventListener("click", async () => {
+  // Kontrolno tocko modela prenesemo kot .npz
+  const res = await fetch("/save", { method: "POST" });
+  if (!res.ok) {
+    return;
+  }
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(await res.blob());
+  link.download = "cesta.npz";
+  link.click();
+  URL.revokeObjectURL(link.href);
+});
+
+document.getElementById("loadFile").addEventListener("change", async (event) => {
+  // Nalozena kontrolna tocka zamenja model te simulacije
+  const file = event.target.files[0];
+  if (!file) {
+    return;
+  }
+  await fetch("/load", { method: "POST", body: file });
+  event.target.value = "";
+  serverState = null;
+  if (running) {
+    await api("/run", { tece: true, hitrost: readFps() });
+  }
+  const state = await fetchState();
+  draw(state);
+});
+
 document.getElementById("step").addEventListener("click", step);
 
 document.getElementById("toggle").addEventListener("click", toggle);
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.ansambel import Ansambel
+from src.tools import Cesta
+
+
+def _cesta(seed=4, **kwargs):
+    cesta = Cesta(dolzina_ceste=400, p_zaviranje=0, st_pasov=2, engine="numpy", seed=seed, **kwargs)
+    cesta.set_omejitve([{"od": 50, "do": 120, "max_hitrost": 2}])
+    cesta.add_obstacle(300, 0)
+    cesta.set_truck_cap(True)
+    cesta.random_vozila(gostota=0.1, max_hitrost_interval=(3, 7))
+    return cesta
+
+
+def test_ena_replika_enaka_cesti():
+    cesta = _cesta()
+    ansambel = Ansambel([_cesta()])
+    for _ in range(100):
+        cesta.korak_simulacije()
+        ansambel.korak_simulacije()
+        assert ansambel.poz.tolist() == cesta.avti.poz.tolist()
+        assert ansambel.pas.tolist() == cesta.avti.pas.tolist()
+        assert ansambel.hitrost.tolist() == cesta.avti.hitrost.tolist()
+    replika = ansambel.replika_cesta(0)
+    assert replika.avti.poz.tolist() == cesta.avti.poz.tolist()
+    assert replika.omejitve.intervali() == cesta.omejitve.intervali()
+
+
+@pytest.mark.parametrize("sprememba", [
+    lambda c: c.add_obstacle(10, 1),
+    lambda c: c.dodaj_omejitev(200, 210, 1),
+    lambda c: setattr(c, "p_zaviranje", 0.2),
+    lambda c: setattr(c, "lookahead", 7),
+    lambda c: c.set_truck_cap(False),
+])
+def test_razlicne_ceste(sprememba):
+    druga = _cesta(seed=5)
+    sprememba(druga)
+    with pytest.raises(ValueError):
+        Ansambel([_cesta(), druga])
+
+
+def test_iz_predloge():
+    ansambel = Ansambel.iz_predloge(_cesta(), st_replik=3, gostota=0.1, seed=1)
+    assert ansambel.st_replik == 3
+    assert np.bincount(ansambel.replika).tolist() == [40, 40, 40]
+    ansambel.korak_simulacije(5)
+    opazovanke = ansambel.opazovanke()
+    assert opazovanke["cas"] == 5 and len(opazovanke["replike"]["pretok"]) == 3
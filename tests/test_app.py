@@ -0,0 +1,217 @@
+import base64
+import json
+import time
+
+import pytest
+
+import app as aplikacija
+
+
+@pytest.fixture
+def odjemalec():
+    yield aplikacija.app.test_client()
+    aplikacija.register.zapri_vse()
+
+
+def _init(odjemalec, **nastavitve):
+    odgovor = odjemalec.post("/init", json={"dolzina_ceste": 100, "seed": 1, **nastavitve})
+    assert odgovor.status_code == 200
+    return odgovor.get_json()["sim"]
+
+
+def test_seje_loci_piskotek(odjemalec):
+    drugi = aplikacija.app.test_client()
+    a = _init(odjemalec, dolzina_ceste=120)
+    b = _init(drugi, dolzina_ceste=150)
+    assert a != b
+    assert odjemalec.get("/state").get_json()["dolzina_ceste"] == 120
+    assert drugi.get("/state").get_json()["dolzina_ceste"] == 150
+    verzija_b = drugi.get("/state").get_json()["verzija"]
+    odjemalec.post("/step", json={"n": 3})
+    assert drugi.get("/state").get_json()["verzija"] == verzija_b
+    # izbira s ?sim= in s "sim" v JSON prekrije piskotek
+    assert odjemalec.get("/state", query_string={"sim": b}).get_json()["dolzina_ceste"] == 150
+    odjemalec.post("/step", json={"n": 2, "sim": b})
+    assert drugi.get("/state").get_json()["verzija"] > verzija_b
+    casi = {m["sim"]: m["cas"] for m in odjemalec.get("/registry").get_json()["modeli"]}
+    assert casi == {a: 3, b: 2}
+    # /init s podanim ID-jem zamenja model te simulacije
+    assert _init(drugi, dolzina_ceste=90, sim=b) == b
+    assert drugi.get("/state").get_json()["dolzina_ceste"] == 90
+
+
+def test_izrinjanje_lru(odjemalec, monkeypatch):
+    monkeypatch.setattr(aplikacija.register, "max_modelov", 2)
+    # vsak odjemalec ima svoj piskotek, sicer bi /init zamenjal isto simulacijo
+    a = _init(aplikacija.app.test_client())
+    b = _init(aplikacija.app.test_client())
+    # a je bila uporabljena nazadnje, zato ob tretji izrinemo b
+    assert odjemalec.get("/state", query_string={"sim": a}).status_code == 200
+    c = _init(aplikacija.app.test_client())
+    assert len(aplikacija.register) == 2
+    assert odjemalec.post("/step", json={"sim": b}).status_code == 410
+    odgovor = odjemalec.get("/state", query_string={"sim": b})
+    assert odgovor.status_code == 410 and odgovor.get_json()["dolzina_ceste"] == 0
+    for sim in (a, c):
+        assert odjemalec.post("/step", json={"sim": sim}).status_code == 200
+    statistika = odjemalec.get("/registry").get_json()
+    assert statistika["izrinjeni"] >= 1 and {m["sim"] for m in statistika["modeli"]} == {a, c}
+
+    assert odjemalec.post("/step", json={"sim": "neznana"}).status_code == 404
+    assert odjemalec.post("/close", json={"sim": a}).get_json() == {"ok": True}
+    assert odjemalec.post("/step", json={"sim": a}).status_code == 404
+    # brez ID-ja (nov odjemalec brez piskotka) ni modela
+    novi = aplikacija.app.test_client()
+    assert novi.post("/step", json={}).status_code == 400
+    assert novi.get("/state").status_code == 200
+
+
+def test_nastavitve_in_ovire(odjemalec):
+    _init(odjemalec, dolzina_ceste=200)
+
+    def stanje():
+        return odjemalec.get("/state").get_json()
+
+    def spremeni(pot, **telo):
+        verzija = stanje()["verzija"]
+        odgovor = odjemalec.post(pot, json=telo).get_json()
+        assert stanje()["verzija"] > verzija, pot
+        return odgovor
+
+    assert spremeni("/set_lookahead", lookahead=25) == {"ok": True}
+    assert stanje()["lookahead"] == 25
+    assert spremeni("/set_truck_cap", enabled=True, max_speed=3) == {"ok": True}
+    assert stanje()["truck_cap_enabled"] is True
+    for poz in (10, 11, 12):
+        assert spremeni("/add_obstacle", poz=poz, pas=1) == {"ok": True}
+    # zasedena celica
+    verzija = stanje()["verzija"]
+    assert odjemalec.post("/add_obstacle", json={"poz": 10, "pas": 1}).get_json() == {"ok": False}
+    assert stanje()["verzija"] == verzija
+    assert spremeni("/remove_obstacle", poz=10, pas=1, len=2) == {"ok": True}
+    assert stanje()["ovire"] == [{"poz": 12, "pas": 1}]
+    assert odjemalec.post("/remove_obstacle", json={"poz": 50, "pas": 0}).get_json() == {"ok": False}
+    # delta po odstranitvi nosi nov seznam ovir
+    prej = stanje()
+    assert spremeni("/remove_obstacle", poz=12, pas=1)["ok"]
+    delta = odjemalec.get("/state", query_string={"since": prej["verzija"], "generacija": prej["generacija"]})
+    assert delta.get_json()["ovire"] == []
+
+
+def _okvirji(odgovor):
+    # dogodki SSE kot JSON (data) ali None (komentar brez okvirja)
+    for kos in odgovor.response:
+        kos = kos.decode() if isinstance(kos, bytes) else kos
+        assert kos.endswith("\n\n")
+        yield json.loads(kos[len("data: "):]) if kos.startswith("data: ") else None
+
+
+def test_stream(odjemalec):
+    brez = aplikacija.app.test_client().get("/stream", query_string={"fps": 60}, buffered=False)
+    assert brez.mimetype == "text/event-stream"
+    okvirji = _okvirji(brez)
+    assert next(okvirji)["dolzina_ceste"] == 0
+    assert next(okvirji) is None
+    brez.close()
+
+    _init(odjemalec, dolzina_ceste=200, random_vozila=True, gostota=0.05)
+    odgovor = odjemalec.get("/stream", query_string={"fps": 60}, buffered=False)
+    okvirji = _okvirji(odgovor)
+    polno = next(okvirji)
+    assert polno["polno"] and len(polno["avti"]) == 10
+    # nespremenjeno stanje ne poslje okvirja, po koraku pride delta od zadnjega okvirja
+    assert next(okvirji) is None
+    odjemalec.post("/step", json={"n": 2})
+    delta = next(okvirji)
+    assert not delta["polno"] and delta["since"] == polno["verzija"] and delta["verzija"] > polno["verzija"]
+    assert len(delta["stolpci"]["poz"]) == 10
+    odgovor.close()
+
+    odgovor = odjemalec.get("/stream", query_string={"fps": 60, "format": "bin"}, buffered=False)
+    kos = next(iter(odgovor.response))
+    kos = kos.decode() if isinstance(kos, bytes) else kos
+    assert base64.b64decode(kos[len("data: "):].strip())[:4] == b"CST2"
+    odgovor.close()
+
+
+def _pocakaj(pogoj, timeout=5):
+    konec = time.monotonic() + timeout
+    while not pogoj():
+        assert time.monotonic() < konec
+        time.sleep(0.01)
+
+
+def test_tek_v_ozadju(odjemalec):
+    _init(odjemalec, dolzina_ceste=200, random=True, gostota=0.05)
+    stanje = odjemalec.get("/run").get_json()
+    assert stanje == {"ok": True, "tece": False, "hitrost": 0, "koraki": 0, "cas": 0, "napaka": None}
+    assert odjemalec.post("/run", json={"tece": True, "hitrost": -1}).status_code == 400
+
+    verzija = odjemalec.get("/state").get_json()["verzija"]
+    assert odjemalec.post("/run", json={"tece": True, "hitrost": 0}).get_json()["tece"] is True
+    _pocakaj(lambda: odjemalec.get("/run").get_json()["koraki"] > 5)
+    # posnetki med tekom so omejeni na POSNETKI_NA_SEKUNDO
+    _pocakaj(lambda: odjemalec.get("/state").get_json()["verzija"] > verzija)
+    # ukazi med tekom gredo v vrsto in se izvedejo med koraki
+    assert odjemalec.post("/set_lookahead", json={"lookahead": 9}).get_json() == {"ok": True}
+    assert odjemalec.get("/state").get_json()["lookahead"] == 9
+
+    stanje = odjemalec.post("/run", json={"tece": False}).get_json()
+    assert stanje["tece"] is False
+    time.sleep(0.05)
+    ustavljen = odjemalec.get("/run").get_json()
+    assert ustavljen["koraki"] == stanje["koraki"] and ustavljen["cas"] == stanje["cas"] > 0
+
+
+def test_posli(odjemalec):
+    sim = _init(odjemalec, dolzina_ceste=200, random=True, gostota=0.05)
+
+    def porocilo(posel_id):
+        odgovor = odjemalec.get(f"/jobs/{posel_id}")
+        assert odgovor.status_code == 200
+        return odgovor.get_json()
+
+    posel = odjemalec.post("/jobs", json={"koraki": 30}).get_json()
+    assert posel["ok"]
+    _pocakaj(lambda: porocilo(posel["posel"])["stanje"] == "koncan")
+    p = porocilo(posel["posel"])
+    assert set(p) == {"ok", "id", "stanje", "zacetni_cas", "cilj", "narejeni", "skupaj", "trajanje_s",
+                      "koraki_na_s", "eta_s", "napaka"}
+    assert (p["zacetni_cas"], p["cilj"], p["narejeni"], p["skupaj"], p["napaka"]) == (0, 30, 30, 30, None)
+
+    do_casa = odjemalec.post("/jobs", json={"do_casa": 50}).get_json()["posel"]
+    _pocakaj(lambda: porocilo(do_casa)["stanje"] == "koncan")
+    assert porocilo(do_casa)["narejeni"] == 20
+    assert [m["cas"] for m in odjemalec.get("/registry").get_json()["modeli"] if m["sim"] == sim] == [50]
+
+    dolg = odjemalec.post("/jobs", json={"koraki": 10 ** 9}).get_json()["posel"]
+    _pocakaj(lambda: porocilo(dolg)["narejeni"] > 0)
+    assert porocilo(dolg)["eta_s"] is not None
+    assert odjemalec.post(f"/jobs/{dolg}/cancel").get_json() == {"ok": True}
+    _pocakaj(lambda: porocilo(dolg)["stanje"] == "preklican")
+    assert porocilo(dolg)["narejeni"] < 10 ** 9
+    assert [p["id"] for p in odjemalec.get("/jobs").get_json()["posli"]] == [posel["posel"], do_casa, dolg]
+
+    for telo in ({}, {"koraki": 5, "do_casa": 5}, {"koraki": -1}, {"koraki": "x"}):
+        assert odjemalec.post("/jobs", json=telo).status_code == 400, telo
+    assert odjemalec.get("/jobs/neznan").status_code == 404
+    assert odjemalec.post("/jobs/neznan/cancel").status_code == 404
+
+
+def test_metrike(odjemalec):
+    _init(odjemalec, dolzina_ceste=200, random=True, gostota=0.05)
+    assert odjemalec.get("/metrics").get_json() == {"vklopljeno": False, "faze": {}, "stevci": {}}
+    assert odjemalec.post("/metrics", json={"vklopljeno": True}).get_json() == {"ok": True, "vklopljeno": True}
+    odjemalec.post("/step", json={"n": 4})
+    odjemalec.get("/state")
+    metrike = odjemalec.get("/metrics").get_json()
+    korak = metrike["faze"]["korak"]
+    assert korak["stevilo"] == 4 and korak["najvec_s"] <= korak["skupaj_s"]
+    assert sum(n for _, n in korak["histogram_us"]) == 4
+    assert {"menjave_pasov", "serializacija"} <= set(metrike["faze"])
+    _pocakaj(lambda: odjemalec.get("/metrics").get_json()["stevci"].get("serializirani_bajti", 0) > 0)
+    verzija = odjemalec.get("/state").get_json()["verzija"]
+    assert odjemalec.post("/metrics", json={"ponastavi": True}).get_json()["vklopljeno"] is True
+    assert odjemalec.get("/metrics").get_json()["faze"] == {}
+    # merjenje ne spremeni stanja modela
+    assert odjemalec.get("/state").get_json()["verzija"] == verzija
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.detektorji import Odsek, Zanka
+from src.tools import Cesta
+
+
+def _zanka(model, zanka):
+    # pregled vseh vozil
+    avti = model.avti
+    L = model.dolzina_ceste
+    izbor = slice(None) if zanka.pas is None else avti.pas == zanka.pas
+    poz = avti.poz[izbor].astype(np.int64)
+    hitrost = avti.hitrost[izbor].astype(np.int64)
+    razdalja = (zanka.poz - poz + hitrost) % L
+    prevozili = (razdalja >= 1) & (razdalja <= hitrost)
+    zasedeno = (poz - zanka.poz) % L < avti.dolzina[izbor]
+    return np.count_nonzero(prevozili), int(hitrost[prevozili].sum()), np.count_nonzero(zasedeno)
+
+
+def _odsek(model, odsek):
+    avti = model.avti
+    L = model.dolzina_ceste
+    izbor = slice(None) if odsek.pas is None else avti.pas == odsek.pas
+    hitrost = avti.hitrost[izbor][(avti.poz[izbor] - odsek.od) % L < odsek.dolzina(L)]
+    return len(hitrost), int(hitrost.sum()), int(np.count_nonzero(hitrost == 0))
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_detektorji_enaki_pregledu_vseh(engine):
+    L = 300
+    model = Cesta(dolzina_ceste=L, st_pasov=2, engine=engine, seed=5)
+    model.add_obstacle(150, 1)
+    model.random_vozila(gostota=0.4, max_hitrost_interval=(3, 8))
+    detektorji = [
+        model.dodaj_detektor(Zanka(0, okno=200)),
+        model.dodaj_detektor(Zanka(L - 1, pas=1, okno=200)),
+        model.dodaj_detektor(Zanka(120, pas=0, okno=200)),
+        model.dodaj_detektor(Odsek(280, 20, okno=200)),
+        model.dodaj_detektor(Odsek(50, 90, pas=1, okno=200)),
+        model.dodaj_detektor(Odsek(10, 10, okno=200)),
+    ]
+    pricakovano = {d.id: np.zeros(3, dtype=np.int64) for d in detektorji}
+    for _ in range(100):
+        model.korak_simulacije()
+        for d in detektorji:
+            pricakovano[d.id] += _zanka(model, d) if isinstance(d, Zanka) else _odsek(model, d)
+    for d in detektorji:
+        np.testing.assert_array_equal(d.okno.vsote, pricakovano[d.id])
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from src.tools import Cesta, Ovira
+
+
+def scenarij(engine, p_zaviranje, st_pasov=2, seed=7):
+    model = Cesta(
+        dolzina_ceste=300,
+        p_zaviranje=p_zaviranje,
+        omejitve=[{"od": 40, "do": 90, "max_hitrost": 2}, {"od": 250, "do": 300, "max_hitrost": 3}],
+        lookahead=15,
+        engine=engine,
+        st_pasov=st_pasov,
+        seed=seed,
+    )
+    model.add_obstacle(150, 0)
+    model.add_obstacle(20, st_pasov - 1)
+    model.random_vozila(gostota=0.3, max_hitrost_interval=(3, 6))
+    return model
+
+
+@pytest.mark.parametrize("st_pasov", [1, 2, 3])
+@pytest.mark.parametrize("p_zaviranje", [0.0, 0.3])
+def test_engina_enaka(p_zaviranje, st_pasov):
+    python = scenarij("python", p_zaviranje, st_pasov)
+    numpy_ = scenarij("numpy", p_zaviranje, st_pasov)
+    assert len(python.avti) > 0
+    for korak in range(150):
+        if korak == 75:
+            for model in (python, numpy_):
+                model.set_truck_cap(True, max_speed=2)
+                model.lookahead = 30
+        python.korak_simulacije()
+        numpy_.korak_simulacije()
+        for stolpec in ("poz", "pas", "hitrost"):
+            assert np.array_equal(getattr(python.avti, stolpec), getattr(numpy_.avti, stolpec)), (korak, stolpec)
+
+
+def test_brez_zaviranja_deterministicno():
+    # pri p = 0 seed vpliva le na postavitev, zato mora biti potek ponovljiv
+    a = scenarij("numpy", 0.0, seed=3)
+    b = scenarij("numpy", 0.0, seed=3)
+    for _ in range(50):
+        a.korak_simulacije()
+        b.korak_simulacije()
+    assert np.array_equal(a.avti.poz, b.avti.poz)
+
+
+def _oznaka(obj):
+    # vozilo po indeksu v tabeli, ovira po mestu
+    if obj is None:
+        return None
+    return ("ovira", obj.poz, obj.pas) if isinstance(obj, Ovira) else ("avto", obj._i)
+
+
+def test_mreza_in_indeks_sproti_enaka_obnovljenima():
+    model = scenarij("python", 0.3, st_pasov=3)
+    for korak in range(60):
+        if korak == 20:
+            # vozila ne prepisemo, v prosto celico pa oviro postavimo
+            avto = model.avti[0]
+            assert not model.add_obstacle(avto.poz, avto.pas)
+            prosta = model.cesta[1].index(None)
+            assert model.add_obstacle(prosta, 1)
+        if korak == 40:
+            assert model.remove_obstacle(150, 0)
+            assert not model.remove_obstacle(150, 0)
+        model.korak_simulacije()
+        mreza = [[_oznaka(obj) for obj in vrsta] for vrsta in model.cesta]
+        indeks = [(list(i.glave), [_oznaka(obj) for obj in i.objekti]) for i in model.indeks]
+        model._cesta = None
+        model._indeks = None
+        assert mreza == [[_oznaka(obj) for obj in vrsta] for vrsta in model.cesta], korak
+        assert indeks == [(list(i.glave), [_oznaka(obj) for obj in i.objekti]) for i in model.indeks], korak
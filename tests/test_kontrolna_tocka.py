@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pytest
+
+from src.tools import Cesta
+
+
+def _stanje(model):
+    avti = model.avti
+    return {
+        "stolpci": {ime: stolpec.tolist() for ime, stolpec in avti.stolpci().items()},
+        "barve": avti.barve(),
+        "ovire": [(o.poz, o.pas) for o in model.ovire],
+        "omejitve": list(model.omejitve.intervali()),
+        "cas": model.cas,
+        "verzija": model.verzija,
+        "spremembe": model.spremembe(0),
+    }
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("nov_engine", [None, "python", "numpy"])
+def test_nalozen_model_nadaljuje_enako(engine, nov_engine):
+    model = Cesta(dolzina_ceste=300, p_zaviranje=0.3, st_pasov=2, engine=engine, seed=11)
+    model.set_omejitve([{"od": 40, "do": 90, "max_hitrost": 2}])
+    model.add_obstacle(200, 0)
+    model.random_vozila(gostota=0.3, max_hitrost_interval=(3, 6))
+    model.add_vozilo(150, 1, 5, "avto", color="red")
+    model.set_truck_cap(True)
+    for _ in range(30):
+        model.korak_simulacije()
+
+    datoteka = io.BytesIO()
+    model.shrani(datoteka)
+    datoteka.seek(0)
+    nalozen = Cesta.nalozi(datoteka, engine=nov_engine)
+    assert nalozen.engine == (nov_engine or engine)
+    assert _stanje(nalozen) == _stanje(model)
+
+    for _ in range(60):
+        model.korak_simulacije()
+        nalozen.korak_simulacije()
+    assert _stanje(nalozen) == _stanje(model)
+    np.testing.assert_array_equal(nalozen.tabela_limitov(), model.tabela_limitov())
+
+
+def test_neznan_format():
+    datoteka = io.BytesIO()
+    np.savez(datoteka, format=-1)
+    datoteka.seek(0)
+    with pytest.raises(ValueError):
+        Cesta.nalozi(datoteka)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.omejitve import Omejitve
+from src.vektorski_korak import BREZ, drsni_minimum
+
+
+def _intervali(tabela):
+    # tabela po celicah -> intervali z razlicnimi sosednjimi omejitvami
+    intervali = []
+    for i, v in enumerate(tabela.tolist()):
+        if v == BREZ:
+            continue
+        if intervali and intervali[-1][1] == i and intervali[-1][2] == v:
+            intervali[-1] = (intervali[-1][0], i + 1, v)
+        else:
+            intervali.append((i, i + 1, v))
+    return tuple(intervali)
+
+
+def _minimum(tabela, od, do):
+    celice = np.arange(od, do) % len(tabela)
+    v = tabela[celice].min() if len(celice) else BREZ
+    return None if v == BREZ else int(v)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_nakljucne_spremembe(seed):
+    rng = np.random.default_rng(seed)
+    L, lookahead = 200, 12
+    omejitve = Omejitve(L)
+    omejitve.tabela_limitov(lookahead)
+    pricakovano = np.full(L, BREZ, dtype=np.int64)
+    posnetki = []
+    for _ in range(200):
+        od = int(rng.integers(-10, L))
+        do = od + int(rng.integers(0, 60))
+        if rng.random() < 0.3:
+            omejitve.odstrani(od, do)
+            pricakovano[max(od, 0):max(min(do, L), 0)] = BREZ
+        else:
+            v = int(rng.integers(1, 4)) * 100  # tudi vrednosti nad 255
+            omejitve.dodaj(od, do, v)
+            pricakovano[max(od, 0):max(min(do, L), 0)] = v
+        if rng.random() < 0.2:
+            posnetki.append((omejitve.kopija(), pricakovano.copy()))
+        assert omejitve.intervali() == _intervali(pricakovano)
+        np.testing.assert_array_equal(omejitve.tabela, pricakovano)
+        np.testing.assert_array_equal(omejitve.tabela_limitov(lookahead), drsni_minimum(pricakovano, lookahead + 1))
+        poz = int(rng.integers(L))
+        v = pricakovano[poz]
+        assert omejitve.na_poziciji(poz) == (None if v == BREZ else v)
+        od = int(rng.integers(L))
+        do = od + int(rng.integers(0, 2 * L))
+        assert omejitve.minimum(od, do) == _minimum(pricakovano, od, min(do, od + L))
+    # kasnejse spremembe ne vplivajo na kopije
+    for kopija, tabela in posnetki:
+        assert kopija.intervali() == _intervali(tabela)
+        np.testing.assert_array_equal(kopija.tabela, tabela)
+
+
+def test_sprememba_lookahead():
+    omejitve = Omejitve(50)
+    omejitve.dodaj(10, 20, 3)
+    omejitve.tabela_limitov(5)
+    omejitve.dodaj(45, 50, 2)
+    tabela = omejitve.tabela.copy()
+    np.testing.assert_array_equal(omejitve.tabela_limitov(9), drsni_minimum(tabela, 10))
+    omejitve.nastavi([{"od": 0, "do": 50, "max_hitrost": 4}, {"od": 5, "do": 8, "max_hitrost": 1}])
+    assert omejitve.intervali() == ((0, 5, 4), (5, 8, 1), (8, 50, 4))
+    assert omejitve.tabela_limitov(9)[0] == 1
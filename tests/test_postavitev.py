@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.tools import Cesta
+from src.vozila import TIPI_VOZIL
+
+
+def _brez_prekrivanja(cesta):
+    L = cesta.dolzina_ceste
+    pokrito = np.zeros((cesta.st_pasov, L), dtype=int)
+    for avto in cesta.avti:
+        pokrito[avto.pas, (avto.poz - np.arange(avto.dolzina)) % L] += 1
+    for ovira in cesta.ovire:
+        pokrito[ovira.pas, ovira.poz] += 1
+    return pokrito.max() <= 1
+
+
+@pytest.mark.parametrize("st_pasov", [1, 3])
+def test_natancno_stevilo_brez_prekrivanja(st_pasov):
+    cesta = Cesta(dolzina_ceste=500, st_pasov=st_pasov, seed=4)
+    for poz in range(0, 500, 37):
+        cesta.add_obstacle(poz, poz % st_pasov)
+    cesta.add_vozilo(100, 0, 5, "tovornjak")
+    verzija = cesta.verzija
+    dodano = len(cesta._dodano)
+    tipi = {"avto": 0.5, "limuzina": 0.3, "tovornjak": 0.2}
+    assert cesta.postavi_vozila(n=20 * st_pasov, tipi=tipi) == 20 * st_pasov
+    assert len(cesta.avti) == 20 * st_pasov + 1
+    assert _brez_prekrivanja(cesta)
+    # ena sprememba za celo skupino
+    assert cesta.verzija == verzija + 1
+    assert len(cesta._dodano) == dodano + 1
+
+
+def test_prevec_vozil():
+    cesta = Cesta(dolzina_ceste=100, st_pasov=1, seed=1)
+    with pytest.raises(ValueError):
+        cesta.postavi_vozila(n=17)
+    assert len(cesta.avti) == 0
+    assert cesta.postavi_vozila(n=17, strogo=False) == 16
+    assert _brez_prekrivanja(cesta)
+
+
+def test_enako_seme_enaka_postavitev():
+    postavitve = []
+    for _ in range(2):
+        cesta = Cesta(dolzina_ceste=1000, st_pasov=2, seed=9)
+        cesta.random_vozila(gostota=0.3, max_hitrost_interval=(3, 6))
+        postavitve.append((cesta.avti.poz.tolist(), cesta.avti.pas.tolist(), cesta.avti.max_hitrost.tolist()))
+    assert postavitve[0] == postavitve[1]
+
+
+@pytest.mark.parametrize("postavitev", ["random_cars", "random_vozila"])
+def test_gostota_je_vozil_na_celico_ceste(postavitev):
+    cesta = Cesta(dolzina_ceste=20000, st_pasov=2, seed=3)
+    getattr(cesta, postavitev)(gostota=0.1)
+    assert len(cesta.avti) == round(0.1 * 20000)
+    assert _brez_prekrivanja(cesta)
+
+
+def test_zasedenost():
+    cesta = Cesta(dolzina_ceste=20000, st_pasov=2, seed=3)
+    tipi = {"avto": 0.6, "limuzina": 0.2, "tovornjak": 0.2}
+    cesta.postavi_vozila(zasedenost=0.3, tipi=tipi)
+    povprecna_dolzina = sum(delez * TIPI_VOZIL[tip] for tip, delez in tipi.items())
+    assert len(cesta.avti) == round(0.3 * 40000 / povprecna_dolzina)
+    zasedenost = int(cesta.avti.dolzina.sum()) / (cesta.dolzina_ceste * cesta.st_pasov)
+    assert zasedenost == pytest.approx(0.3, abs=0.02)
+    with pytest.raises(ValueError):
+        cesta.postavi_vozila(n=3, zasedenost=0.1)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.snemalnik import MAX_HITROST, OVIRA, Snemalnik, pomanjsaj
+from src.tools import Cesta, Ovira
+
+
+def _model():
+    model = Cesta(dolzina_ceste=150, p_zaviranje=0.3, st_pasov=2, seed=8)
+    model.add_obstacle(30, 1)
+    model.random_vozila(gostota=0.1, max_hitrost_interval=(3, 6))
+    return model
+
+
+def _vrstica(model):
+    # iz mreze pythonskega enginea, celica za celico
+    kode = []
+    for vrsta in model.cesta:
+        for obj in vrsta:
+            if obj is None:
+                kode.append(0)
+            elif isinstance(obj, Ovira):
+                kode.append(OVIRA)
+            else:
+                kode.append(min(obj.hitrost, MAX_HITROST) + 1)
+    return np.array(kode, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("na_disku", [False, True])
+def test_snemanje_po_kosih(tmp_path, na_disku):
+    model, vzorec = _model(), _model()
+    datoteka = tmp_path / "posnetek.npy" if na_disku else None
+    snemalnik = Snemalnik(model, 40, datoteka=datoteka, korak_casa=3, velikost_kosa=4)
+    snemalnik.snemaj(40)
+    tabela = snemalnik.zakljuci()
+    pricakovano = []
+    for korak in range(40):
+        if korak % 3 == 0:
+            pricakovano.append(_vrstica(vzorec))
+        vzorec.korak_simulacije()
+    np.testing.assert_array_equal(tabela, np.array(pricakovano))
+    if na_disku:
+        np.testing.assert_array_equal(np.load(datoteka), tabela)
+    with pytest.raises(ValueError):
+        snemalnik.snemaj(3)
+
+
+def test_zdruzene_celice():
+    model = _model()
+    celice = Snemalnik(model, 1).vrstica().reshape(2, 150)
+    zdruzene = Snemalnik(model, 1, korak_prostora=4).vrstica().reshape(2, 38)
+    for blok in range(38):
+        np.testing.assert_array_equal(zdruzene[:, blok], celice[:, 4 * blok:4 * blok + 4].max(axis=1))
+
+
+@pytest.mark.parametrize("visina,sirina,max_celic", [(7, 9, 50), (100, 100, 1 << 22), (1, 1, 10)])
+def test_pomanjsaj(visina, sirina, max_celic):
+    rng = np.random.default_rng(0)
+    tabela = rng.choice(np.array([0, 0, 0, 1, 2, 5, OVIRA], dtype=np.uint8), size=(45, 61))
+    zasedenost, hitrost = pomanjsaj(tabela, visina, sirina, max_celic=max_celic)
+    fy, fx = -(-45 // visina), -(-61 // sirina)
+    assert zasedenost.shape == hitrost.shape == (-(-45 // fy), -(-61 // fx))
+    for i in range(zasedenost.shape[0]):
+        for j in range(zasedenost.shape[1]):
+            blok = tabela[i * fy:(i + 1) * fy, j * fx:(j + 1) * fx]
+            assert zasedenost[i, j] == pytest.approx((blok > 0).mean())
+            vozila = blok[(blok > 0) & (blok != OVIRA)].astype(float) - 1
+            if len(vozila):
+                assert hitrost[i, j] == pytest.approx(vozila.mean())
+            else:
+                assert np.isnan(hitrost[i, j])
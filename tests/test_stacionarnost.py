@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.stacionarnost import PovprecjaSerij, mser
+
+
+def _ogrevanje(vrednosti, **kwargs):
+    stat = PovprecjaSerij(1, **kwargs)
+    for v in vrednosti:
+        stat.dodaj([v])
+        if stat.ogrevanje is not None:
+            break
+    return stat
+
+
+def test_mser_najde_konec_rampe():
+    rng = np.random.default_rng(1)
+    serije = np.concatenate([np.linspace(0, 1, 30), 1 + 0.01 * rng.standard_normal(70)])
+    assert 25 <= mser(serije) <= 35
+
+
+def test_mser_ne_gleda_cez_polovico():
+    serije = np.linspace(0, 1, 40)
+    assert mser(serije) <= 20
+
+
+def test_ogrevanje_ne_konca_med_rampo():
+    rng = np.random.default_rng(2)
+    rampa = 2000
+    vrednosti = np.concatenate([np.linspace(0, 1, rampa), 1 + 0.02 * rng.standard_normal(20000)])
+    stat = _ogrevanje(vrednosti)
+    assert stat.ogrevanje is not None
+    assert stat.koraki > rampa
+    assert 0.8 * rampa <= stat.ogrevanje
+    # obdrzane serije so ze stacionarne
+    assert abs(stat.povprecje()[0] - 1) < 0.05
+
+
+def test_stacionarno_ogrevanje_kratko():
+    rng = np.random.default_rng(3)
+    stat = _ogrevanje(1 + 0.02 * rng.standard_normal(5000))
+    assert stat.ogrevanje is not None
+    assert stat.koraki < 500
@@ -0,0 +1,92 @@
+import struct
+
+import numpy as np
+
+from src.stanje import GLAVA, binarno_stanje, polno_stanje
+from src.tools import Cesta
+
+
+def _razpakiraj(podatki):
+    # bralnik zapisa iz src/stanje.py (enako kot decodeState v static/app.js)
+    glava = GLAVA.unpack_from(podatki)
+    n, m, st_tipov = glava[6], glava[7], glava[10]
+    k, b = struct.unpack_from("<II", podatki, GLAVA.size)
+    odmik = GLAVA.size + 8
+    for _ in range(st_tipov):
+        odmik += 2 + podatki[odmik + 1]
+    odmik = (odmik + 3) & ~3
+
+    def stolpec(tip, stevilo):
+        nonlocal odmik
+        vrednosti = np.frombuffer(podatki, dtype=tip, count=stevilo, offset=odmik)
+        odmik += vrednosti.nbytes
+        return vrednosti
+
+    stanje = {"glava": glava, "poz": stolpec("<i4", n)}
+    barva = stolpec("<u4", n)
+    stolpec("<i4", m)
+    stanje["omejitve"] = [tuple(v) for v in stolpec("<i4", 3 * k).reshape(k, 3).tolist()]
+    posebne_i = stolpec("<u4", b).tolist()
+    odmik += 4 * n + m
+    barve = ["#{:06x}".format(v) for v in barva.tolist()]
+    for i in posebne_i:
+        (dolzina,) = struct.unpack_from("<H", podatki, odmik)
+        barve[i] = podatki[odmik + 2:odmik + 2 + dolzina].decode()
+        odmik += 2 + dolzina
+    assert odmik == len(podatki)
+    stanje["barve"] = barve
+    return stanje
+
+
+def test_binarno_stanje_omejitve_kot_intervali():
+    model = Cesta(dolzina_ceste=400, st_pasov=2, seed=1)
+    model.set_omejitve([{"od": 10, "do": 50, "max_hitrost": 3}, {"od": 100, "do": 300, "max_hitrost": 400}])
+    model.add_obstacle(5, 1)
+    model.random_vozila(gostota=0.05)
+    stanje = _razpakiraj(binarno_stanje(model, generacija=7))
+    assert stanje["glava"][0] == b"CST2" and stanje["glava"][1] == 7
+    assert stanje["omejitve"] == list(model.omejitve.intervali())
+    assert stanje["poz"].tolist() == model.avti.poz.tolist()
+
+
+def test_barve_enake_v_json_in_binarno():
+    model = Cesta(dolzina_ceste=400, st_pasov=2, seed=2)
+    model.random_cars(gostota=0.02)
+    for poz, barva in [(100, "red"), (150, "#ABCDEF"), (200, "#abc"), (250, "#123456"), (300, "rgb(1, 2, 3)")]:
+        model.add_vozilo(poz, 1, 5, "avto", color=barva)
+    json_barve = [avto["color"] for avto in polno_stanje(model)["avti"]]
+    assert json_barve[-5:] == ["red", "#ABCDEF", "#abc", "#123456", "rgb(1, 2, 3)"]
+    assert _razpakiraj(binarno_stanje(model.posnetek()))["barve"] == json_barve
+
+
+def test_delta_in_etag():
+    from app import app
+
+    odjemalec = app.test_client()
+    odgovor = odjemalec.post("/init", json={"dolzina_ceste": 300, "seed": 3, "random_vozila": True, "gostota": 0.3})
+    assert odgovor.get_json()["ok"]
+    polno = odjemalec.get("/state").get_json()
+    assert polno["polno"]
+    gen, verzija = polno["generacija"], polno["verzija"]
+    parametri = {"since": verzija, "generacija": gen}
+
+    # nespremenjeno stanje: 304 po verziji ali po ETag
+    assert odjemalec.get("/state", query_string=parametri).status_code == 304
+    odgovor = odjemalec.get("/state")
+    assert odjemalec.get("/state", headers={"If-None-Match": odgovor.headers["ETag"]}).status_code == 304
+    assert odjemalec.get("/state", query_string={"format": "bin"}, headers={"If-None-Match": odgovor.headers["ETag"]}).status_code == 200
+
+    # po koraku delta vsebuje le gibanje, po novi omejitvi tudi omejitve
+    odjemalec.post("/step", json={"n": 1})
+    delta = odjemalec.get("/state", query_string=parametri).get_json()
+    assert not delta["polno"] and delta["since"] == verzija and delta["verzija"] > verzija
+    assert "stolpci" in delta and "omejitve" not in delta and delta["nova_vozila"] == []
+    odjemalec.post("/add_limit", json={"od": 10, "do": 40, "max_hitrost": 2})
+    delta = odjemalec.get("/state", query_string=parametri).get_json()
+    assert delta["omejitve"] == [{"od": 10, "do": 40, "max_hitrost": 2}]
+    assert odjemalec.get("/state", headers={"If-None-Match": odgovor.headers["ETag"]}).status_code == 200
+
+    # tuja generacija ali neznana verzija vrne polno stanje
+    assert odjemalec.get("/state", query_string={"since": verzija, "generacija": gen + 1}).get_json()["polno"]
+    assert odjemalec.get("/state", query_string={"since": 10 ** 9, "generacija": gen}).get_json()["polno"]
+    odjemalec.post("/close", json={})
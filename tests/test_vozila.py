@@ -0,0 +1,19 @@
+import pytest
+
+from src.vozila import VozniPark
+
+
+@pytest.mark.parametrize("barva", ["#12ab9f", "#ABCDEF", "#abc", "#12345", "red", "#" + "f" * 40])
+def test_barva_ostane_enaka(barva):
+    park = VozniPark()
+    park.dodaj(5, color=barva)
+    assert len(park) == 1
+    assert park.barva_hex(0) == barva
+    assert park.barve() == [barva]
+
+
+def test_napacen_tip_ne_doda_vozila():
+    park = VozniPark()
+    with pytest.raises(KeyError):
+        park.dodaj(5, tip="kolo")
+    assert len(park) == 0